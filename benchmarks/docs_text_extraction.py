@@ -0,0 +1,210 @@
+"""
+Docs Text Extraction Benchmark
+
+Builds a synthetic documents.get response for a long multi-tab Google Doc
+(about 300 pages by default, with styled runs and tables) and compares
+gdocs.docs_text against the previous recursive, string-concatenating
+extractor. It also reports the JSON payload size with and without the
+DOC_TEXT_FIELDS mask, simulated by dropping the fields the mask excludes.
+
+Usage:
+    python benchmarks/docs_text_extraction.py               # ~300 pages
+    python benchmarks/docs_text_extraction.py --pages 1000
+
+The document is generated on the fly so no fixtures live in the repo.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gdocs.docs_text import extract_doc_text  # noqa: E402
+
+WORDS = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima".split()
+
+PARAGRAPHS_PER_PAGE = 30
+TABS = 3
+
+# Keys kept by DOC_TEXT_FIELDS; everything else (styles, indices, ...) is dropped
+_MASK_KEYS = {
+    "title", "revisionId", "body", "content", "paragraph", "elements", "textRun",
+    "table", "tableRows", "tableCells", "tabs", "tabProperties", "tabId",
+    "index", "nestingLevel", "documentTab", "childTabs",
+}
+
+_TEXT_STYLE = {
+    "bold": False,
+    "italic": False,
+    "fontSize": {"magnitude": 11, "unit": "PT"},
+    "weightedFontFamily": {"fontFamily": "Arial", "weight": 400},
+    "foregroundColor": {"color": {"rgbColor": {"red": 0.1, "green": 0.1, "blue": 0.1}}},
+}
+_PARAGRAPH_STYLE = {
+    "namedStyleType": "NORMAL_TEXT",
+    "direction": "LEFT_TO_RIGHT",
+    "lineSpacing": 115,
+    "spaceAbove": {"unit": "PT"},
+    "spaceBelow": {"magnitude": 8, "unit": "PT"},
+}
+
+
+def _sentence(i: int) -> str:
+    return " ".join(WORDS[(i + k) % len(WORDS)] for k in range(8)) + f" {i}"
+
+
+def _paragraph(i: int, index: int) -> Dict[str, Any]:
+    runs = [_sentence(i) + " ", _sentence(i + 1) + " ", _sentence(i + 2) + "\n"]
+    elements = []
+    for run in runs:
+        elements.append({
+            "startIndex": index,
+            "endIndex": index + len(run),
+            "textRun": {"content": run, "textStyle": dict(_TEXT_STYLE)},
+        })
+        index += len(run)
+    return {
+        "startIndex": elements[0]["startIndex"],
+        "endIndex": index,
+        "paragraph": {"elements": elements, "paragraphStyle": dict(_PARAGRAPH_STYLE)},
+    }
+
+
+def _table(i: int, index: int, rows: int = 5, cols: int = 4) -> Dict[str, Any]:
+    table_rows = []
+    for r in range(rows):
+        cells = []
+        for c in range(cols):
+            para = _paragraph(i + r * cols + c, index)
+            index = para["endIndex"]
+            cells.append({"content": [para], "tableCellStyle": {"contentAlignment": "TOP"}})
+        table_rows.append({"tableCells": cells, "tableRowStyle": {"minRowHeight": {"unit": "PT"}}})
+    return {"table": {"rows": rows, "columns": cols, "tableRows": table_rows}, "endIndex": index}
+
+
+def build_document(pages: int) -> Dict[str, Any]:
+    """Build a documents.get response (includeTabsContent=True) with the given page count."""
+    tabs: List[Dict[str, Any]] = []
+    pages_per_tab = max(1, pages // TABS)
+    counter = 0
+    for t in range(TABS):
+        content = []
+        index = 1
+        for page in range(pages_per_tab):
+            for _ in range(PARAGRAPHS_PER_PAGE):
+                para = _paragraph(counter, index)
+                index = para["endIndex"]
+                content.append(para)
+                counter += 3
+            if page % 5 == 0:
+                table = _table(counter, index)
+                index = table["endIndex"]
+                content.append(table)
+                counter += 20
+        tabs.append({
+            "tabProperties": {"tabId": f"t.{t}", "title": f"Tab {t + 1}", "index": t},
+            "documentTab": {"body": {"content": content}},
+        })
+    return {"title": "Benchmark", "revisionId": "r1", "tabs": tabs}
+
+
+def legacy_extract(doc_data: Dict[str, Any]) -> str:
+    """The extractor get_doc_content used before gdocs.docs_text."""
+    TAB_HEADER_FORMAT = "\n--- TAB: {tab_name} ---\n"
+
+    def extract_text_from_elements(elements, tab_name=None, depth=0):
+        if depth > 5:
+            return ""
+        text_lines = []
+        if tab_name:
+            text_lines.append(TAB_HEADER_FORMAT.format(tab_name=tab_name))
+        for element in elements:
+            if 'paragraph' in element:
+                current_line_text = ""
+                for pe in element.get('paragraph', {}).get('elements', []):
+                    text_run = pe.get('textRun', {})
+                    if text_run and 'content' in text_run:
+                        current_line_text += text_run['content']
+                if current_line_text.strip():
+                    text_lines.append(current_line_text)
+            elif 'table' in element:
+                for row in element.get('table', {}).get('tableRows', []):
+                    for cell in row.get('tableCells', []):
+                        cell_text = extract_text_from_elements(cell.get('content', []), depth=depth + 1)
+                        if cell_text.strip():
+                            text_lines.append(cell_text)
+        return "".join(text_lines)
+
+    def process_tab_hierarchy(tab, level=0):
+        tab_text = ""
+        if 'documentTab' in tab:
+            tab_title = tab.get('tabProperties', {}).get('title', 'Untitled Tab')
+            if level > 0:
+                tab_title = "    " * level + tab_title
+            tab_body = tab.get('documentTab', {}).get('body', {}).get('content', [])
+            tab_text += extract_text_from_elements(tab_body, tab_title)
+        for child_tab in tab.get('childTabs', []):
+            tab_text += process_tab_hierarchy(child_tab, level + 1)
+        return tab_text
+
+    processed_text_lines = []
+    main_content = extract_text_from_elements(doc_data.get('body', {}).get('content', []))
+    if main_content.strip():
+        processed_text_lines.append(main_content)
+    for tab in doc_data.get('tabs', []):
+        tab_content = process_tab_hierarchy(tab)
+        if tab_content.strip():
+            processed_text_lines.append(tab_content)
+    return "".join(processed_text_lines)
+
+
+def apply_mask(value: Any) -> Any:
+    """Drop the keys DOC_TEXT_FIELDS would not return."""
+    if isinstance(value, dict):
+        return {k: apply_mask(v) for k, v in value.items() if k in _MASK_KEYS}
+    if isinstance(value, list):
+        return [apply_mask(v) for v in value]
+    return value
+
+
+def _best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(pages: int, repeat: int = 5) -> None:
+    doc = build_document(pages)
+    masked = apply_mask(doc)
+    full_size = len(json.dumps(doc))
+    masked_size = len(json.dumps(masked))
+
+    legacy_text = legacy_extract(doc)
+    new_text = extract_doc_text(masked).text
+    if legacy_text != new_text:
+        raise SystemExit("Extractors disagree on the benchmark document")
+
+    print(f"Document: ~{pages} pages, {len(new_text):,} chars of text")
+    print(f"Payload:  {full_size / 1e6:.1f} MB full, {masked_size / 1e6:.1f} MB with DOC_TEXT_FIELDS")
+    print(f"{'extractor':<28} {'best s':>8}")
+    print(f"{'legacy (full payload)':<28} {_best_of(lambda: legacy_extract(doc), repeat):>8.3f}")
+    print(f"{'docs_text (masked payload)':<28} {_best_of(lambda: extract_doc_text(masked), repeat):>8.3f}")
+    print(
+        f"{'docs_text first 5000 chars':<28} "
+        f"{_best_of(lambda: extract_doc_text(masked, max_chars=5000), repeat):>8.4f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=300, help="Approximate page count")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per extractor")
+    args = parser.parse_args()
+    run(args.pages, args.repeat)
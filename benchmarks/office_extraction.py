@@ -0,0 +1,144 @@
+"""
+Office Extraction Benchmark
+
+Generates a synthetic corpus of large .docx, .xlsx and .pptx files and measures
+extraction time and peak Python memory for core.office_text.
+
+Usage:
+    python benchmarks/office_extraction.py                 # default sizes
+    python benchmarks/office_extraction.py --scale 4       # 4x larger corpus
+    python benchmarks/office_extraction.py --out corpus/   # also write the files
+
+The corpus is generated on the fly so no binary fixtures live in the repo.
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import zipfile
+from typing import Callable, Dict, Tuple
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.office_text import (  # noqa: E402
+    DOCX_MIME_TYPE,
+    PPTX_MIME_TYPE,
+    XLSX_MIME_TYPE,
+    extract_office_xml_text,
+)
+
+NS_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+NS_X = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+WORDS = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima".split()
+
+
+def _sentence(i: int) -> str:
+    return escape(" ".join(WORDS[(i + k) % len(WORDS)] for k in range(8)) + f" {i}")
+
+
+def build_docx(paragraphs: int) -> bytes:
+    """Build a .docx with the given number of single-run paragraphs."""
+    body = "".join(
+        f"<w:p><w:r><w:t>{_sentence(i)}</w:t></w:r></w:p>" for i in range(paragraphs)
+    )
+    document = f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{NS_W}"><w:body>{body}</w:body></w:document>'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def build_xlsx(sheets: int, rows: int, cols: int) -> bytes:
+    """Build a .xlsx mixing shared-string and numeric cells."""
+    shared = [_sentence(i) for i in range(1000)]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(
+            "xl/sharedStrings.xml",
+            f'<?xml version="1.0" encoding="UTF-8"?><sst xmlns="{NS_X}">'
+            + "".join(f"<si><t>{s}</t></si>" for s in shared)
+            + "</sst>",
+        )
+        for sheet in range(1, sheets + 1):
+            with zf.open(f"xl/worksheets/sheet{sheet}.xml", "w") as fp:
+                fp.write(
+                    f'<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="{NS_X}"><sheetData>'.encode()
+                )
+                for r in range(rows):
+                    cells = "".join(
+                        f'<c t="s"><v>{(r * cols + c) % len(shared)}</v></c>'
+                        if c % 2 == 0
+                        else f"<c><v>{r * c}</v></c>"
+                        for c in range(cols)
+                    )
+                    fp.write(f'<row r="{r + 1}">{cells}</row>'.encode())
+                fp.write(b"</sheetData></worksheet>")
+    return buffer.getvalue()
+
+
+def build_pptx(slides: int, shapes_per_slide: int) -> bytes:
+    """Build a .pptx with text boxes on every slide."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for slide in range(1, slides + 1):
+            shapes = "".join(
+                f"<p:sp><p:txBody><a:p><a:r><a:t>{_sentence(slide * 100 + s)}</a:t></a:r></a:p></p:txBody></p:sp>"
+                for s in range(shapes_per_slide)
+            )
+            zf.writestr(
+                f"ppt/slides/slide{slide}.xml",
+                f'<?xml version="1.0" encoding="UTF-8"?><p:sld xmlns:p="{NS_P}" xmlns:a="{NS_A}">'
+                f"<p:cSld><p:spTree>{shapes}</p:spTree></p:cSld></p:sld>",
+            )
+    return buffer.getvalue()
+
+
+def build_corpus(scale: int) -> Dict[str, Tuple[str, Callable[[], bytes]]]:
+    """Map corpus file names to (mime type, builder)."""
+    return {
+        "large.docx": (DOCX_MIME_TYPE, lambda: build_docx(50000 * scale)),
+        "large.xlsx": (XLSX_MIME_TYPE, lambda: build_xlsx(3, 20000 * scale, 10)),
+        "large.pptx": (PPTX_MIME_TYPE, lambda: build_pptx(200 * scale, 50)),
+    }
+
+
+def run(scale: int, out_dir: str = None, repeat: int = 3) -> None:
+    print(f"{'file':<12} {'size':>10} {'chars':>11} {'best s':>8} {'peak MiB':>9}")
+    for name, (mime_type, builder) in build_corpus(scale).items():
+        data = builder()
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+            with open(os.path.join(out_dir, name), "wb") as f:
+                f.write(data)
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            text = extract_office_xml_text(data, mime_type)
+            timings.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        extract_office_xml_text(data, mime_type)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(
+            f"{name:<12} {len(data):>10} {len(text or ''):>11} "
+            f"{min(timings):>8.2f} {peak / (1024 * 1024):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, default=1, help="Corpus size multiplier")
+    parser.add_argument("--out", help="Directory to write the generated corpus to")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per file")
+    args = parser.parse_args()
+    run(args.scale, args.out, args.repeat)
@@ -0,0 +1,379 @@
+"""
+Batch Execution Utilities
+
+Shared helpers for tools that fan out many Google API calls: chunking,
+bounded concurrency, retry with backoff on rate-limit and transient errors,
+batch HTTP execution with per-request retry, and MCP progress reporting.
+"""
+
+import asyncio
+import logging
+import random
+import ssl
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import httplib2
+import google_auth_httplib2
+from googleapiclient.errors import HttpError
+from fastmcp.server.dependencies import get_context
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# HTTP status codes that indicate a temporary condition worth retrying
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 403 reasons Google APIs use for quota/rate limiting instead of a 429
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+# Network failures after which the request may or may not have reached the server
+TRANSIENT_NETWORK_ERRORS = (ssl.SSLError, ConnectionError, TimeoutError, httplib2.HttpLib2Error)
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+MAX_BACKOFF_DELAY = 32.0
+
+
+def chunked(items: Sequence[T], size: int) -> Iterator[List[T]]:
+    """
+    Split a sequence into consecutive lists of at most `size` items.
+
+    Args:
+        items: The sequence to split
+        size: Maximum chunk size (must be positive)
+
+    Yields:
+        Lists of consecutive items
+    """
+    if size <= 0:
+        raise ValueError("Chunk size must be positive")
+    for start in range(0, len(items), size):
+        yield list(items[start : start + size])
+
+
+def _error_reasons(error: HttpError) -> List[str]:
+    """Extract the machine-readable reasons from a Google API HttpError."""
+    details = getattr(error, "error_details", None)
+    reasons = []
+    if isinstance(details, list):
+        for detail in details:
+            if isinstance(detail, dict) and detail.get("reason"):
+                reasons.append(detail["reason"])
+    return reasons
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """
+    Determine whether a Google API call was rejected by rate limiting (429 or
+    403 rateLimitExceeded).
+
+    Rate-limited requests are refused before they are applied, so they are
+    the only failures that are safe to retry for calls that are not
+    idempotent (sending mail, copying files, appending rows).
+    """
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 429:
+        return True
+    if status == 403:
+        reasons = _error_reasons(error)
+        if any(reason in RATE_LIMIT_REASONS for reason in reasons):
+            return True
+        return "rateLimitExceeded" in str(error)
+    return False
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Determine whether an error from a Google API call is worth retrying.
+
+    Retries rate limiting (429 and 403 rateLimitExceeded), server errors,
+    and transient network failures. Client errors are never retried.
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUS_CODES or is_rate_limit_error(error)
+    return isinstance(error, TRANSIENT_NETWORK_ERRORS)
+
+
+def is_ambiguous_error(error: BaseException) -> bool:
+    """
+    Determine whether a failed call may nevertheless have been applied.
+
+    Server errors and network failures leave the outcome unknown; client
+    errors (including rate limiting) mean the request was rejected.
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500
+    return isinstance(error, TRANSIENT_NETWORK_ERRORS)
+
+
+def retry_delay(
+    error: Optional[BaseException], attempt: int, base_delay: float = DEFAULT_BASE_DELAY
+) -> float:
+    """
+    Compute the delay before the next retry attempt.
+
+    Honors a Retry-After header when the server provides one, otherwise uses
+    exponential backoff with jitter so concurrent workers do not retry in lockstep.
+    """
+    if isinstance(error, HttpError):
+        retry_after = error.resp.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF_DELAY)
+            except ValueError:
+                pass
+    delay = min(base_delay * (2**attempt), MAX_BACKOFF_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def new_authorized_http(service) -> Optional[google_auth_httplib2.AuthorizedHttp]:
+    """
+    Create a fresh authorized HTTP transport sharing the service's credentials.
+
+    httplib2 connections are not thread-safe, so concurrent requests executed
+    via asyncio.to_thread must each use their own transport.
+
+    Args:
+        service: A googleapiclient service built with credentials
+
+    Returns:
+        A new AuthorizedHttp, or None if the service has no credentials attached
+    """
+    credentials = getattr(getattr(service, "_http", None), "credentials", None)
+    if credentials is None:
+        return None
+    return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+
+
+async def execute_with_retry(
+    request,
+    http=None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    label: str = "request",
+    retry_if: Callable[[BaseException], bool] = is_retryable_error,
+) -> Any:
+    """
+    Execute a googleapiclient request in a worker thread, retrying retryable errors.
+
+    Args:
+        request: The HttpRequest to execute
+        http: Optional transport to execute with (see new_authorized_http)
+        max_retries: Maximum number of retries after the first attempt
+        base_delay: Base delay in seconds for exponential backoff
+        label: Description used in log messages
+        retry_if: Predicate selecting the errors to retry; pass
+            is_rate_limit_error for requests that must not be applied twice
+
+    Returns:
+        The API response
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return await asyncio.to_thread(request.execute, http=http)
+        except Exception as e:
+            if attempt >= max_retries or not retry_if(e):
+                raise
+            delay = retry_delay(e, attempt, base_delay)
+            logger.warning(
+                f"[{label}] Retryable error on attempt {attempt + 1}: {e}. Retrying in {delay:.1f}s..."
+            )
+            await asyncio.sleep(delay)
+
+
+async def execute_batch_with_retry(
+    service,
+    requests: Dict[str, Any],
+    http=None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    label: str = "batch",
+    retry_if: Callable[[BaseException], bool] = is_retryable_error,
+) -> Dict[str, Tuple[Any, Optional[Exception]]]:
+    """
+    Execute requests through the batch HTTP endpoint, retrying failed sub-requests.
+
+    Sub-requests that fail with a retryable error (e.g. 429) are re-submitted in a
+    new batch after a backoff delay; all other outcomes are returned as-is.
+
+    Args:
+        service: The googleapiclient service used to create the batch
+        requests: Mapping of request ID to HttpRequest (at most one batch worth)
+        http: Optional transport to execute with (see new_authorized_http)
+        max_retries: Maximum number of retries for failed sub-requests
+        base_delay: Base delay in seconds for exponential backoff
+        label: Description used in log messages
+        retry_if: Predicate selecting the errors to retry; pass
+            is_rate_limit_error for requests that must not be applied twice
+
+    Returns:
+        Mapping of request ID to (response, error) tuples
+    """
+    results: Dict[str, Tuple[Any, Optional[Exception]]] = {}
+    pending = dict(requests)
+
+    for attempt in range(max_retries + 1):
+        responses: Dict[str, Tuple[Any, Optional[Exception]]] = {}
+
+        def _callback(request_id, response, exception):
+            responses[request_id] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=_callback)
+        for request_id, request in pending.items():
+            batch.add(request, request_id=request_id)
+
+        try:
+            await asyncio.to_thread(batch.execute, http=http)
+        except Exception as e:
+            if attempt >= max_retries or not retry_if(e):
+                raise
+            delay = retry_delay(e, attempt, base_delay)
+            logger.warning(
+                f"[{label}] Batch request failed on attempt {attempt + 1}: {e}. Retrying in {delay:.1f}s..."
+            )
+            await asyncio.sleep(delay)
+            continue
+
+        retry: Dict[str, Any] = {}
+        last_error: Optional[Exception] = None
+        for request_id, request in pending.items():
+            response, error = responses.get(
+                request_id, (None, Exception("No response returned in batch"))
+            )
+            if error is not None and attempt < max_retries and retry_if(error):
+                retry[request_id] = request
+                last_error = error
+            else:
+                results[request_id] = (response, error)
+
+        if not retry:
+            break
+
+        delay = retry_delay(last_error, attempt, base_delay)
+        logger.warning(
+            f"[{label}] {len(retry)} of {len(pending)} sub-requests hit retryable errors. Retrying in {delay:.1f}s..."
+        )
+        pending = retry
+        await asyncio.sleep(delay)
+
+    return results
+
+
+async def run_bounded(
+    items: Sequence[T],
+    worker: Callable[[T], Awaitable[R]],
+    max_concurrency: int,
+) -> List[Tuple[T, Optional[R], Optional[Exception]]]:
+    """
+    Run an async worker over items with at most `max_concurrency` in flight.
+
+    Errors are captured per item rather than cancelling the remaining work.
+
+    Args:
+        items: Items to process
+        worker: Async callable invoked once per item
+        max_concurrency: Maximum number of concurrently running workers
+
+    Returns:
+        List of (item, result, error) tuples in the original item order
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run(item: T) -> Tuple[T, Optional[R], Optional[Exception]]:
+        async with semaphore:
+            try:
+                return item, await worker(item), None
+            except Exception as e:
+                return item, None, e
+
+    return await asyncio.gather(*(_run(item) for item in items))
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket limiter for API quota units.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; callers
+    await acquire(cost) before issuing a request that consumes `cost` units.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """Wait until `cost` tokens are available and consume them."""
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self._tokens < cost:
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= cost
+
+
+_rate_limiters: Dict[str, AsyncRateLimiter] = {}
+
+
+def get_rate_limiter(key: str, rate: float, capacity: float) -> AsyncRateLimiter:
+    """
+    Get the shared rate limiter for a key (e.g. "gmail:user@example.com").
+
+    Limiters are shared across tool calls so concurrent bulk jobs for the same
+    user draw from one quota budget.
+    """
+    limiter = _rate_limiters.get(key)
+    if limiter is None:
+        limiter = AsyncRateLimiter(rate, capacity)
+        _rate_limiters[key] = limiter
+    return limiter
+
+
+async def report_progress(
+    progress: float, total: Optional[float] = None, message: Optional[str] = None
+) -> None:
+    """
+    Send a progress notification to the MCP client for the current tool call.
+
+    Silently does nothing outside of a request context or when the client did
+    not ask for progress updates.
+    """
+    try:
+        ctx = get_context()
+    except RuntimeError:
+        return
+
+    try:
+        await ctx.report_progress(progress=progress, total=total, message=message)
+    except TypeError:
+        # Older FastMCP releases do not accept a progress message
+        try:
+            await ctx.report_progress(progress=progress, total=total)
+        except Exception as e:
+            logger.debug(f"Could not report progress: {e}")
+    except Exception as e:
+        logger.debug(f"Could not report progress: {e}")
@@ -0,0 +1,245 @@
+"""
+Extracted Content Cache
+
+Caches text extracted from Drive files and Google Docs, keyed by the file ID
+and a version tag from files.get metadata (version, md5Checksum or
+modifiedTime). A re-read of an unchanged file is then served after a single
+metadata call instead of a full download and extraction.
+
+Entries live in a byte-budgeted in-memory LRU. An optional on-disk tier
+(CONTENT_CACHE_DIR) keeps entries across restarts; it is disabled in
+stateless mode. Disk reads run in a worker thread and disk writes on a
+single background writer, so file I/O never blocks the event loop, and the
+directory is only pruned once the tracked disk usage exceeds its budget.
+Cache keys do not include the user: every lookup follows a
+files.get made with the caller's credentials, so only users who can read the
+file ever reach its cached content.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from auth.oauth_config import is_stateless_mode
+
+logger = logging.getLogger(__name__)
+
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CONTENT_CACHE_DISK_MAX_BYTES = int(
+    os.getenv("CONTENT_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024))
+)
+
+# Metadata fields needed to compute a version tag; add to files.get field masks
+CONTENT_VERSION_FIELDS = "version, md5Checksum, modifiedTime"
+
+# Fixed per-entry overhead added to the text size when accounting the budget
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+def content_version_tag(file_metadata: Dict[str, Any]) -> Optional[str]:
+    """
+    Get a tag that changes whenever a file's content may have changed.
+
+    Args:
+        file_metadata: files.get response including CONTENT_VERSION_FIELDS
+
+    Returns:
+        The version tag, or None if the metadata carries no usable field
+    """
+    for field in ("version", "md5Checksum", "modifiedTime"):
+        value = file_metadata.get(field)
+        if value:
+            return f"{field}:{value}"
+    return None
+
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    text = entry.get("text") or ""
+    return len(text.encode("utf-8")) + _ENTRY_OVERHEAD_BYTES
+
+
+class ContentCache:
+    """
+    Two-tier LRU cache of extracted content entries.
+
+    Entries are JSON-serializable dicts with a "text" field plus any extra
+    values the caller needs to rebuild its response.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = CONTENT_CACHE_MAX_BYTES,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = CONTENT_CACHE_DISK_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        # Disk usage of the cache directory, counted on the first write; only the writer thread uses it
+        self._disk_bytes: Optional[int] = None
+        self._disk_writer: Optional[ThreadPoolExecutor] = None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            # One writer keeps writes of the same key in order and the usage count consistent
+            self._disk_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="content-cache-disk")
+
+    @staticmethod
+    def make_key(file_id: str, version_tag: str, variant: str) -> str:
+        """Build a cache key for one extracted representation of one file version."""
+        return f"{variant}|{file_id}|{version_tag}"
+
+    async def get(self, file_id: str, version_tag: Optional[str], variant: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up an entry, promoting disk hits into memory.
+
+        Returns:
+            The cached entry, or None on a miss (or when version_tag is None)
+        """
+        if not version_tag:
+            return None
+        key = self.make_key(file_id, version_tag, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if not self.disk_dir:
+            return None
+        entry = await asyncio.to_thread(self._read_disk, key)
+        if entry is not None:
+            self._put_memory(key, entry)
+        return entry
+
+    def put(self, file_id: str, version_tag: Optional[str], variant: str, entry: Dict[str, Any]) -> None:
+        """Store an entry in memory and, when enabled, queue it for the disk tier."""
+        if not version_tag:
+            return
+        key = self.make_key(file_id, version_tag, variant)
+        self._put_memory(key, entry)
+        if self._disk_writer is not None and _entry_size(entry) <= self.disk_max_bytes:
+            self._disk_writer.submit(self._write_disk, key, entry)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def _put_memory(self, key: str, entry: Dict[str, Any]) -> None:
+        size = _entry_size(entry)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(evicted_key)
+
+    def _disk_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("key") != key:
+                return None
+            os.utime(path)  # Mark as recently used for disk pruning
+            return stored.get("entry")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read content cache file {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        """Write one entry to the disk tier (runs on the writer thread)."""
+        path = self._disk_path(key)
+        tmp_path = None
+        try:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "entry": entry}, f)
+            written = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+            tmp_path = None
+            self._disk_bytes += written - replaced
+            if self._disk_bytes > self.disk_max_bytes:
+                self._prune_disk()
+        except Exception as e:
+            logger.warning(f"Could not write content cache file {path}: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _scan_disk(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every cache file."""
+        files = []
+        with os.scandir(self.disk_dir) as it:
+            for dir_entry in it:
+                if dir_entry.is_file() and dir_entry.name.endswith(".json"):
+                    stat = dir_entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return files
+
+    def _prune_disk(self) -> None:
+        """Remove least recently used files until the disk tier fits its budget."""
+        files = self._scan_disk()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+
+
+_content_cache: Optional[ContentCache] = None
+_content_cache_lock = threading.Lock()
+
+
+def get_content_cache() -> ContentCache:
+    """Get the global extracted content cache, creating it on first use."""
+    global _content_cache
+    with _content_cache_lock:
+        if _content_cache is None:
+            disk_dir = os.getenv("CONTENT_CACHE_DIR")
+            if disk_dir and is_stateless_mode():
+                logger.info("Stateless mode: content cache disk tier disabled")
+                disk_dir = None
+            _content_cache = ContentCache(disk_dir=os.path.expanduser(disk_dir) if disk_dir else None)
+        return _content_cache
@@ -0,0 +1,155 @@
+"""
+Resumable Job Checkpoints
+
+Append-only progress journals for long-running bulk tools so that a job
+interrupted by a crash or restart can be resumed by calling the tool again
+with the same job ID. Each item result is written as one JSON line as soon as
+it is known, so results never need to be held in memory.
+
+Checkpoints are stored under WORKSPACE_MCP_STATE_DIR (default
+~/.google_workspace_mcp/state) and are disabled in stateless mode.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Set
+
+from auth.oauth_config import is_stateless_mode
+
+logger = logging.getLogger(__name__)
+
+# Outcomes a resumed job does not redo: "ok" items succeeded, "unknown" items
+# may have been applied (e.g. a send that failed with a server error) and are
+# left for the user to check rather than risk doing them twice
+SETTLED_STATUSES = {"ok", "unknown"}
+
+
+def get_default_state_dir() -> str:
+    """Get the directory used for server-side job state."""
+    if os.getenv("WORKSPACE_MCP_STATE_DIR"):
+        return os.getenv("WORKSPACE_MCP_STATE_DIR")
+
+    home_dir = os.path.expanduser("~")
+    if home_dir and home_dir != "~":
+        return os.path.join(home_dir, ".google_workspace_mcp", "state")
+
+    return os.path.join(os.getcwd(), ".state")
+
+
+def compute_job_fingerprint(payload: Any) -> str:
+    """
+    Compute a stable fingerprint for a job's inputs.
+
+    Used as the default job ID so that re-issuing an identical call resumes
+    the previous run, and to refuse resuming a job with different inputs.
+    """
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _safe_filename(value: str) -> str:
+    """Reduce an arbitrary string to a safe file name component."""
+    return re.sub(r"[^A-Za-z0-9_.@-]", "_", value)
+
+
+class JobCheckpoint:
+    """
+    Progress journal for one bulk job.
+
+    The first line of the journal records the job fingerprint; every following
+    line records the outcome of one item, keyed by a caller-chosen item key.
+    """
+
+    def __init__(
+        self,
+        job_type: str,
+        job_id: str,
+        user_google_email: str,
+        fingerprint: str,
+    ):
+        self.job_type = job_type
+        self.job_id = job_id
+        self.fingerprint = fingerprint
+        self.enabled = not is_stateless_mode()
+        self.path: Optional[str] = None
+        if self.enabled:
+            self.path = os.path.join(
+                get_default_state_dir(),
+                "jobs",
+                _safe_filename(job_type),
+                f"{_safe_filename(user_google_email)}_{_safe_filename(job_id)}.jsonl",
+            )
+
+    def load_completed(self) -> Set[str]:
+        """
+        Read the journal and return the keys of settled items (see SETTLED_STATUSES).
+
+        Creates the journal if it does not exist yet.
+
+        Raises:
+            ValueError: If the journal belongs to a job with different inputs
+        """
+        if not self.enabled:
+            return set()
+
+        completed: Set[str] = set()
+        if os.path.exists(self.path):
+            for entry in self._read_entries():
+                if "fingerprint" in entry:
+                    if entry["fingerprint"] != self.fingerprint:
+                        raise ValueError(
+                            f"Job '{self.job_id}' was started with different inputs. "
+                            "Use a new job_id to start a separate job."
+                        )
+                elif entry.get("status") in SETTLED_STATUSES:
+                    completed.add(str(entry["key"]))
+                else:
+                    completed.discard(str(entry["key"]))
+            logger.info(
+                f"Resuming {self.job_type} job '{self.job_id}' with {len(completed)} completed items"
+            )
+        else:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._append(
+                {
+                    "fingerprint": self.fingerprint,
+                    "job_type": self.job_type,
+                    "started_at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+        return completed
+
+    def record(self, key: str, status: str, **details: Any) -> None:
+        """
+        Append the outcome of one item to the journal.
+
+        Args:
+            key: Item key (e.g. the item's position in the input list)
+            status: "ok" for success, "unknown" when the item may have been
+                applied, anything else for failure
+            **details: Extra JSON-serializable fields to store with the result
+        """
+        if not self.enabled:
+            return
+        self._append({"key": key, "status": status, **details})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+            f.flush()
+
+    def _read_entries(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a partially written last line
+                    logger.warning(f"Skipping corrupt checkpoint line in {self.path}")
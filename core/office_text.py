@@ -0,0 +1,321 @@
+"""
+Office XML Text Extraction
+
+Streaming text extraction for Word, Excel and PowerPoint (OOXML) files.
+
+Each XML part is read straight from the zip archive with ElementTree.iterparse
+and elements are cleared as soon as their text has been collected, so memory
+stays flat regardless of sheet or document size. Extraction stops once the
+row or character limit is reached.
+
+Extraction is CPU bound; async callers should use extract_office_xml_text_async,
+which runs it in a process pool so the event loop keeps serving other requests.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PPTX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+OFFICE_MIME_TYPES = {DOCX_MIME_TYPE, PPTX_MIME_TYPE, XLSX_MIME_TYPE}
+
+NS_EXCEL_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_EXCEL_SI = f"{{{NS_EXCEL_MAIN}}}si"
+_EXCEL_T = f"{{{NS_EXCEL_MAIN}}}t"
+_EXCEL_C = f"{{{NS_EXCEL_MAIN}}}c"
+_EXCEL_V = f"{{{NS_EXCEL_MAIN}}}v"
+_EXCEL_ROW = f"{{{NS_EXCEL_MAIN}}}row"
+_EXCEL_SHEET_DATA = f"{{{NS_EXCEL_MAIN}}}sheetData"
+
+# Extraction limits across all sheets/slides of one file
+OFFICE_MAX_ROWS = int(os.getenv("OFFICE_EXTRACT_MAX_ROWS", "100000"))
+OFFICE_MAX_CHARS = int(os.getenv("OFFICE_EXTRACT_MAX_CHARS", "5000000"))
+
+# Files below this size are extracted inline; pool start-up would dominate
+OFFICE_POOL_MIN_BYTES = 256 * 1024
+OFFICE_POOL_MAX_WORKERS = int(os.getenv("OFFICE_EXTRACT_WORKERS", "2"))
+
+
+class _Budget:
+    """Tracks the remaining row and character allowance for one extraction."""
+
+    def __init__(self, max_rows: int, max_chars: int):
+        self.rows_left = max_rows
+        self.chars_left = max_chars
+        self.truncated = False
+
+    def take_row(self) -> bool:
+        if self.rows_left <= 0:
+            self.truncated = True
+            return False
+        self.rows_left -= 1
+        return True
+
+    def take_text(self, text: str) -> Optional[str]:
+        if self.chars_left <= 0:
+            self.truncated = True
+            return None
+        if len(text) > self.chars_left:
+            text = text[: self.chars_left]
+            self.truncated = True
+        self.chars_left -= len(text) + 1  # account for the joining space
+        return text
+
+    @property
+    def exhausted(self) -> bool:
+        return self.rows_left <= 0 or self.chars_left <= 0
+
+
+def _read_shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    """Stream xl/sharedStrings.xml into a list of strings indexed by position."""
+    shared_strings: List[str] = []
+    try:
+        with zf.open("xl/sharedStrings.xml") as fp:
+            text_parts: List[str] = []
+            for _, elem in ET.iterparse(fp, events=("end",)):
+                # <t> elements appear directly under <si> or within <r> runs
+                if elem.tag == _EXCEL_T:
+                    if elem.text:
+                        text_parts.append(elem.text)
+                elif elem.tag == _EXCEL_SI:
+                    shared_strings.append("".join(text_parts))
+                    text_parts = []
+                    elem.clear()
+    except KeyError:
+        logger.info("No sharedStrings.xml found in Excel file (this is optional).")
+    except ET.ParseError as e:
+        logger.error(f"Error parsing sharedStrings.xml: {e}")
+    return shared_strings
+
+
+def _iter_sheet_values(
+    fp, member: str, shared_strings: List[str], budget: _Budget
+) -> Iterator[str]:
+    """Yield cell values of one worksheet, row by row, within the budget."""
+    sheet_data = None
+    for event, elem in ET.iterparse(fp, events=("start", "end")):
+        if event == "start":
+            if elem.tag == _EXCEL_SHEET_DATA:
+                sheet_data = elem
+            continue
+
+        if elem.tag != _EXCEL_ROW:
+            continue
+
+        if not budget.take_row():
+            return
+        for cell_element in elem.iter(_EXCEL_C):
+            value_element = cell_element.find(_EXCEL_V)
+            # Skip if cell has no value element or value element has no text
+            if value_element is None or value_element.text is None:
+                continue
+
+            if cell_element.get("t") == "s":  # Shared string
+                try:
+                    ss_idx = int(value_element.text)
+                except ValueError:
+                    logger.warning(
+                        f"Non-integer shared string index: '{value_element.text}' in {member}."
+                    )
+                    continue
+                if 0 <= ss_idx < len(shared_strings):
+                    yield shared_strings[ss_idx]
+                else:
+                    logger.warning(
+                        f"Invalid shared string index {ss_idx} in {member}. Max index: {len(shared_strings)-1}"
+                    )
+            else:  # Direct value (number, boolean, inline string if not 's')
+                yield value_element.text
+
+        # Drop the processed row so the parsed tree never grows
+        elem.clear()
+        if sheet_data is not None:
+            sheet_data.clear()
+
+
+def _iter_run_texts(fp) -> Iterator[str]:
+    """Yield the non-blank <w:t>/<a:t> texts of a Word or PowerPoint part."""
+    for _, elem in ET.iterparse(fp, events=("end",)):
+        tag = elem.tag
+        # For Word: <w:t>; for PowerPoint: <a:t> (any namespaced tag ending with 't')
+        if tag.endswith("}t"):
+            if elem.text:
+                cleaned_text = elem.text.strip()
+                if cleaned_text:
+                    yield cleaned_text
+            elem.clear()
+        elif tag.endswith("}p"):
+            # Paragraph fully processed; release its runs
+            elem.clear()
+
+
+def extract_office_xml_text(
+    file_bytes: bytes,
+    mime_type: str,
+    max_rows: int = OFFICE_MAX_ROWS,
+    max_chars: int = OFFICE_MAX_CHARS,
+) -> Optional[str]:
+    """
+    Very light-weight XML scraper for Word, Excel, PowerPoint files.
+    Returns plain-text if something readable is found, else None.
+    No external deps – just std-lib zipfile + ElementTree (iterparse).
+
+    Args:
+        file_bytes: The raw Office file
+        mime_type: The file's MIME type
+        max_rows: Maximum number of spreadsheet rows to read across all sheets
+        max_chars: Maximum number of characters of text to return
+
+    Returns:
+        The extracted text (with a trailing note if a limit was hit), or None
+    """
+    if mime_type not in OFFICE_MIME_TYPES:
+        return None
+
+    budget = _Budget(max_rows, max_chars)
+
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+            # Map MIME → iterable of XML files to inspect
+            shared_strings: List[str] = []
+            if mime_type == DOCX_MIME_TYPE:
+                targets = ["word/document.xml"]
+            elif mime_type == PPTX_MIME_TYPE:
+                targets = [n for n in zf.namelist() if n.startswith("ppt/slides/slide")]
+            else:
+                targets = [
+                    n
+                    for n in zf.namelist()
+                    if n.startswith("xl/worksheets/sheet") and "drawing" not in n
+                ]
+                shared_strings = _read_shared_strings(zf)
+
+            pieces: List[str] = []
+            for member in targets:
+                if budget.exhausted:
+                    budget.truncated = True
+                    break
+                member_texts: List[str] = []
+                try:
+                    with zf.open(member) as fp:
+                        values = (
+                            _iter_sheet_values(fp, member, shared_strings, budget)
+                            if mime_type == XLSX_MIME_TYPE
+                            else _iter_run_texts(fp)
+                        )
+                        for value in values:
+                            value = budget.take_text(value)
+                            if value is None:
+                                break
+                            member_texts.append(value)
+                except KeyError:
+                    logger.warning(f"Member '{member}' missing from {mime_type} file.")
+                except ET.ParseError as e:
+                    logger.warning(
+                        f"Could not parse XML in member '{member}' for {mime_type} file: {e}"
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Error processing member '{member}' for {mime_type}: {e}",
+                        exc_info=True,
+                    )
+                    # continue processing other members
+
+                if member_texts:
+                    # Join texts from one member with spaces
+                    pieces.append(" ".join(member_texts))
+
+            if not pieces:  # If no text was extracted at all
+                return None
+
+            # Join content from different members (sheets/slides) with double newlines for separation
+            text = "\n\n".join(pieces).strip()
+            if text and budget.truncated:
+                text += (
+                    f"\n\n[Extraction truncated: limit of {max_rows} rows / "
+                    f"{max_chars} characters reached]"
+                )
+            return text or None  # Ensure None is returned if text is empty after strip
+
+    except zipfile.BadZipFile:
+        logger.warning(f"File is not a valid ZIP archive (mime_type: {mime_type}).")
+        return None
+    except Exception as e:
+        logger.error(
+            f"Failed to extract office XML text for {mime_type}: {e}", exc_info=True
+        )
+        return None
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+_process_pool_unavailable = False
+
+
+def _get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the shared extraction process pool, creating it on first use."""
+    global _process_pool, _process_pool_unavailable
+    if _process_pool_unavailable or OFFICE_POOL_MAX_WORKERS <= 0:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            try:
+                # Forking a multi-threaded server can deadlock children on
+                # inherited locks (e.g. logging), so workers are spawned fresh
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=OFFICE_POOL_MAX_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, NotImplementedError) as e:
+                # Some serverless sandboxes do not allow worker processes
+                logger.warning(f"Process pool unavailable, extracting in threads: {e}")
+                _process_pool_unavailable = True
+                return None
+        return _process_pool
+
+
+async def extract_office_xml_text_async(
+    file_bytes: bytes,
+    mime_type: str,
+    max_rows: int = OFFICE_MAX_ROWS,
+    max_chars: int = OFFICE_MAX_CHARS,
+) -> Optional[str]:
+    """
+    Extract Office text without blocking the event loop.
+
+    Large files are extracted in a worker process; small files, and
+    environments where worker processes cannot be started, use a thread.
+    """
+    global _process_pool, _process_pool_unavailable
+    if mime_type not in OFFICE_MIME_TYPES:
+        return None
+
+    pool = _get_process_pool() if len(file_bytes) >= OFFICE_POOL_MIN_BYTES else None
+    if pool is not None:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                pool, extract_office_xml_text, file_bytes, mime_type, max_rows, max_chars
+            )
+        except Exception as e:
+            # BrokenProcessPool, or workers could not be spawned
+            logger.warning(f"Office extraction in process pool failed, using a thread: {e}")
+            with _process_pool_lock:
+                _process_pool_unavailable = True
+                _process_pool = None
+            pool.shutdown(wait=False)
+
+    return await asyncio.to_thread(
+        extract_office_xml_text, file_bytes, mime_type, max_rows, max_chars
+    )
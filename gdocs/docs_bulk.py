@@ -0,0 +1,180 @@
+"""
+Bulk Find-and-Replace Across Google Docs
+
+Resolves the target documents from a Drive query and/or folder with a
+paginated files.list, then sends one batchUpdate per document containing a
+replaceAllText request for every replacement pair. Documents are updated
+concurrently with a bounded number in flight and drawn from a per-user rate
+limiter sized to the Docs API write quota, so large runs slow down rather
+than fail. Each document succeeds or fails on its own; replacements within
+a document are atomic. Every attempt is pinned to the revision read before
+the first one, so a retry after a server error can never apply the
+replacements a second time; when that retry is refused because the
+document has changed, the outcome is reported as unknown.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from core.batching import (
+    execute_with_retry,
+    get_rate_limiter,
+    is_ambiguous_error,
+    is_retryable_error,
+    new_authorized_http,
+    report_progress,
+    retry_delay,
+    run_bounded,
+)
+from gdocs.docs_cache import execute_batch_update
+from gdocs.docs_helpers import create_find_replace_request
+from gdrive.drive_helpers import DriveFileLister, build_drive_list_params
+
+logger = logging.getLogger(__name__)
+
+DOCS_MIME_TYPE = "application/vnd.google-apps.document"
+
+# Default Docs API quota: 60 write requests per minute per user
+DOCS_WRITE_REQUESTS_PER_SECOND = 1.0
+DOCS_WRITE_BURST = 10
+
+BULK_REPLACE_CONCURRENCY = 8
+BULK_REPLACE_MAX_DOCUMENTS = 500
+BULK_REPLACE_MAX_RETRIES = 4
+
+
+def build_documents_query(query: Optional[str] = None, folder_id: Optional[str] = None) -> str:
+    """Build a files.list query for non-trashed Google Docs, optionally in a folder and/or matching a query."""
+    clauses = [f"mimeType='{DOCS_MIME_TYPE}'", "trashed=false"]
+    if folder_id:
+        escaped = folder_id.replace("\\", "\\\\").replace("'", "\\'")
+        clauses.append(f"'{escaped}' in parents")
+    if query:
+        clauses.append(f"({query})")
+    return " and ".join(clauses)
+
+
+async def resolve_documents(
+    drive_service,
+    query: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    max_documents: int = BULK_REPLACE_MAX_DOCUMENTS,
+) -> List[Dict[str, Any]]:
+    """
+    List the Google Docs matching a Drive query and/or folder.
+
+    Returns:
+        File resources with id and name, at most max_documents
+    """
+    list_params = build_drive_list_params(
+        query=build_documents_query(query, folder_id),
+        page_size=max_documents,
+        file_fields="id, name",
+    )
+    return await DriveFileLister(drive_service, list_params, max_results=max_documents).collect()
+
+
+class DocumentReplaceResult:
+    """Outcome of the replacements in one document."""
+
+    def __init__(self, document_id: str, name: str):
+        self.document_id = document_id
+        self.name = name
+        self.occurrences: List[int] = []
+        self.error: Optional[str] = None
+        # Set when the replacements may or may not have been applied
+        self.unknown = False
+
+    @property
+    def total(self) -> int:
+        return sum(self.occurrences)
+
+
+async def replace_in_documents(
+    docs_service,
+    documents: List[Dict[str, Any]],
+    replacements: List[Dict[str, str]],
+    user_google_email: str,
+    match_case: bool = False,
+    max_concurrency: int = BULK_REPLACE_CONCURRENCY,
+) -> List[DocumentReplaceResult]:
+    """
+    Apply replacement pairs to every document concurrently.
+
+    Pairs are applied in order within one batchUpdate, so a later pair sees
+    the text produced by earlier ones.
+
+    Args:
+        docs_service: Google Docs API service
+        documents: File resources from resolve_documents
+        replacements: List of {"find": ..., "replace": ...}
+        user_google_email: Key of the shared rate limiter
+        match_case: Whether matching is case sensitive
+        max_concurrency: Maximum number of documents updated at once
+
+    Returns:
+        One DocumentReplaceResult per document, in input order
+    """
+    requests = [create_find_replace_request(pair["find"], pair.get("replace", ""), match_case) for pair in replacements]
+    limiter = get_rate_limiter(f"docs_write:{user_google_email}", DOCS_WRITE_REQUESTS_PER_SECOND, DOCS_WRITE_BURST)
+    total = len(documents)
+    done = 0
+
+    async def _replace(document: Dict[str, Any]) -> DocumentReplaceResult:
+        nonlocal done
+        result = DocumentReplaceResult(document["id"], document.get("name", document["id"]))
+        # Requests run in worker threads, which must not share an httplib2 transport
+        http = new_authorized_http(docs_service)
+        # replaceAllText is not idempotent; pinning every attempt to this revision
+        # makes a retry fail instead of replacing again if an earlier attempt landed
+        revision = await execute_with_retry(
+            docs_service.documents().get(documentId=document["id"], fields="revisionId"),
+            http=http,
+            label="bulk_find_replace_docs",
+        )
+        ambiguous: Optional[Exception] = None
+        response = None
+        for attempt in range(BULK_REPLACE_MAX_RETRIES + 1):
+            await limiter.acquire()
+            try:
+                response = await execute_batch_update(
+                    docs_service,
+                    document["id"],
+                    requests,
+                    required_revision_id=revision.get("revisionId"),
+                    http=http,
+                )
+                break
+            except Exception as e:
+                if ambiguous is None and is_ambiguous_error(e):
+                    ambiguous = e
+                if attempt >= BULK_REPLACE_MAX_RETRIES or not is_retryable_error(e):
+                    if ambiguous is not None:
+                        result.unknown = True
+                        result.error = (
+                            f"outcome unknown: an attempt failed with {ambiguous} and the replacements may "
+                            f"have been applied (last error: {e})"
+                        )
+                    else:
+                        result.error = str(e)
+                    break
+                delay = retry_delay(e, attempt)
+                logger.warning(f"[bulk_find_replace_docs] Retrying {document['id']} in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+        if response is not None:
+            result.occurrences = [
+                reply.get("replaceAllText", {}).get("occurrencesChanged", 0)
+                for reply in response.get("replies", [])
+            ]
+        done += 1
+        await report_progress(done, total, f"Updated {done}/{total} documents")
+        return result
+
+    results = []
+    for document, result, error in await run_bounded(documents, _replace, max_concurrency):
+        if error is not None:
+            result = DocumentReplaceResult(document["id"], document.get("name", document["id"]))
+            result.error = str(error)
+        results.append(result)
+    return results
@@ -0,0 +1,173 @@
+"""
+Google Docs Document Model Cache
+
+Keeps recently fetched documents, together with their parsed structure, keyed
+by document ID and revisionId. A repeated structure read costs one
+documents.get limited to the revisionId field; the full document JSON is only
+downloaded again when the revision has changed. Every batchUpdate sent
+through execute_batch_update drops the document's entries.
+
+revisionId is only returned to users who can edit the document, so documents
+opened read-only are never cached. Cache keys do not include the user:
+every hit follows a revisionId check made with the caller's credentials.
+Cached documents are shared between callers and must be treated as read-only.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from gdocs.docs_structure import find_tables, parse_document_structure
+
+logger = logging.getLogger(__name__)
+
+DOCS_MODEL_CACHE_MAX_DOCUMENTS = int(os.getenv("DOCS_MODEL_CACHE_MAX_DOCUMENTS", "16"))
+
+
+class DocumentModel:
+    """A fetched document and its lazily parsed structure."""
+
+    def __init__(self, document_id: str, doc: Dict[str, Any]):
+        self.document_id = document_id
+        self.doc = doc
+        self.revision_id: Optional[str] = doc.get("revisionId")
+        self._structure: Optional[Dict[str, Any]] = None
+        self._tables: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def structure(self) -> Dict[str, Any]:
+        """parse_document_structure output, computed once per revision."""
+        if self._structure is None:
+            self._structure = parse_document_structure(self.doc)
+        return self._structure
+
+    @property
+    def tables(self) -> List[Dict[str, Any]]:
+        """find_tables output, computed once per revision."""
+        if self._tables is None:
+            self._tables = find_tables(self.doc, structure=self.structure)
+        return self._tables
+
+
+class DocumentModelCache:
+    """LRU cache of DocumentModel entries keyed by (document ID, tabs variant)."""
+
+    def __init__(self, max_documents: int = DOCS_MODEL_CACHE_MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self._entries: "OrderedDict[Tuple[str, bool], DocumentModel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, document_id: str, include_tabs_content: bool) -> Optional[DocumentModel]:
+        with self._lock:
+            model = self._entries.get((document_id, include_tabs_content))
+            if model is not None:
+                self._entries.move_to_end((document_id, include_tabs_content))
+            return model
+
+    def put(self, model: DocumentModel, include_tabs_content: bool) -> None:
+        if not model.revision_id or self.max_documents <= 0:
+            return
+        with self._lock:
+            self._entries[(model.document_id, include_tabs_content)] = model
+            self._entries.move_to_end((model.document_id, include_tabs_content))
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, document_id: str) -> None:
+        """Drop every cached variant of a document."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == document_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_model_cache = DocumentModelCache()
+
+
+def get_document_model_cache() -> DocumentModelCache:
+    """Get the global document model cache."""
+    return _model_cache
+
+
+async def get_document_model(
+    service,
+    document_id: str,
+    include_tabs_content: bool = False,
+) -> DocumentModel:
+    """
+    Get a document and its parsed structure, reusing a cached copy if unchanged.
+
+    Args:
+        service: Google Docs API service instance
+        document_id: ID of the document
+        include_tabs_content: Fetch the content of every tab (documents.get includeTabsContent)
+
+    Returns:
+        DocumentModel for the document's current revision
+    """
+    cache = get_document_model_cache()
+    cached = cache.get(document_id, include_tabs_content)
+    if cached is not None:
+        current = await asyncio.to_thread(
+            service.documents().get(documentId=document_id, fields="revisionId").execute
+        )
+        if current.get("revisionId") == cached.revision_id:
+            logger.debug(f"[docs_cache] Reusing document {document_id} at revision {cached.revision_id}")
+            return cached
+        cache.invalidate(document_id)
+
+    params: Dict[str, Any] = {"documentId": document_id}
+    if include_tabs_content:
+        params["includeTabsContent"] = True
+    doc = await asyncio.to_thread(service.documents().get(**params).execute)
+    model = DocumentModel(document_id, doc)
+    cache.put(model, include_tabs_content)
+    return model
+
+
+async def get_document(service, document_id: str, include_tabs_content: bool = False) -> Dict[str, Any]:
+    """Get the raw document JSON through the model cache (read-only)."""
+    return (await get_document_model(service, document_id, include_tabs_content)).doc
+
+
+async def execute_batch_update(
+    service,
+    document_id: str,
+    requests: List[Dict[str, Any]],
+    required_revision_id: Optional[str] = None,
+    http=None,
+) -> Dict[str, Any]:
+    """
+    Send a documents.batchUpdate and drop the document from the model cache.
+
+    Args:
+        service: Google Docs API service instance
+        document_id: ID of the document to update
+        requests: List of Docs API requests
+        required_revision_id: Fail instead of applying if the document has
+            changed since this revision
+        http: Optional transport to execute with (see core.batching.new_authorized_http)
+
+    Returns:
+        The batchUpdate response
+    """
+    body: Dict[str, Any] = {'requests': requests}
+    if required_revision_id:
+        body['writeControl'] = {'requiredRevisionId': required_revision_id}
+    try:
+        return await asyncio.to_thread(
+            service.documents().batchUpdate(
+                documentId=document_id,
+                body=body
+            ).execute,
+            http=http,
+        )
+    finally:
+        # Invalidate even on errors: a failed call may still have been applied
+        get_document_model_cache().invalidate(document_id)
@@ -0,0 +1,392 @@
+"""
+Minimal-Diff Text Updates for Google Docs
+
+Computes the smallest set of deleteContentRange / insertText requests that
+turn a document's current text into a desired text, so unchanged text keeps
+its formatting and the request payload scales with the size of the change.
+
+The diff is Myers' O(ND) algorithm in its linear-space form (recursing on
+the middle snake). It runs on lines first, then refines each changed block
+at character level when the block is small enough. Requests are emitted from
+the end of the document backwards, so every index refers to the document as
+it was read.
+
+Only the text of top-level paragraphs is diffed; tables are kept out of the
+text model. The API rejects deleting the newline that ends the paragraph
+right before a table, so edits are arranged to keep that newline when the
+same text can be reached another way, and refused otherwise.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from gdocs.docs_helpers import create_delete_range_request, create_insert_text_request
+
+logger = logging.getLogger(__name__)
+
+# Changed line blocks up to this many characters (both sides) are refined per character
+DIFF_CHAR_REFINE_LIMIT = 20_000
+
+# Fields mask for reading body text with the indices needed to map it, plus
+# the cell text of top-level tables (to recognise table text in new text)
+DOC_DIFF_FIELDS = (
+    "revisionId,body(content(startIndex,endIndex,"
+    "paragraph(elements(startIndex,endIndex,textRun(content))),"
+    "table(tableRows(tableCells(content(paragraph(elements(textRun(content)))))))))"
+)
+
+# Characters of the current text shown in a dry run
+DIFF_PREVIEW_MAX_CHARS = 10000
+
+# Hunk: (a_start, a_end, b_start, b_end) for a changed region; equal regions are omitted
+Hunk = Tuple[int, int, int, int]
+
+
+def _middle_snake(
+    a: Sequence[Any], alo: int, ahi: int, b: Sequence[Any], blo: int, bhi: int
+) -> Tuple[int, int, int, int]:
+    """
+    Find the middle snake of the shortest edit script between a[alo:ahi] and b[blo:bhi].
+
+    Returns:
+        (x_start, y_start, x_end, y_end) of the snake, relative to alo/blo
+    """
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta % 2 != 0
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            # Backward diagonal k' = delta - k has been explored up to d - 1
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + backward[offset + delta - k] >= n:
+                return x_start, y_start, x, y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + forward[offset + delta - k] >= n:
+                return n - x, m - y, n - x_start, m - y_start
+
+    raise RuntimeError("Middle snake not found")  # Unreachable for valid input
+
+
+def myers_diff(a: Sequence[Any], b: Sequence[Any]) -> List[Hunk]:
+    """
+    Diff two sequences with linear-space Myers.
+
+    Returns:
+        Changed regions as (a_start, a_end, b_start, b_end), in order
+    """
+    hunks: List[Hunk] = []
+    # Explicit stack of subproblems, processed left to right
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if alo == ahi or blo == bhi:
+            if alo < ahi or blo < bhi:
+                hunks.append((alo, ahi, blo, bhi))
+            continue
+        x_start, y_start, x_end, y_end = _middle_snake(a, alo, ahi, b, blo, bhi)
+        stack.append((alo + x_end, ahi, blo + y_end, bhi))
+        stack.append((alo, alo + x_start, blo, blo + y_start))
+    return _merge_hunks(hunks)
+
+
+def _merge_hunks(hunks: List[Hunk]) -> List[Hunk]:
+    merged: List[Hunk] = []
+    for hunk in hunks:
+        if merged and merged[-1][1] == hunk[0] and merged[-1][3] == hunk[2]:
+            previous = merged[-1]
+            merged[-1] = (previous[0], hunk[1], previous[2], hunk[3])
+        else:
+            merged.append(hunk)
+    return merged
+
+
+def _line_offsets(lines: List[str]) -> List[int]:
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def diff_text(old: str, new: str, refine_limit: int = DIFF_CHAR_REFINE_LIMIT) -> List[Hunk]:
+    """
+    Diff two texts by line, refining small changed blocks per character.
+
+    Returns:
+        Changed character regions as (old_start, old_end, new_start, new_end)
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    old_offsets = _line_offsets(old_lines)
+    new_offsets = _line_offsets(new_lines)
+
+    hunks: List[Hunk] = []
+    for a0, a1, b0, b1 in myers_diff(old_lines, new_lines):
+        start_a, end_a = old_offsets[a0], old_offsets[a1]
+        start_b, end_b = new_offsets[b0], new_offsets[b1]
+        if start_a < end_a and start_b < end_b and (end_a - start_a) + (end_b - start_b) <= refine_limit:
+            hunks.extend(
+                (start_a + x0, start_a + x1, start_b + y0, start_b + y1)
+                for x0, x1, y0, y1 in myers_diff(old[start_a:end_a], new[start_b:end_b])
+            )
+        else:
+            hunks.append((start_a, end_a, start_b, end_b))
+    return _merge_hunks(hunks)
+
+
+class DocTable:
+    """A top-level table inside the modelled range."""
+
+    def __init__(self, start_index: int, end_index: int, position: int, lines: List[str]):
+        self.start_index = start_index
+        self.end_index = end_index
+        # Number of model characters before the table
+        self.position = position
+        # Non-blank cell paragraphs, as get_doc_content prints them
+        self.lines = lines
+
+
+class DocTextModel:
+    """
+    Plain text of a document body range with the Docs index of every character.
+
+    Only text runs of top-level paragraphs are included; tables, images and
+    other non-text elements are left out of the text and are never touched
+    by the generated edits.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        indices: List[int],
+        end_index: int,
+        reaches_body_end: bool,
+        tables: Optional[List[DocTable]] = None,
+    ):
+        self.text = text
+        self.indices = indices
+        # Index just after the last character (where appended text goes)
+        self.end_index = end_index
+        # Whether the range runs up to the body's final (excluded) newline
+        self.reaches_body_end = reaches_body_end
+        self.tables = tables or []
+
+    def table_breaks(self) -> Dict[int, DocTable]:
+        """Model positions of the newlines that directly precede a table (these cannot be deleted)."""
+        breaks = {}
+        for table in self.tables:
+            position = table.position - 1
+            if position >= 0 and self.text[position] == "\n" and self.indices[position] + 1 == table.start_index:
+                breaks[position] = table
+        return breaks
+
+    def tables_in_text(self, text: str) -> List[DocTable]:
+        """
+        Tables whose cell text appears as lines of text but not in the model.
+
+        Text copied from get_doc_content includes table cells as plain lines;
+        diffing it against the model would insert them again as paragraphs.
+        """
+        lines = set(text.splitlines(keepends=True))
+        model_lines = set(self.text.splitlines(keepends=True))
+        found = []
+        for table in self.tables:
+            cell_lines = [line for line in table.lines if line not in model_lines]
+            if cell_lines and 2 * sum(line in lines for line in cell_lines) >= len(cell_lines):
+                found.append(table)
+        return found
+
+
+def _table_lines(table: Dict[str, Any]) -> List[str]:
+    lines = []
+    for row in table.get("tableRows", []):
+        for cell in row.get("tableCells", []):
+            for element in cell.get("content", []):
+                line = "".join(
+                    pe["textRun"].get("content", "")
+                    for pe in element.get("paragraph", {}).get("elements", [])
+                    if "textRun" in pe
+                )
+                if line and not line.isspace():
+                    lines.append(line)
+    return lines
+
+
+def build_text_model(
+    doc: Dict[str, Any],
+    start_index: Optional[int] = None,
+    end_index: Optional[int] = None,
+) -> DocTextModel:
+    """
+    Build the text model for a document body, optionally limited to [start_index, end_index).
+
+    The final newline of the body can never be deleted, so it is excluded.
+    """
+    content = doc.get("body", {}).get("content", [])
+    body_end = content[-1].get("endIndex", 1) if content else 1
+    chars: List[str] = []
+    indices: List[int] = []
+    tables: List[DocTable] = []
+    last_end = start_index or 1
+
+    for element in content:
+        paragraph = element.get("paragraph")
+        if paragraph is None:
+            table_start, table_end = element.get("startIndex", 0), element.get("endIndex", 0)
+            if (
+                "table" in element
+                and (start_index is None or table_start >= start_index)
+                and (end_index is None or table_end <= end_index)
+            ):
+                tables.append(DocTable(table_start, table_end, len(chars), _table_lines(element["table"])))
+            continue
+        for pe in paragraph.get("elements", []):
+            run = pe.get("textRun")
+            if not run or "content" not in run:
+                continue
+            index = pe.get("startIndex", 0)
+            for ch in run["content"]:
+                # Docs indices count UTF-16 code units
+                width = 2 if ord(ch) > 0xFFFF else 1
+                if (start_index is None or index >= start_index) and (end_index is None or index + width <= end_index):
+                    if index + width < body_end:
+                        chars.append(ch)
+                        indices.append(index)
+                        last_end = index + width
+                index += width
+
+    reaches_body_end = end_index is None or end_index >= body_end - 1
+    return DocTextModel("".join(chars), indices, last_end, reaches_body_end, tables)
+
+
+def _protect_table_breaks(model: DocTextModel, new_text: str, hunks: List[Hunk]) -> List[Hunk]:
+    """
+    Rewrite hunks so the newline before each table is never deleted.
+
+    A hunk covering such a newline is split around it. The newline it would
+    have deleted is balanced by a newline of the replacement text, or, when
+    there is none, by deleting an adjacent newline instead (the resulting
+    text is the same either way).
+
+    Raises:
+        ValueError: If the result cannot be reached without deleting a table's preceding newline
+    """
+    breaks = model.table_breaks()
+    if not breaks:
+        return hunks
+    text = model.text
+    result: List[Hunk] = []
+    for position_in_list, hunk in enumerate(hunks):
+        next_start = hunks[position_in_list + 1][0] if position_in_list + 1 < len(hunks) else len(text)
+        a0, a1, b0, b1 = hunk
+        protected = sorted(position for position in breaks if a0 <= position < a1)
+        for number, q in enumerate(protected):
+            replacement = new_text[b0:b1]
+            newlines = [offset for offset, ch in enumerate(replacement) if ch == "\n"]
+            floor = result[-1][1] if result else 0
+            if newlines:
+                # The last table in the hunk takes the last newline, so text before it stays before it
+                n = b0 + (newlines[-1] if number == len(protected) - 1 else newlines[0])
+                head, (a0, a1, b0, b1) = (a0, q, b0, n), (q + 1, a1, n + 1, b1)
+            elif b0 == b1 and a0 - 1 >= floor and text[a0 - 1] == "\n" and a0 - 1 not in breaks:
+                # Delete the newline just before the range instead of the table's
+                head, (a0, a1, b0, b1) = (a0 - 1, q, b0, b0), (q + 1, a1, b0, b1)
+            elif a1 < next_start and text[a1] == "\n" and a1 not in breaks:
+                # Delete the newline just after the range instead of the table's
+                head, (a0, a1, b0, b1) = (a0, q, b0, b1), (q + 1, a1 + 1, b1, b1)
+            else:
+                raise ValueError(
+                    f"The edit would delete the paragraph break before the table at index "
+                    f"{breaks[q].start_index}, which Google Docs does not allow. Keep a paragraph "
+                    "before the table, or delete the table separately."
+                )
+            if head[0] < head[1] or head[2] < head[3]:
+                result.append(head)
+        if a0 < a1 or b0 < b1:
+            result.append((a0, a1, b0, b1))
+    return result
+
+
+def build_diff_requests(model: DocTextModel, new_text: str) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Build the requests that change the model's text into new_text.
+
+    Returns:
+        Tuple of (requests in execution order, statistics)
+
+    Raises:
+        ValueError: If the edit would delete the paragraph break before a table
+    """
+    old_text = model.text
+    if model.reaches_body_end and new_text.endswith("\n"):
+        # The body's final newline is kept outside the model
+        new_text = new_text[:-1]
+    hunks = _protect_table_breaks(model, new_text, diff_text(old_text, new_text))
+    requests: List[Dict[str, Any]] = []
+    stats = {"hunks": len(hunks), "deleted_chars": 0, "inserted_chars": 0}
+
+    # Last hunk first: edits never move the indices of text before them
+    for a0, a1, b0, b1 in reversed(hunks):
+        if a1 > a0:
+            ranges = _char_ranges(model, a0, a1)
+            for start, end in reversed(ranges):
+                requests.append(create_delete_range_request(start, end))
+            stats["deleted_chars"] += a1 - a0
+        if b1 > b0:
+            insert_text = new_text[b0:b1]
+            if a0 < len(model.indices):
+                index = model.indices[a0]
+            elif old_text.endswith("\n") and insert_text.endswith("\n"):
+                # Appending after a final newline: insert before it so the text
+                # stays in a paragraph rather than landing on an element boundary
+                index = model.indices[-1]
+                insert_text = "\n" + insert_text[:-1]
+            else:
+                index = model.end_index
+            requests.append(create_insert_text_request(index, insert_text))
+            stats["inserted_chars"] += b1 - b0
+
+    return requests, stats
+
+
+def _char_ranges(model: DocTextModel, a0: int, a1: int) -> List[Tuple[int, int]]:
+    """Document index ranges covered by model characters a0..a1 (UTF-16 aware)."""
+    ranges: List[Tuple[int, int]] = []
+    for position in range(a0, a1):
+        start = model.indices[position]
+        end = start + (2 if ord(model.text[position]) > 0xFFFF else 1)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
@@ -285,6 +285,56 @@ def create_bullet_list_request(
         }
     }
 
+def create_paragraph_style_request(
+    start_index: int,
+    end_index: int,
+    named_style_type: str = "NORMAL_TEXT"
+) -> Dict[str, Any]:
+    """
+    Create an updateParagraphStyle request setting a named style for Google Docs API.
+    
+    Args:
+        start_index: Start of the paragraph range
+        end_index: End of the paragraph range
+        named_style_type: Named style ("NORMAL_TEXT", "TITLE", "HEADING_1" ... "HEADING_6")
+    
+    Returns:
+        Dictionary representing the updateParagraphStyle request
+    """
+    return {
+        'updateParagraphStyle': {
+            'range': {
+                'startIndex': start_index,
+                'endIndex': end_index
+            },
+            'paragraphStyle': {'namedStyleType': named_style_type},
+            'fields': 'namedStyleType'
+        }
+    }
+
+def create_link_request(start_index: int, end_index: int, url: str) -> Dict[str, Any]:
+    """
+    Create an updateTextStyle request that turns a text range into a link.
+    
+    Args:
+        start_index: Start position of the link text
+        end_index: End position of the link text
+        url: Link target
+    
+    Returns:
+        Dictionary representing the updateTextStyle request
+    """
+    return {
+        'updateTextStyle': {
+            'range': {
+                'startIndex': start_index,
+                'endIndex': end_index
+            },
+            'textStyle': {'link': {'url': url}},
+            'fields': 'link'
+        }
+    }
+
 def validate_operation(operation: Dict[str, Any]) -> Tuple[bool, str]:
     """
     Validate a batch operation dictionary.
@@ -0,0 +1,366 @@
+"""
+Markdown to Google Docs Renderer
+
+Compiles Markdown (headings, paragraphs, bold/italic/code/links, bulleted
+and numbered lists, tables, code blocks and page breaks) into Docs API
+requests that insert the whole document at one index.
+
+Blocks are emitted from last to first, all inserted at the same index. Every
+block's styling requests follow its own insertion while its indices are
+still exact; blocks inserted afterwards land in front of it, and styles
+travel with the text. No request ever depends on the length of another
+block, so tables (whose index layout is fixed by their dimensions) need no
+document re-read, and the request list can be cut between blocks into
+several batchUpdates without breaking index math.
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from gdocs.docs_helpers import (
+    create_bullet_list_request,
+    create_format_text_request,
+    create_insert_page_break_request,
+    create_insert_table_request,
+    create_insert_text_request,
+    create_link_request,
+    create_paragraph_style_request,
+)
+
+logger = logging.getLogger(__name__)
+
+# Limits per batchUpdate when a rendered document has to be split
+MARKDOWN_MAX_REQUESTS_PER_BATCH = 5000
+MARKDOWN_MAX_CHARS_PER_BATCH = 1_000_000
+
+CODE_FONT_FAMILY = "Courier New"
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_NUMBERED = re.compile(r"^(\s*)\d+[.)]\s+(.*)$")
+_PAGE_BREAK = re.compile(r"^\s*(?:(?:-\s*){3,}|(?:\*\s*){3,}|(?:_\s*){3,}|\\pagebreak)\s*$")
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+_INLINE = re.compile(
+    r"`(?P<code>[^`]+)`"
+    r"|\[(?P<link_text>[^\]]+)\]\((?P<url>[^)\s]+)\)"
+    r"|\*\*\*(?P<bold_italic>.+?)\*\*\*"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|__(?P<bold2>.+?)__"
+    r"|\*(?P<italic>[^*\s](?:.*?[^*\s])?)\*"
+    r"|(?<!\w)_(?P<italic2>[^_\s](?:.*?[^_\s])?)_(?!\w)"
+)
+
+# Inline span: (start, end, style) with style keys bold/italic/code/url
+Span = Tuple[int, int, Dict[str, Any]]
+
+
+def parse_inline(text: str) -> Tuple[str, List[Span]]:
+    """
+    Strip inline Markdown markers from a line.
+
+    Returns:
+        Tuple of (plain text, list of styled spans relative to the plain text)
+    """
+    parts: List[str] = []
+    spans: List[Span] = []
+    length = 0
+    position = 0
+    for match in _INLINE.finditer(text):
+        before = text[position:match.start()]
+        parts.append(before)
+        length += len(before)
+        groups = match.groupdict()
+        if groups["code"] is not None:
+            content, style = groups["code"], {"code": True}
+        elif groups["link_text"] is not None:
+            content, style = groups["link_text"], {"url": groups["url"]}
+        elif groups["bold_italic"] is not None:
+            content, style = groups["bold_italic"], {"bold": True, "italic": True}
+        elif groups["bold"] is not None or groups["bold2"] is not None:
+            content, style = groups["bold"] or groups["bold2"], {"bold": True}
+        else:
+            content, style = groups["italic"] or groups["italic2"], {"italic": True}
+        parts.append(content)
+        spans.append((length, length + len(content), style))
+        length += len(content)
+        position = match.end()
+    parts.append(text[position:])
+    return "".join(parts), spans
+
+
+def _split_table_row(line: str) -> List[str]:
+    stripped = line.strip()
+    if stripped.startswith("|"):
+        stripped = stripped[1:]
+    if stripped.endswith("|"):
+        stripped = stripped[:-1]
+    return [cell.strip() for cell in stripped.split("|")]
+
+
+def parse_markdown(markdown: str) -> List[Dict[str, Any]]:
+    """
+    Parse Markdown into a flat list of blocks.
+
+    Block dicts have a "kind" of "paragraph" (with "text", "style" such as
+    NORMAL_TEXT or HEADING_2, optional "list" of UNORDERED/ORDERED and
+    "level", and "code" for code block lines), "table" (with "rows") or
+    "page_break".
+    """
+    blocks: List[Dict[str, Any]] = []
+    lines = markdown.replace("\r\n", "\n").split("\n")
+    pending: List[str] = []  # Lines of the paragraph being collected
+
+    def _flush() -> None:
+        if pending:
+            blocks.append({"kind": "paragraph", "text": " ".join(pending), "style": "NORMAL_TEXT"})
+            pending.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if _FENCE.match(line):
+            _flush()
+            fence = _FENCE.match(line).group(1)
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(fence):
+                blocks.append({"kind": "paragraph", "text": lines[i], "style": "NORMAL_TEXT", "code": True})
+                i += 1
+            i += 1
+            continue
+
+        if not stripped:
+            _flush()
+        elif stripped.startswith("|") and i + 1 < len(lines) and _TABLE_SEPARATOR.match(lines[i + 1]):
+            _flush()
+            rows = [_split_table_row(line)]
+            i += 2
+            while i < len(lines) and lines[i].strip().startswith("|"):
+                rows.append(_split_table_row(lines[i]))
+                i += 1
+            columns = max(len(row) for row in rows)
+            blocks.append({"kind": "table", "rows": [row + [""] * (columns - len(row)) for row in rows]})
+            continue
+        elif _PAGE_BREAK.match(line):
+            _flush()
+            blocks.append({"kind": "page_break"})
+        elif _HEADING.match(line):
+            _flush()
+            hashes, text = _HEADING.match(line).groups()
+            blocks.append({"kind": "paragraph", "text": text, "style": f"HEADING_{len(hashes)}"})
+        elif _BULLET.match(line) or _NUMBERED.match(line):
+            _flush()
+            match = _BULLET.match(line)
+            list_type = "UNORDERED" if match else "ORDERED"
+            indent, text = (match or _NUMBERED.match(line)).groups()
+            level = len(indent.expandtabs(4)) // 2
+            blocks.append({
+                "kind": "paragraph", "text": text, "style": "NORMAL_TEXT", "list": list_type, "level": level
+            })
+        else:
+            pending.append(stripped[1:].strip() if stripped.startswith(">") else stripped)
+        i += 1
+
+    _flush()
+    return blocks
+
+
+def _span_requests(spans: List[Span], offset: int) -> List[Dict[str, Any]]:
+    requests = []
+    for start, end, style in spans:
+        if end <= start:
+            continue
+        if "url" in style:
+            requests.append(create_link_request(offset + start, offset + end, style["url"]))
+        elif style.get("code"):
+            requests.append(create_format_text_request(offset + start, offset + end, font_family=CODE_FONT_FAMILY))
+        else:
+            requests.append(create_format_text_request(
+                offset + start, offset + end, bold=style.get("bold"), italic=style.get("italic")
+            ))
+    return requests
+
+
+def _render_paragraphs(paragraphs: List[Dict[str, Any]], index: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Requests for a run of consecutive paragraph blocks inserted at index."""
+    texts: List[str] = []
+    styles: List[Dict[str, Any]] = []
+    bullet_ranges: List[Tuple[int, int, str]] = []
+    length = 0
+
+    for block in paragraphs:
+        if block.get("code"):
+            plain, spans = block["text"], [(0, len(block["text"]), {"code": True})]
+        else:
+            plain, spans = parse_inline(block["text"])
+        # Leading tabs set the nesting level of list items; createParagraphBullets removes them
+        prefix = "\t" * block.get("level", 0) if block.get("list") else ""
+        start = index + length
+        text_start = start + len(prefix)
+        texts.append(f"{prefix}{plain}\n")
+        length += len(prefix) + len(plain) + 1
+        end = index + length
+
+        if block["style"] != "NORMAL_TEXT":
+            styles.append(create_paragraph_style_request(start, end, block["style"]))
+        styles.extend(_span_requests(spans, text_start))
+
+        list_type = block.get("list")
+        if list_type:
+            if bullet_ranges and bullet_ranges[-1][1] == start and bullet_ranges[-1][2] == list_type:
+                bullet_ranges[-1] = (bullet_ranges[-1][0], end, list_type)
+            else:
+                bullet_ranges.append((start, end, list_type))
+
+    end = index + length
+    requests = [
+        create_insert_text_request(index, "".join(texts)),
+        # Inserted text inherits the style around the insertion point; reset it first
+        create_paragraph_style_request(index, end, "NORMAL_TEXT"),
+        create_format_text_request(index, end, bold=False, italic=False, underline=False),
+    ]
+    requests.extend(styles)
+    # Bullets last and bottom-up: removing nesting tabs only shifts text below the list
+    requests.extend(
+        create_bullet_list_request(start, end, list_type) for start, end, list_type in reversed(bullet_ranges)
+    )
+    return requests, length
+
+
+def table_cell_index(table_index: int, columns: int, row: int, column: int) -> int:
+    """
+    Index of the first paragraph of an empty table's cell after insertTable at table_index.
+
+    insertTable adds a newline at table_index, the table start at +1, and
+    each row (a row marker plus two indices per cell) after that.
+    """
+    return table_index + 4 + row * (2 * columns + 1) + 2 * column
+
+
+def _render_table(rows: List[List[str]], index: int) -> List[Dict[str, Any]]:
+    """Requests inserting and filling a table at index, header row bold."""
+    columns = len(rows[0])
+    requests = [create_insert_table_request(index, len(rows), columns)]
+    # Fill cells bottom-up so each insertion leaves earlier cell indices untouched
+    for r in range(len(rows) - 1, -1, -1):
+        for c in range(columns - 1, -1, -1):
+            plain, spans = parse_inline(rows[r][c])
+            if not plain:
+                continue
+            cell_index = table_cell_index(index, columns, r, c)
+            requests.append(create_insert_text_request(cell_index, plain))
+            if r == 0:
+                requests.append(create_format_text_request(cell_index, cell_index + len(plain), bold=True))
+            requests.extend(_span_requests(spans, cell_index))
+    return requests
+
+
+def _group_blocks(blocks: List[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """Group consecutive paragraph blocks so each run is a single insertText."""
+    groups: List[Tuple[str, Any]] = []
+    for block in blocks:
+        if block["kind"] == "paragraph":
+            if groups and groups[-1][0] == "paragraphs":
+                groups[-1][1].append(block)
+            else:
+                groups.append(("paragraphs", [block]))
+        else:
+            groups.append((block["kind"], block))
+    return groups
+
+
+def _split_paragraph_run(
+    paragraphs: List[Dict[str, Any]], max_requests: int, max_chars: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    Split a long run of paragraphs into chunks that each fit in one batch.
+
+    Chunks are never cut inside a list, so numbering is not restarted.
+    """
+    chunks: List[List[Dict[str, Any]]] = [[]]
+    requests = chars = 0
+    for block in paragraphs:
+        # insertText share, style reset, heading style and one request per inline span (estimate)
+        block_requests = 2 + len(_INLINE.findall(block["text"]))
+        block_chars = len(block["text"]) + block.get("level", 0) + 1
+        current = chunks[-1]
+        continues_list = bool(current) and block.get("list") and current[-1].get("list") == block.get("list")
+        if current and not continues_list and (
+            requests + block_requests > max_requests - 3 or chars + block_chars > max_chars
+        ):
+            chunks.append([])
+            requests = chars = 0
+        chunks[-1].append(block)
+        requests += block_requests
+        chars += block_chars
+    return chunks
+
+
+def _request_chars(requests: List[Dict[str, Any]]) -> int:
+    return sum(len(r["insertText"]["text"]) for r in requests if "insertText" in r)
+
+
+def render_markdown(
+    markdown: str,
+    index: int,
+    max_requests: int = MARKDOWN_MAX_REQUESTS_PER_BATCH,
+    max_chars: int = MARKDOWN_MAX_CHARS_PER_BATCH,
+) -> Tuple[List[List[Dict[str, Any]]], Dict[str, int]]:
+    """
+    Render Markdown into batchUpdate request lists that insert it at index.
+
+    Args:
+        markdown: Markdown source
+        index: Document index to insert at (start of a paragraph in the body)
+        max_requests: Maximum requests per batch
+        max_chars: Maximum inserted characters per batch
+
+    Returns:
+        Tuple of (batches to send in order, statistics)
+    """
+    blocks = parse_markdown(markdown)
+    stats = {"paragraphs": 0, "tables": 0, "page_breaks": 0, "characters": 0}
+
+    # Render each group as a self-contained unit, last group first
+    units: List[List[Dict[str, Any]]] = []
+    for kind, payload in reversed(_group_blocks(blocks)):
+        if kind == "paragraphs":
+            stats["paragraphs"] += len(payload)
+            for chunk in reversed(_split_paragraph_run(payload, max_requests, max_chars)):
+                requests, length = _render_paragraphs(chunk, index)
+                stats["characters"] += length
+                units.append(requests)
+            continue
+        elif kind == "table":
+            requests = _render_table(payload["rows"], index)
+            stats["tables"] += 1
+        else:
+            requests = [create_insert_page_break_request(index)]
+            stats["page_breaks"] += 1
+        units.append(requests)
+
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_chars = 0
+    for unit in units:
+        unit_chars = _request_chars(unit)
+        if current and (len(current) + len(unit) > max_requests or current_chars + unit_chars > max_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.extend(unit)
+        current_chars += unit_chars
+    if current:
+        batches.append(current)
+    return batches, stats
+
+
+def document_end_index(doc: Dict[str, Any]) -> Optional[int]:
+    """Index just before the body's final newline, where appended content goes."""
+    content = doc.get("body", {}).get("content", [])
+    if not content:
+        return None
+    return max(1, content[-1].get("endIndex", 2) - 1)
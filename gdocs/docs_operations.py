@@ -0,0 +1,162 @@
+"""
+Google Docs Batch Operation Compiler
+
+Prepares batch_update_doc operations so that a whole editing session can be
+sent as one minimal batchUpdate.
+
+Two index modes are supported:
+- "sequential": every operation's indices refer to the document as left by
+  the operations before it (the Docs API's own semantics).
+- "original": every index refers to the document as it was before the batch,
+  so callers can list edits in natural top-to-bottom order. Operations are
+  rebased by reordering: formatting of existing text runs first, positional
+  edits then run from the highest index down so no edit shifts a position
+  still to be used, and find/replace runs last.
+
+In both modes consecutive format_text operations with identical styling and
+touching or overlapping ranges are merged into one request.
+"""
+
+import logging
+from typing import Any, Dict, List, Literal, Tuple
+
+logger = logging.getLogger(__name__)
+
+FORMAT_FIELDS = ("bold", "italic", "underline", "font_size", "font_family")
+
+# Operations that change document length at a single anchor index
+_INSERT_TYPES = ("insert_text", "insert_table", "insert_page_break")
+
+
+def has_inline_format(op: Dict[str, Any]) -> bool:
+    """Whether an insert/replace operation carries formatting for its new text."""
+    return any(op.get(field) is not None for field in FORMAT_FIELDS)
+
+
+def _format_key(op: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(op.get(field) for field in FORMAT_FIELDS)
+
+
+def merge_format_operations(operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge consecutive format_text operations with the same styling.
+
+    Only directly consecutive operations are merged, so the order in which
+    overlapping, differently styled ranges are applied is preserved.
+
+    Args:
+        operations: Validated operation dictionaries
+
+    Returns:
+        New list of operations with merged formatting ranges
+    """
+    merged: List[Dict[str, Any]] = []
+    for op in operations:
+        previous = merged[-1] if merged else None
+        if (
+            op.get('type') == 'format_text'
+            and previous is not None
+            and previous.get('type') == 'format_text'
+            and _format_key(previous) == _format_key(op)
+            and op['start_index'] <= previous['end_index']
+            and previous['start_index'] <= op['end_index']
+        ):
+            merged[-1] = dict(
+                previous,
+                start_index=min(previous['start_index'], op['start_index']),
+                end_index=max(previous['end_index'], op['end_index']),
+            )
+            continue
+        merged.append(op)
+    return merged
+
+
+def _anchor(op: Dict[str, Any]) -> int:
+    return op['index'] if op['type'] in _INSERT_TYPES else op['start_index']
+
+
+def order_for_original_indices(operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Reorder operations whose indices all refer to the pre-batch document.
+
+    Positional edits are sorted by descending anchor index. At the same index,
+    deletions run before insertions, and insertions run in reverse order so
+    that text listed first ends up first.
+
+    Args:
+        operations: Validated operation dictionaries in the caller's order
+
+    Returns:
+        Operations in an order the Docs API can apply sequentially
+
+    Raises:
+        ValueError: If edits overlap (e.g. an insertion inside a deleted range)
+    """
+    formats, edits, replacements = [], [], []
+    for position, op in enumerate(operations):
+        op_type = op['type']
+        if op_type == 'format_text':
+            formats.append(op)
+        elif op_type == 'find_replace':
+            replacements.append(op)
+        elif op_type == 'replace_text':
+            # Split so the insertion is ordered like any other insert at that index
+            edits.append((position, {'type': 'delete_text', 'start_index': op['start_index'], 'end_index': op['end_index']}))
+            if op['text']:
+                insert = {'type': 'insert_text', 'index': op['start_index'], 'text': op['text']}
+                insert.update((field, op[field]) for field in FORMAT_FIELDS if op.get(field) is not None)
+                edits.append((position, insert))
+        else:
+            edits.append((position, op))
+
+    # Deleted ranges in original coordinates, to reject conflicting edits
+    deleted = sorted(
+        (op['start_index'], op['end_index'], position)
+        for position, op in edits
+        if op['type'] == 'delete_text'
+    )
+    for (start, end, first), (next_start, _, second) in zip(deleted, deleted[1:]):
+        if next_start < end:
+            raise ValueError(
+                f"Operations {first + 1} and {second + 1} delete overlapping ranges "
+                f"({start}-{end} and {next_start}-...)"
+            )
+    for position, op in edits:
+        if op['type'] in _INSERT_TYPES:
+            for start, end, delete_position in deleted:
+                if start < op['index'] < end:
+                    raise ValueError(
+                        f"Operation {position + 1} inserts at {op['index']}, inside the range "
+                        f"{start}-{end} deleted by operation {delete_position + 1}"
+                    )
+
+    def _sort_key(item: Tuple[int, Dict[str, Any]]) -> Tuple[int, int, int]:
+        position, op = item
+        # Deletions first, then insertions with the last-listed running first
+        is_insert = 1 if op['type'] in _INSERT_TYPES else 0
+        return (-_anchor(op), is_insert, -position if is_insert else position)
+
+    ordered = [op for _, op in sorted(edits, key=_sort_key)]
+    return formats + ordered + replacements
+
+
+def compile_operations(
+    operations: List[Dict[str, Any]],
+    index_mode: Literal["sequential", "original"] = "sequential",
+) -> List[Dict[str, Any]]:
+    """
+    Compile validated operations for a single batchUpdate.
+
+    Args:
+        operations: Validated operation dictionaries
+        index_mode: "sequential" or "original" (see module docstring)
+
+    Returns:
+        Operations in execution order, with formatting ranges merged
+    """
+    if index_mode == "original":
+        operations = order_for_original_indices(operations)
+    compiled = merge_format_operations(operations)
+    if len(compiled) != len(operations):
+        logger.debug(f"Merged {len(operations) - len(compiled)} formatting operations")
+    return compiled
@@ -167,18 +167,23 @@ def _parse_segment(segment_data: dict[str, Any]) -> dict[str, Any]:
     }
 
 
-def find_tables(doc_data: dict[str, Any]) -> list[dict[str, Any]]:
+def find_tables(
+    doc_data: dict[str, Any],
+    structure: Optional[dict[str, Any]] = None
+) -> list[dict[str, Any]]:
     """
     Find all tables in the document with their positions and dimensions.
     
     Args:
         doc_data: Raw document data from Google Docs API
+        structure: Already parsed structure of doc_data, to avoid parsing it again
     
     Returns:
         List of table information dictionaries
     """
     tables = []
-    structure = parse_document_structure(doc_data)
+    if structure is None:
+        structure = parse_document_structure(doc_data)
     
     for idx, table_info in enumerate(structure['tables']):
         tables.append({
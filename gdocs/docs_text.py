@@ -0,0 +1,219 @@
+"""
+Google Docs Text Extraction
+
+Turns documents.get responses into plain text. Documents are requested with
+a fields mask that keeps only text runs, table cells and tab structure, so
+styling never crosses the wire. The element tree is walked iteratively (no
+recursion limit on nested tables), output pieces are collected in a list and
+joined once, and extraction can be limited to selected tabs or a character
+window, stopping as soon as the window is filled.
+"""
+
+import asyncio
+import itertools
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TAB_HEADER_FORMAT = "\n--- TAB: {tab_name} ---\n"
+
+# Nested tables deeper than this are still returned, just with their full content
+DOC_TEXT_TABLE_MASK_DEPTH = 3
+# Docs allows tabs to be nested up to three levels below a top-level tab
+DOC_TAB_MASK_DEPTH = 4
+
+_TAB_PROPERTIES_FIELDS = "tabProperties(tabId,title,index,nestingLevel)"
+
+
+def _content_mask(depth: int = DOC_TEXT_TABLE_MASK_DEPTH) -> str:
+    """Fields mask for structural element content: text runs and table cells only."""
+    if depth <= 0:
+        return "content"
+    return (
+        "content(paragraph(elements(textRun(content))),"
+        f"table(tableRows(tableCells({_content_mask(depth - 1)}))))"
+    )
+
+
+def _tab_mask(depth: int, with_content: bool) -> str:
+    parts = [_TAB_PROPERTIES_FIELDS]
+    if with_content:
+        parts.append(f"documentTab(body({_content_mask()}))")
+    if depth > 1:
+        parts.append(f"childTabs({_tab_mask(depth - 1, with_content)})")
+    return ",".join(parts)
+
+
+# Mask for reading text, for use with includeTabsContent=True
+DOC_TEXT_FIELDS = f"title,revisionId,body({_content_mask()}),tabs({_tab_mask(DOC_TAB_MASK_DEPTH, True)})"
+
+# Mask for listing tabs without any content, for use with includeTabsContent=True
+DOC_TAB_LIST_FIELDS = f"title,tabs({_tab_mask(DOC_TAB_MASK_DEPTH, False)})"
+
+
+class DocTextResult:
+    """
+    Extracted text plus window information.
+
+    `next_char` is the offset to continue from when the window was filled
+    before the end of the document, else None.
+    """
+
+    def __init__(self, text: str, start_char: int, next_char: Optional[int], tab_count: int):
+        self.text = text
+        self.start_char = start_char
+        self.next_char = next_char
+        self.tab_count = tab_count
+
+    @property
+    def truncated(self) -> bool:
+        return self.next_char is not None
+
+
+class _WindowWriter:
+    """Collects output pieces that fall inside [start, start + max_chars)."""
+
+    def __init__(self, start: int, max_chars: Optional[int]):
+        self.start = start
+        self.end = start + max_chars if max_chars is not None else None
+        self.position = 0
+        self.parts: List[str] = []
+        self.full = False
+        # Set once output arrives past a filled window: there is more to read
+        self.more = False
+
+    def write(self, piece: str) -> None:
+        if self.end is None and not self.start:
+            self.parts.append(piece)
+            return
+        if self.full:
+            self.more = True
+            return
+        piece_start = self.position
+        self.position += len(piece)
+        if self.position <= self.start:
+            return
+        if self.end is not None and self.position >= self.end:
+            self.full = True
+            self.more = self.position > self.end
+        lo = max(0, self.start - piece_start)
+        hi = len(piece) if self.end is None else min(len(piece), self.end - piece_start)
+        self.parts.append(piece[lo:hi] if lo or hi < len(piece) else piece)
+
+
+def _cell_contents(table: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """All structural elements of a table's cells, in reading order."""
+    return itertools.chain.from_iterable(
+        cell.get("content", [])
+        for row in table.get("tableRows", [])
+        for cell in row.get("tableCells", [])
+    )
+
+
+def _write_elements(elements: Iterable[Dict[str, Any]], writer: _WindowWriter) -> None:
+    """Write the non-blank paragraphs of a content list, descending into tables."""
+    stack = [iter(elements)]
+    write = writer.write
+    while stack and not writer.more:
+        for element in stack[-1]:
+            paragraph = element.get("paragraph")
+            if paragraph is not None:
+                line = "".join([
+                    pe["textRun"].get("content", "")
+                    for pe in paragraph.get("elements", ())
+                    if "textRun" in pe
+                ])
+                if line and not line.isspace():
+                    write(line)
+                    if writer.more:
+                        break
+            elif "table" in element:
+                stack.append(_cell_contents(element["table"]))
+                break
+        else:
+            stack.pop()
+
+
+def iter_doc_tabs(doc: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield (tab, nesting level) for every tab and child tab in document order."""
+    stack = [(tab, 0) for tab in reversed(doc.get("tabs", []))]
+    while stack:
+        tab, level = stack.pop()
+        yield tab, level
+        stack.extend((child, level + 1) for child in reversed(tab.get("childTabs", [])))
+
+
+def _tab_title(tab: Dict[str, Any]) -> str:
+    return (
+        tab.get("tabProperties", {}).get("title")
+        or tab.get("documentTab", {}).get("title")
+        or "Untitled Tab"
+    )
+
+
+def list_doc_tabs(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    List a document's tabs.
+
+    Returns:
+        List of {"tab_id", "title", "level"} dicts in document order
+    """
+    return [
+        {"tab_id": tab.get("tabProperties", {}).get("tabId"), "title": _tab_title(tab), "level": level}
+        for tab, level in iter_doc_tabs(doc)
+    ]
+
+
+def extract_doc_text(
+    doc: Dict[str, Any],
+    tab_ids: Optional[Iterable[str]] = None,
+    start_char: int = 0,
+    max_chars: Optional[int] = None,
+) -> DocTextResult:
+    """
+    Extract plain text from a documents.get response.
+
+    Output matches the long-standing get_doc_content format: non-blank
+    paragraphs (including those inside tables) in reading order, with each
+    tab introduced by a "--- TAB: <title> ---" header indented by nesting level.
+
+    Args:
+        doc: Document JSON, ideally fetched with DOC_TEXT_FIELDS
+        tab_ids: Only include these tabs (the main body is skipped when set)
+        start_char: Offset into the full extracted text to start at
+        max_chars: Maximum number of characters to return (None for all)
+
+    Returns:
+        DocTextResult with the text window
+    """
+    writer = _WindowWriter(max(0, start_char), max_chars)
+    selected = set(tab_ids) if tab_ids else None
+    tab_count = 0
+
+    if selected is None:
+        _write_elements(doc.get("body", {}).get("content", []), writer)
+
+    for tab, level in iter_doc_tabs(doc):
+        if writer.more:
+            break
+        if selected is not None and tab.get("tabProperties", {}).get("tabId") not in selected:
+            continue
+        tab_count += 1
+        if "documentTab" in tab:
+            writer.write(TAB_HEADER_FORMAT.format(tab_name="    " * level + _tab_title(tab)))
+            _write_elements(tab["documentTab"].get("body", {}).get("content", []), writer)
+
+    next_char = writer.end if writer.more else None
+    return DocTextResult("".join(writer.parts), writer.start, next_char, tab_count)
+
+
+async def fetch_doc_text_json(service, document_id: str, fields: str = DOC_TEXT_FIELDS) -> Dict[str, Any]:
+    """Fetch a document with all tab content, limited to the text fields mask."""
+    return await asyncio.to_thread(
+        service.documents().get(
+            documentId=document_id,
+            includeTabsContent=True,
+            fields=fields,
+        ).execute
+    )
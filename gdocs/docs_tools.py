@@ -6,14 +6,22 @@ This module provides MCP tools for interacting with Google Docs API and managing
 import logging
 import asyncio
 import io
+from typing import Dict, List, Literal, Optional
 
-from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
+import httpx
+
+from googleapiclient.http import MediaIoBaseDownload
 
 # Auth & server utilities
 from auth.service_decorator import require_google_service, require_multiple_services
-from core.utils import extract_office_xml_text, handle_http_errors
+from core.utils import extract_office_xml_text_async, handle_http_errors
 from core.server import server
 from core.comments import create_comment_tools
+from core.content_cache import CONTENT_VERSION_FIELDS, content_version_tag, get_content_cache
+from gdrive.drive_helpers import DriveFileLister, build_drive_list_params, format_page_token_hint
+from gdrive.drive_export import export_file
+from gdrive.drive_mirror import mark_drive_mirror_stale
+from gdrive.drive_upload import UPLOAD_TIMEOUT
 
 # Import helper functions for document operations
 from gdocs.docs_helpers import (
@@ -28,11 +36,12 @@ from gdocs.docs_helpers import (
 )
 
 # Import document structure and table utilities
-from gdocs.docs_structure import (
-    parse_document_structure,
-    find_tables,
-    analyze_document_complexity
-)
+from gdocs.docs_structure import analyze_document_complexity
+from gdocs.docs_cache import execute_batch_update, get_document_model
+from gdocs.docs_bulk import BULK_REPLACE_CONCURRENCY, BULK_REPLACE_MAX_DOCUMENTS, replace_in_documents, resolve_documents
+from gdocs.docs_text import DOC_TAB_LIST_FIELDS, extract_doc_text, fetch_doc_text_json, list_doc_tabs
+from gdocs.docs_markdown import document_end_index, render_markdown
+from gdocs.docs_diff import DIFF_PREVIEW_MAX_CHARS, DOC_DIFF_FIELDS, build_diff_requests, build_text_model
 from gdocs.docs_tables import (
     extract_table_as_data
 )
@@ -55,9 +64,11 @@ async def search_docs(
     user_google_email: str,
     query: str,
     page_size: int = 10,
+    page_token: Optional[str] = None,
 ) -> str:
     """
     Searches for Google Docs by name using Drive API (mimeType filter).
+    Pass the returned page token as `page_token` to continue a listing.
 
     Returns:
         str: A formatted list of Google Docs matching the search query.
@@ -66,14 +77,15 @@ async def search_docs(
 
     escaped_query = query.replace("'", "\\'")
 
-    response = await asyncio.to_thread(
-        service.files().list(
-            q=f"name contains '{escaped_query}' and mimeType='application/vnd.google-apps.document' and trashed=false",
-            pageSize=page_size,
-            fields="files(id, name, createdTime, modifiedTime, webViewLink)"
-        ).execute
+    list_params = build_drive_list_params(
+        query=f"name contains '{escaped_query}' and mimeType='application/vnd.google-apps.document' and trashed=false",
+        page_size=page_size,
+        include_items_from_all_drives=False,
+        file_fields="id, name, modifiedTime, webViewLink",
+        page_token=page_token,
     )
-    files = response.get('files', [])
+    lister = DriveFileLister(service, list_params, max_results=page_size)
+    files = await lister.collect()
     if not files:
         return f"No Google Docs found matching '{query}'."
 
@@ -82,7 +94,7 @@ async def search_docs(
         output.append(
             f"- {f['name']} (ID: {f['id']}) Modified: {f.get('modifiedTime')} Link: {f.get('webViewLink')}"
         )
-    return "\n".join(output)
+    return "\n".join(output) + format_page_token_hint(lister.next_page_token)
 
 @server.tool()
 @handle_http_errors("get_doc_content", is_read_only=True, service_type="docs")
@@ -95,111 +107,99 @@ async def get_doc_content(
     docs_service,
     user_google_email: str,
     document_id: str,
+    list_tabs: bool = False,
+    tab_id: Optional[str] = None,
+    start_char: int = 0,
+    max_chars: Optional[int] = None,
 ) -> str:
     """
     Retrieves content of a Google Doc or a Drive file (like .docx) identified by document_id.
     - Native Google Docs: Fetches content via Docs API.
     - Office files (.docx, etc.) stored in Drive: Downloads via Drive API and extracts text.
 
+    Large documents can be read in windows: when more content remains, the
+    response ends with the `start_char` to pass on the next call.
+
+    Args:
+        user_google_email: User's Google email address
+        document_id: ID of the document or Drive file
+        list_tabs: Only list the document's tabs (IDs and titles), without content
+        tab_id: Only return the content of this tab (native Google Docs only)
+        start_char: Character offset into the content to start from
+        max_chars: Maximum number of characters to return (default: all)
+
     Returns:
         str: The document content with metadata header.
     """
-    logger.info(f"[get_doc_content] Invoked. Document/File ID: '{document_id}' for user '{user_google_email}'")
+    logger.info(
+        f"[get_doc_content] Invoked. Document/File ID: '{document_id}' for user '{user_google_email}', "
+        f"list_tabs={list_tabs}, tab_id={tab_id}, start_char={start_char}, max_chars={max_chars}"
+    )
+    start_char = max(0, start_char)
+    if max_chars is not None:
+        max_chars = max(1, max_chars)
 
     # Step 2: Get file metadata from Drive
     file_metadata = await asyncio.to_thread(
         drive_service.files().get(
-            fileId=document_id, fields="id, name, mimeType, webViewLink"
+            fileId=document_id, fields=f"id, name, mimeType, webViewLink, {CONTENT_VERSION_FIELDS}"
         ).execute
     )
     mime_type = file_metadata.get("mimeType", "")
     file_name = file_metadata.get("name", "Unknown File")
     web_view_link = file_metadata.get("webViewLink", "#")
+    is_native_doc = mime_type == "application/vnd.google-apps.document"
 
     logger.info(f"[get_doc_content] File '{file_name}' (ID: {document_id}) has mimeType: '{mime_type}'")
 
+    header = (
+        f'File: "{file_name}" (ID: {document_id}, Type: {mime_type})\n'
+        f'Link: {web_view_link}\n\n--- CONTENT ---\n'
+    )
+
+    if (list_tabs or tab_id) and not is_native_doc:
+        raise Exception(f"Tabs are only available for native Google Docs, not '{mime_type}'.")
+
+    if list_tabs:
+        # Tab IDs and titles only - no document content is transferred
+        doc_data = await fetch_doc_text_json(docs_service, document_id, fields=DOC_TAB_LIST_FIELDS)
+        tabs = list_doc_tabs(doc_data)
+        header = header.replace("--- CONTENT ---", f"--- TABS ({len(tabs)}) ---")
+        return header + "\n".join(
+            f"{'    ' * tab['level']}- {tab['title']} (tab_id: {tab['tab_id']})" for tab in tabs
+        )
+
+    content_cache = get_content_cache()
+    version_tag = content_version_tag(file_metadata)
+    cached = await content_cache.get(document_id, version_tag, "doc_text")
+    windowed = bool(tab_id or start_char or max_chars is not None)
+    window_variant = f"doc_text_window:{tab_id or ''}:{start_char}:{max_chars}"
+
     body_text = "" # Initialize body_text
+    next_char: Optional[int] = None
 
     # Step 3: Process based on mimeType
-    if mime_type == "application/vnd.google-apps.document":
-        logger.info("[get_doc_content] Processing as native Google Doc.")
-        doc_data = await asyncio.to_thread(
-            docs_service.documents().get(
-                documentId=document_id,
-                includeTabsContent=True
-            ).execute
-        )
-        # Tab header format constant
-        TAB_HEADER_FORMAT = "\n--- TAB: {tab_name} ---\n"
-
-        def extract_text_from_elements(elements, tab_name=None, depth=0):
-            """Extract text from document elements (paragraphs, tables, etc.)"""
-            # Prevent infinite recursion by limiting depth
-            if depth > 5:
-                return ""
-            text_lines = []
-            if tab_name:
-                text_lines.append(TAB_HEADER_FORMAT.format(tab_name=tab_name))
-
-            for element in elements:
-                if 'paragraph' in element:
-                    paragraph = element.get('paragraph', {})
-                    para_elements = paragraph.get('elements', [])
-                    current_line_text = ""
-                    for pe in para_elements:
-                        text_run = pe.get('textRun', {})
-                        if text_run and 'content' in text_run:
-                            current_line_text += text_run['content']
-                    if current_line_text.strip():
-                        text_lines.append(current_line_text)
-                elif 'table' in element:
-                    # Handle table content
-                    table = element.get('table', {})
-                    table_rows = table.get('tableRows', [])
-                    for row in table_rows:
-                        row_cells = row.get('tableCells', [])
-                        for cell in row_cells:
-                            cell_content = cell.get('content', [])
-                            cell_text = extract_text_from_elements(cell_content, depth=depth + 1)
-                            if cell_text.strip():
-                                text_lines.append(cell_text)
-            return "".join(text_lines)
-
-        def process_tab_hierarchy(tab, level=0):
-            """Process a tab and its nested child tabs recursively"""
-            tab_text = ""
-
-            if 'documentTab' in tab:
-                tab_title = tab.get('documentTab', {}).get('title', 'Untitled Tab')
-                # Add indentation for nested tabs to show hierarchy
-                if level > 0:
-                    tab_title = "    " * level + tab_title
-                tab_body = tab.get('documentTab', {}).get('body', {}).get('content', [])
-                tab_text += extract_text_from_elements(tab_body, tab_title)
-
-            # Process child tabs (nested tabs)
-            child_tabs = tab.get('childTabs', [])
-            for child_tab in child_tabs:
-                tab_text += process_tab_hierarchy(child_tab, level + 1)
-
-            return tab_text
-
-        processed_text_lines = []
-
-        # Process main document body
-        body_elements = doc_data.get('body', {}).get('content', [])
-        main_content = extract_text_from_elements(body_elements)
-        if main_content.strip():
-            processed_text_lines.append(main_content)
-
-        # Process all tabs
-        tabs = doc_data.get('tabs', [])
-        for tab in tabs:
-            tab_content = process_tab_hierarchy(tab)
-            if tab_content.strip():
-                processed_text_lines.append(tab_content)
-
-        body_text = "".join(processed_text_lines)
+    if cached is not None and not tab_id:
+        logger.info(f"[get_doc_content] Serving cached content for unchanged file ({version_tag}).")
+        body_text = cached["text"]
+    elif is_native_doc:
+        cached_window = await content_cache.get(document_id, version_tag, window_variant) if windowed else None
+        if cached_window is not None:
+            logger.info(f"[get_doc_content] Serving cached window for unchanged file ({version_tag}).")
+            body_text, next_char = cached_window["text"], cached_window.get("next_char")
+        else:
+            logger.info("[get_doc_content] Processing as native Google Doc.")
+            doc_data = await fetch_doc_text_json(docs_service, document_id)
+            # Extraction stops as soon as the requested window is filled
+            result = extract_doc_text(doc_data, [tab_id] if tab_id else None, start_char, max_chars)
+            if tab_id and not result.tab_count:
+                raise Exception(f"Tab '{tab_id}' not found in document {document_id}. Use list_tabs=True to see tab IDs.")
+            body_text, next_char = result.text, result.next_char
+            if not windowed or (not tab_id and not start_char and not result.truncated):
+                content_cache.put(document_id, version_tag, "doc_text", {"text": body_text})
+            else:
+                content_cache.put(document_id, version_tag, window_variant, {"text": body_text, "next_char": next_char})
+        windowed = False
     else:
         logger.info(f"[get_doc_content] Processing as Drive file (e.g., .docx, other). MimeType: {mime_type}")
 
@@ -225,7 +225,7 @@ async def get_doc_content(
 
         file_content_bytes = fh.getvalue()
 
-        office_text = extract_office_xml_text(file_content_bytes, mime_type)
+        office_text = await extract_office_xml_text_async(file_content_bytes, mime_type)
         if office_text:
             body_text = office_text
         else:
@@ -236,12 +236,21 @@ async def get_doc_content(
                     f"[Binary or unsupported text encoding for mimeType '{mime_type}' - "
                     f"{len(file_content_bytes)} bytes]"
                 )
-
-    header = (
-        f'File: "{file_name}" (ID: {document_id}, Type: {mime_type})\n'
-        f'Link: {web_view_link}\n\n--- CONTENT ---\n'
-    )
-    return header + body_text
+        content_cache.put(document_id, version_tag, "doc_text", {"text": body_text})
+
+    if windowed:
+        # Full text is at hand (cached or extracted whole); cut the window from it
+        end_char = start_char + max_chars if max_chars is not None else len(body_text)
+        next_char = end_char if end_char < len(body_text) else None
+        body_text = body_text[start_char:end_char]
+
+    footer = ""
+    if next_char is not None:
+        footer = (
+            f"\n\n--- TRUNCATED: returned characters {start_char}-{next_char}. "
+            f"Call again with start_char={next_char} to continue. ---"
+        )
+    return header + body_text + footer
 
 @server.tool()
 @handle_http_errors("list_docs_in_folder", is_read_only=True, service_type="docs")
@@ -250,30 +259,33 @@ async def list_docs_in_folder(
     service,
     user_google_email: str,
     folder_id: str = 'root',
-    page_size: int = 100
+    page_size: int = 100,
+    page_token: Optional[str] = None,
 ) -> str:
     """
     Lists Google Docs within a specific Drive folder.
+    Pass the returned page token as `page_token` to continue a listing.
 
     Returns:
         str: A formatted list of Google Docs in the specified folder.
     """
     logger.info(f"[list_docs_in_folder] Invoked. Email: '{user_google_email}', Folder ID: '{folder_id}'")
 
-    rsp = await asyncio.to_thread(
-        service.files().list(
-            q=f"'{folder_id}' in parents and mimeType='application/vnd.google-apps.document' and trashed=false",
-            pageSize=page_size,
-            fields="files(id, name, modifiedTime, webViewLink)"
-        ).execute
+    list_params = build_drive_list_params(
+        query=f"'{folder_id}' in parents and mimeType='application/vnd.google-apps.document' and trashed=false",
+        page_size=page_size,
+        include_items_from_all_drives=False,
+        file_fields="id, name, modifiedTime, webViewLink",
+        page_token=page_token,
     )
-    items = rsp.get('files', [])
+    lister = DriveFileLister(service, list_params, max_results=page_size)
+    items = await lister.collect()
     if not items:
         return f"No Google Docs found in folder '{folder_id}'."
     out = [f"Found {len(items)} Docs in folder '{folder_id}':"]
     for f in items:
         out.append(f"- {f['name']} (ID: {f['id']}) Modified: {f.get('modifiedTime')} Link: {f.get('webViewLink')}")
-    return "\n".join(out)
+    return "\n".join(out) + format_page_token_hint(lister.next_page_token)
 
 @server.tool()
 @handle_http_errors("create_doc", service_type="docs")
@@ -296,7 +308,7 @@ async def create_doc(
     doc_id = doc.get('documentId')
     if content:
         requests = [{'insertText': {'location': {'index': 1}, 'text': content}}]
-        await asyncio.to_thread(service.documents().batchUpdate(documentId=doc_id, body={'requests': requests}).execute)
+        await execute_batch_update(service, doc_id, requests)
     link = f"https://docs.google.com/document/d/{doc_id}/edit"
     msg = f"Created Google Doc '{title}' (ID: {doc_id}) for {user_google_email}. Link: {link}"
     logger.info(f"Successfully created Google Doc '{title}' (ID: {doc_id}) for {user_google_email}. Link: {link}")
@@ -429,18 +441,91 @@ async def modify_doc_text(
 
         operations.append(f"Applied formatting ({', '.join(format_details)}) to range {format_start}-{format_end}")
 
-    await asyncio.to_thread(
-        service.documents().batchUpdate(
-            documentId=document_id,
-            body={'requests': requests}
-        ).execute
-    )
+    await execute_batch_update(service, document_id, requests)
 
     link = f"https://docs.google.com/document/d/{document_id}/edit"
     operation_summary = "; ".join(operations)
     text_info = f" Text length: {len(text)} characters." if text else ""
     return f"{operation_summary} in document {document_id}.{text_info} Link: {link}"
 
+@server.tool()
+@handle_http_errors("rewrite_doc_text", service_type="docs")
+@require_google_service("docs", "docs_write")
+async def rewrite_doc_text(
+    service,
+    user_google_email: str,
+    document_id: str,
+    new_text: str,
+    start_index: Optional[int] = None,
+    end_index: Optional[int] = None,
+    dry_run: bool = False,
+) -> str:
+    """
+    Rewrites the text of a Google Doc (or an index range of it) by applying only the differences.
+
+    The current text is diffed against new_text and only the changed characters are deleted or
+    inserted, so unchanged text keeps its formatting and the update size follows the size of the
+    change. The update is rejected if the document changes between reading and writing.
+
+    Only the text of top-level paragraphs is rewritten: tables (including their cell text), images
+    and other non-text elements are not part of the text being diffed and are left in place. Text
+    copied from get_doc_content includes table cells, so new_text containing a table's cell text
+    is rejected; use dry_run to see the exact text this tool edits.
+
+    Args:
+        user_google_email: User's Google email address
+        document_id: ID of the document to update
+        new_text: The complete desired plain text for the document or range
+        start_index: Optional start of the range to rewrite (defaults to the start of the body)
+        end_index: Optional end of the range to rewrite (defaults to the end of the body)
+        dry_run: Only report the edits that would be made
+
+    Returns:
+        str: Summary of the applied (or planned) edits
+    """
+    logger.info(
+        f"[rewrite_doc_text] Doc={document_id}, range={start_index}-{end_index}, "
+        f"new_text={len(new_text)} chars, dry_run={dry_run}"
+    )
+
+    doc = await asyncio.to_thread(
+        service.documents().get(documentId=document_id, fields=DOC_DIFF_FIELDS).execute
+    )
+    model = build_text_model(doc, start_index, end_index)
+    tables = model.tables_in_text(new_text)
+    if tables:
+        indices = ", ".join(str(table.start_index) for table in tables)
+        return (
+            f"Error: new_text contains the cell text of the table(s) at index {indices}. rewrite_doc_text "
+            "only edits text outside tables; remove the table text from new_text (run with dry_run=True "
+            "to see the text it edits) and use the table tools to change cells."
+        )
+    try:
+        requests, stats = build_diff_requests(model, new_text)
+    except ValueError as e:
+        return f"Error: {e}"
+
+    link = f"https://docs.google.com/document/d/{document_id}/edit"
+    summary = (
+        f"{stats['hunks']} changed region{'s' if stats['hunks'] != 1 else ''}: "
+        f"{stats['deleted_chars']} characters deleted, {stats['inserted_chars']} inserted "
+        f"({len(requests)} requests; current text is {len(model.text)} characters)"
+    )
+    if not requests:
+        return f"No changes needed in document {document_id}: the text already matches. Link: {link}"
+    if dry_run:
+        current_text = model.text[:DIFF_PREVIEW_MAX_CHARS]
+        if len(model.text) > DIFF_PREVIEW_MAX_CHARS:
+            current_text += f"\n... [truncated after {DIFF_PREVIEW_MAX_CHARS} characters]"
+        tables_note = f", {len(model.tables)} table(s) excluded" if model.tables else ""
+        return (
+            f"DRY RUN - would apply {summary} to document {document_id}. Link: {link}\n\n"
+            f"Current text being edited{tables_note}:\n{current_text}"
+        )
+
+    await execute_batch_update(service, document_id, requests, required_revision_id=doc.get("revisionId"))
+    return f"Applied {summary} to document {document_id}. Link: {link}"
+
 @server.tool()
 @handle_http_errors("find_and_replace_doc", service_type="docs")
 @require_google_service("docs", "docs_write")
@@ -469,12 +554,7 @@ async def find_and_replace_doc(
 
     requests = [create_find_replace_request(find_text, replace_text, match_case)]
 
-    result = await asyncio.to_thread(
-        service.documents().batchUpdate(
-            documentId=document_id,
-            body={'requests': requests}
-        ).execute
-    )
+    result = await execute_batch_update(service, document_id, requests)
 
     # Extract number of replacements from response
     replacements = 0
@@ -487,6 +567,81 @@ async def find_and_replace_doc(
     return f"Replaced {replacements} occurrence(s) of '{find_text}' with '{replace_text}' in document {document_id}. Link: {link}"
 
 
+@server.tool()
+@handle_http_errors("bulk_find_replace_docs", service_type="docs")
+@require_multiple_services([
+    {"service_type": "drive", "scopes": "drive_read", "param_name": "drive_service"},
+    {"service_type": "docs", "scopes": "docs_write", "param_name": "docs_service"}
+])
+async def bulk_find_replace_docs(
+    drive_service,
+    docs_service,
+    user_google_email: str,
+    replacements: List[Dict[str, str]],
+    query: str = None,
+    folder_id: str = None,
+    match_case: bool = False,
+    max_documents: int = 100,
+    max_concurrency: int = BULK_REPLACE_CONCURRENCY,
+) -> str:
+    """
+    Finds and replaces text across many Google Docs in one call.
+    Documents are selected by a Drive query, a folder, or both, and updated concurrently.
+
+    Args:
+        user_google_email: User's Google email address
+        replacements: Replacement pairs applied in order, e.g. [{"find": "Acme", "replace": "Globex"}]
+        query: Drive query to select documents (e.g. "name contains 'Proposal'")
+        folder_id: Only update Google Docs directly inside this folder
+        match_case: Whether to match case exactly
+        max_documents: Maximum number of documents to update (default 100, max 500)
+        max_concurrency: Maximum number of documents updated at once (default 8)
+
+    Returns:
+        str: Per-document occurrence counts and any failures
+    """
+    logger.info(f"[bulk_find_replace_docs] Query={query}, folder_id={folder_id}, pairs={len(replacements)}")
+
+    if not query and not folder_id:
+        raise Exception("Provide a query, a folder_id, or both to select documents.")
+    if not replacements or any(not pair.get("find") for pair in replacements):
+        raise Exception("Every replacement needs a non-empty 'find' text.")
+
+    documents = await resolve_documents(
+        drive_service, query, folder_id, max(1, min(max_documents, BULK_REPLACE_MAX_DOCUMENTS))
+    )
+    if not documents:
+        return "No Google Docs matched; nothing was replaced."
+
+    results = await replace_in_documents(
+        docs_service, documents, replacements, user_google_email, match_case, max(1, max_concurrency)
+    )
+
+    failed = [r for r in results if r.error and not r.unknown]
+    unknown = [r for r in results if r.unknown]
+    changed = [r for r in results if not r.error and r.total]
+    total_occurrences = sum(r.total for r in results)
+    pairs = ", ".join(f"'{pair['find']}' → '{pair.get('replace', '')}'" for pair in replacements)
+    lines = [
+        f"Replaced {total_occurrences} occurrence(s) of {pairs} in {len(changed)} of {len(documents)} documents"
+        + (f" ({len(failed)} failed)" if failed else "")
+        + (f" ({len(unknown)} with unknown outcome)" if unknown else "")
+        + "."
+    ]
+    for r in changed:
+        counts = ", ".join(str(count) for count in r.occurrences)
+        lines.append(f"- {r.name} (ID: {r.document_id}): {r.total} [{counts}]")
+    if unknown:
+        lines.append("")
+        lines.append("Unknown outcome (check these documents before re-running):")
+        lines.extend(f"- {r.name} (ID: {r.document_id}): {r.error}" for r in unknown)
+    if failed:
+        lines.append("")
+        lines.append("Failures:")
+        lines.extend(f"- {r.name} (ID: {r.document_id}): {r.error}" for r in failed)
+    return "\n".join(lines)
+
+
 @server.tool()
 @handle_http_errors("insert_doc_elements", service_type="docs")
 @require_google_service("docs", "docs_write")
@@ -555,16 +710,69 @@ async def insert_doc_elements(
     else:
         return f"Error: Unsupported element type '{element_type}'. Supported types: 'table', 'list', 'page_break'."
 
-    await asyncio.to_thread(
-        service.documents().batchUpdate(
-            documentId=document_id,
-            body={'requests': requests}
-        ).execute
-    )
+    await execute_batch_update(service, document_id, requests)
 
     link = f"https://docs.google.com/document/d/{document_id}/edit"
     return f"Inserted {description} at index {index} in document {document_id}. Link: {link}"
 
+@server.tool()
+@handle_http_errors("insert_doc_markdown", service_type="docs")
+@require_google_service("docs", "docs_write")
+async def insert_doc_markdown(
+    service,
+    user_google_email: str,
+    document_id: str,
+    markdown: str,
+    index: Optional[int] = None,
+) -> str:
+    """
+    Renders Markdown into a Google Doc with a single batch update (split only for very long content).
+
+    Supports headings (#..######), paragraphs, **bold**, *italic*, `code`, [links](url),
+    bulleted/numbered lists (indent by 2 spaces to nest), pipe tables (first row bold),
+    fenced code blocks and page breaks (---, *** or \\pagebreak).
+
+    Args:
+        user_google_email: User's Google email address
+        document_id: ID of the document to update
+        markdown: Markdown content to render
+        index: Position to insert at (start of a paragraph); defaults to the end of the document
+
+    Returns:
+        str: Confirmation message with what was inserted
+    """
+    logger.info(f"[insert_doc_markdown] Doc={document_id}, chars={len(markdown)}, index={index}")
+
+    if index is None:
+        doc = await asyncio.to_thread(
+            service.documents().get(documentId=document_id, fields="body(content(endIndex))").execute
+        )
+        index = document_end_index(doc) or 1
+
+    batches, stats = render_markdown(markdown, index)
+    if not batches:
+        return "Error: The Markdown content is empty."
+
+    for batch_number, requests in enumerate(batches, 1):
+        try:
+            await execute_batch_update(service, document_id, requests)
+        except Exception as e:
+            if batch_number == 1:
+                raise
+            # Batches are applied bottom-up, so the tail of the content is already in place
+            raise Exception(
+                f"Batch {batch_number} of {len(batches)} failed after earlier batches were applied "
+                f"(the end of the Markdown content is already in the document): {e}"
+            )
+
+    link = f"https://docs.google.com/document/d/{document_id}/edit"
+    request_count = sum(len(requests) for requests in batches)
+    return (
+        f"Inserted Markdown at index {index} in document {document_id}: {stats['paragraphs']} paragraphs, "
+        f"{stats['tables']} tables, {stats['page_breaks']} page breaks ({request_count} requests in "
+        f"{len(batches)} batch update{'s' if len(batches) != 1 else ''}). Link: {link}"
+    )
+
 @server.tool()
 @handle_http_errors("insert_doc_image", service_type="docs")
 @require_multiple_services([
@@ -630,12 +838,7 @@ async def insert_doc_image(
     # Use helper to create image request
     requests = [create_insert_image_request(index, image_uri, width, height)]
 
-    await asyncio.to_thread(
-        docs_service.documents().batchUpdate(
-            documentId=document_id,
-            body={'requests': requests}
-        ).execute
-    )
+    await execute_batch_update(docs_service, document_id, requests)
 
     size_info = ""
     if width or height:
@@ -706,6 +909,7 @@ async def batch_update_doc(
     user_google_email: str,
     document_id: str,
     operations: list,
+    index_mode: Literal["sequential", "original"] = "sequential",
 ) -> str:
     """
     Executes multiple document operations in a single atomic batch update.
@@ -714,8 +918,14 @@ async def batch_update_doc(
         user_google_email: User's Google email address
         document_id: ID of the document to update
         operations: List of operation dictionaries. Each operation should contain:
-                   - type: Operation type ('insert_text', 'delete_text', 'replace_text', 'format_text', 'insert_table', 'insert_page_break')
+                   - type: Operation type ('insert_text', 'delete_text', 'replace_text', 'format_text', 'insert_table', 'insert_page_break', 'find_replace')
                    - Additional parameters specific to each operation type
+                   - insert_text/replace_text also accept bold, italic, underline, font_size and font_family to format the new text
+        index_mode: How indices are interpreted:
+                   - "sequential" (default): each operation sees the document as left by the previous ones
+                   - "original": all indices refer to the document before this batch, so edits can be
+                     listed top to bottom; they are reordered (format_text first, edits from the end of
+                     the document backwards, find_replace last) and must not overlap
 
     Example operations:
         [
@@ -727,7 +937,7 @@ async def batch_update_doc(
     Returns:
         str: Confirmation message with batch operation results
     """
-    logger.debug(f"[batch_update_doc] Doc={document_id}, operations={len(operations)}")
+    logger.debug(f"[batch_update_doc] Doc={document_id}, operations={len(operations)}, index_mode={index_mode}")
 
     # Input validation
     validator = ValidationManager()
@@ -744,7 +954,7 @@ async def batch_update_doc(
     batch_manager = BatchOperationManager(service)
 
     success, message, metadata = await batch_manager.execute_batch_operations(
-        document_id, operations
+        document_id, operations, index_mode
     )
 
     if success:
@@ -797,14 +1007,13 @@ async def inspect_doc_structure(
     """
     logger.debug(f"[inspect_doc_structure] Doc={document_id}, detailed={detailed}")
 
-    # Get the document
-    doc = await asyncio.to_thread(
-        service.documents().get(documentId=document_id).execute
-    )
+    # Get the document (reused from the model cache when unchanged)
+    model = await get_document_model(service, document_id)
+    doc = model.doc
 
     if detailed:
         # Return full parsed structure
-        structure = parse_document_structure(doc)
+        structure = model.structure
 
         # Simplify for JSON serialization
         result = {
@@ -854,7 +1063,7 @@ async def inspect_doc_structure(
         result = analyze_document_complexity(doc)
 
         # Add table information
-        tables = find_tables(doc)
+        tables = model.tables
         if tables:
             result['table_details'] = []
             for i, table in enumerate(tables):
@@ -1012,13 +1221,11 @@ async def debug_table_structure(
     """
     logger.debug(f"[debug_table_structure] Doc={document_id}, table_index={table_index}")
 
-    # Get the document
-    doc = await asyncio.to_thread(
-        service.documents().get(documentId=document_id).execute
-    )
+    # Get the document (reused from the model cache when unchanged)
+    model = await get_document_model(service, document_id)
 
     # Find tables
-    tables = find_tables(doc)
+    tables = model.tables
     if table_index >= len(tables):
         return f"Error: Table index {table_index} not found. Document has {len(tables)} table(s)."
 
@@ -1095,79 +1302,37 @@ async def export_doc_to_pdf(
 
     logger.info(f"[export_doc_to_pdf] Exporting '{original_name}' to PDF")
 
-    # Export the document as PDF
-    try:
-        request_obj = service.files().export_media(
-            fileId=document_id,
-            mimeType='application/pdf'
-        )
-        
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request_obj)
-        
-        done = False
-        while not done:
-            _, done = await asyncio.to_thread(downloader.next_chunk)
-            
-        pdf_content = fh.getvalue()
-        pdf_size = len(pdf_content)
-        
-    except Exception as e:
-        return f"Error: Failed to export document to PDF: {str(e)}"
-
     # Determine PDF filename
     if not pdf_filename:
         pdf_filename = f"{original_name}_PDF.pdf"
     elif not pdf_filename.endswith('.pdf'):
         pdf_filename += '.pdf'
 
-    # Upload PDF to Drive
-    try:
-        # Reuse the existing BytesIO object by resetting to the beginning
-        fh.seek(0)
-        # Create media upload object
-        media = MediaIoBaseUpload(
-            fh,
-            mimetype='application/pdf',
-            resumable=True
+    # Stream the export straight into a resumable upload; file_metadata has no
+    # parents, so without folder_id the PDF is saved in the root folder
+    async with httpx.AsyncClient(timeout=UPLOAD_TIMEOUT) as client:
+        result = await export_file(
+            service, client, file_metadata, "pdf", folder_id=folder_id, output_name=pdf_filename
         )
-        
-        # Prepare file metadata for upload
-        file_metadata = {
-            'name': pdf_filename,
-            'mimeType': 'application/pdf'
-        }
-        
-        # Add parent folder if specified
-        if folder_id:
-            file_metadata['parents'] = [folder_id]
-        
-        # Upload the file
-        uploaded_file = await asyncio.to_thread(
-            service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id, name, webViewLink, parents',
-                supportsAllDrives=True
-            ).execute
-        )
-        
-        pdf_file_id = uploaded_file.get('id')
-        pdf_web_link = uploaded_file.get('webViewLink', '#')
-        pdf_parents = uploaded_file.get('parents', [])
-        
-        logger.info(f"[export_doc_to_pdf] Successfully uploaded PDF to Drive: {pdf_file_id}")
-        
-        folder_info = ""
-        if folder_id:
-            folder_info = f" in folder {folder_id}"
-        elif pdf_parents:
-            folder_info = f" in folder {pdf_parents[0]}"
-        
-        return f"Successfully exported '{original_name}' to PDF and saved to Drive as '{pdf_filename}' (ID: {pdf_file_id}, {pdf_size:,} bytes){folder_info}. PDF: {pdf_web_link} | Original: {web_view_link}"
-        
-    except Exception as e:
-        return f"Error: Failed to upload PDF to Drive: {str(e)}. PDF was generated successfully ({pdf_size:,} bytes) but could not be saved to Drive."
+    mark_drive_mirror_stale(user_google_email)
+    if result.error:
+        return f"Error: Failed to export document to PDF: {result.error}"
+
+    uploaded_file = result.output
+    pdf_file_id = uploaded_file.get('id')
+    pdf_web_link = uploaded_file.get('webViewLink', '#')
+    pdf_parents = uploaded_file.get('parents', [])
+    pdf_size = result.size or 0
+
+    logger.info(f"[export_doc_to_pdf] Successfully uploaded PDF to Drive: {pdf_file_id}")
+
+    folder_info = ""
+    if folder_id:
+        folder_info = f" in folder {folder_id}"
+    elif pdf_parents:
+        folder_info = f" in folder {pdf_parents[0]}"
+
+    return f"Successfully exported '{original_name}' to PDF and saved to Drive as '{pdf_filename}' (ID: {pdf_file_id}, {pdf_size:,} bytes){folder_info}. PDF: {pdf_web_link} | Original: {web_view_link}"
 
 
 # Create comment management tools for documents
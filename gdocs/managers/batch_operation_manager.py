@@ -5,8 +5,7 @@ This module provides high-level batch operation management for Google Docs,
 extracting complex validation and request building logic.
 """
 import logging
-import asyncio
-from typing import Any, Union, Dict, List, Tuple
+from typing import Any, Union, Dict, List, Literal, Tuple
 
 from gdocs.docs_helpers import (
     create_insert_text_request,
@@ -17,6 +16,8 @@ from gdocs.docs_helpers import (
     create_insert_page_break_request,
     validate_operation
 )
+from gdocs.docs_cache import execute_batch_update
+from gdocs.docs_operations import FORMAT_FIELDS, compile_operations, has_inline_format
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +28,7 @@ class BatchOperationManager:
     
     Handles complex multi-operation requests including:
     - Operation validation and request building
+    - Index rebasing and formatting merges via the operation compiler
     - Batch execution with proper error handling
     - Operation result processing and reporting
     """
@@ -43,7 +45,8 @@ class BatchOperationManager:
     async def execute_batch_operations(
         self,
         document_id: str,
-        operations: list[dict[str, Any]]
+        operations: list[dict[str, Any]],
+        index_mode: Literal["sequential", "original"] = "sequential"
     ) -> tuple[bool, str, dict[str, Any]]:
         """
         Execute multiple document operations in a single atomic batch.
@@ -53,6 +56,8 @@ class BatchOperationManager:
         Args:
             document_id: ID of the document to update
             operations: List of operation dictionaries
+            index_mode: "sequential" (indices reflect earlier operations) or
+                "original" (indices refer to the document before the batch)
             
         Returns:
             Tuple of (success, message, metadata)
@@ -65,7 +70,9 @@ class BatchOperationManager:
             
         try:
             # Validate and build requests
-            requests, operation_descriptions = await self._validate_and_build_requests(operations)
+            requests, operation_descriptions = await self._validate_and_build_requests(
+                operations, index_mode
+            )
             
             if not requests:
                 return False, "No valid requests could be built from operations", {}
@@ -78,6 +85,7 @@ class BatchOperationManager:
                 'operations_count': len(operations),
                 'requests_count': len(requests),
                 'replies_count': len(result.get('replies', [])),
+                'index_mode': index_mode,
                 'operation_summary': operation_descriptions[:5]  # First 5 operations
             }
             
@@ -91,18 +99,19 @@ class BatchOperationManager:
     
     async def _validate_and_build_requests(
         self,
-        operations: list[dict[str, Any]]
+        operations: list[dict[str, Any]],
+        index_mode: Literal["sequential", "original"] = "sequential"
     ) -> tuple[list[dict[str, Any]], list[str]]:
         """
-        Validate operations and build API requests.
+        Validate operations, compile them and build API requests.
         
         Args:
             operations: List of operation dictionaries
+            index_mode: Index mode passed to the operation compiler
             
         Returns:
             Tuple of (requests, operation_descriptions)
         """
-        requests = []
         operation_descriptions = []
         
         for i, op in enumerate(operations):
@@ -114,24 +123,23 @@ class BatchOperationManager:
             op_type = op.get('type')
             
             try:
-                # Build request based on operation type
-                result = self._build_operation_request(op, op_type)
-                
-                # Handle both single request and list of requests
-                if isinstance(result[0], list):
-                    # Multiple requests (e.g., replace_text)
-                    for req in result[0]:
-                        requests.append(req)
-                    operation_descriptions.append(result[1])
-                elif result[0]:
-                    # Single request
-                    requests.append(result[0])
-                    operation_descriptions.append(result[1])
+                # Build once to validate and describe the operation as given
+                _, description = self._build_operation_request(op, op_type)
+                operation_descriptions.append(description)
                     
             except KeyError as e:
                 raise ValueError(f"Operation {i+1} ({op_type}) missing required field: {e}")
             except Exception as e:
                 raise ValueError(f"Operation {i+1} ({op_type}) failed validation: {str(e)}")
+        
+        # Rebase indices / reorder and merge formatting, then build the final requests
+        requests = []
+        for op in compile_operations(operations, index_mode):
+            request, _ = self._build_operation_request(op, op['type'])
+            if isinstance(request, list):
+                requests.extend(request)
+            elif request:
+                requests.append(request)
                 
         return requests, operation_descriptions
     
@@ -153,6 +161,8 @@ class BatchOperationManager:
         if op_type == 'insert_text':
             request = create_insert_text_request(op['index'], op['text'])
             description = f"insert text at {op['index']}"
+            if has_inline_format(op):
+                request = [request, self._build_inline_format_request(op, op['index'])]
             
         elif op_type == 'delete_text':
             request = create_delete_range_request(op['start_index'], op['end_index'])
@@ -164,6 +174,8 @@ class BatchOperationManager:
             insert_request = create_insert_text_request(op['start_index'], op['text'])
             # Return both requests as a list
             request = [delete_request, insert_request]
+            if has_inline_format(op):
+                request.append(self._build_inline_format_request(op, op['start_index']))
             description = f"replace text {op['start_index']}-{op['end_index']} with '{op['text'][:20]}{'...' if len(op['text']) > 20 else ''}'"
             
         elif op_type == 'format_text':
@@ -211,6 +223,14 @@ class BatchOperationManager:
             
         return request, description
     
+    @staticmethod
+    def _build_inline_format_request(op: dict[str, Any], index: int) -> Dict[str, Any]:
+        """Build the request formatting text just inserted at index."""
+        return create_format_text_request(
+            index, index + len(op['text']),
+            *(op.get(field) for field in FORMAT_FIELDS)
+        )
+    
     async def _execute_batch_requests(
         self,
         document_id: str,
@@ -226,12 +246,7 @@ class BatchOperationManager:
         Returns:
             API response
         """
-        return await asyncio.to_thread(
-            self.service.documents().batchUpdate(
-                documentId=document_id,
-                body={'requests': requests}
-            ).execute
-        )
+        return await execute_batch_update(self.service, document_id, requests)
     
     def _build_operation_summary(self, operation_descriptions: list[str]) -> str:
         """
@@ -266,7 +281,8 @@ class BatchOperationManager:
             'supported_operations': {
                 'insert_text': {
                     'required': ['index', 'text'],
-                    'description': 'Insert text at specified index'
+                    'optional': ['bold', 'italic', 'underline', 'font_size', 'font_family'],
+                    'description': 'Insert text at specified index, optionally formatting it'
                 },
                 'delete_text': {
                     'required': ['start_index', 'end_index'],
@@ -274,7 +290,8 @@ class BatchOperationManager:
                 },
                 'replace_text': {
                     'required': ['start_index', 'end_index', 'text'],
-                    'description': 'Replace text in range with new text'
+                    'optional': ['bold', 'italic', 'underline', 'font_size', 'font_family'],
+                    'description': 'Replace text in range with new text, optionally formatting it'
                 },
                 'format_text': {
                     'required': ['start_index', 'end_index'],
@@ -295,6 +312,10 @@ class BatchOperationManager:
                     'description': 'Find and replace text throughout document'
                 }
             },
+            'index_modes': {
+                'sequential': 'Each operation sees the document as left by the previous ones (default)',
+                'original': 'All indices refer to the document before the batch; operations are reordered to match'
+            },
             'example_operations': [
                 {"type": "insert_text", "index": 1, "text": "Hello World"},
                 {"type": "format_text", "start_index": 1, "end_index": 12, "bold": True},
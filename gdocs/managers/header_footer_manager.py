@@ -5,9 +5,10 @@ This module provides high-level operations for managing headers and footers
 in Google Docs, extracting complex logic from the main tools module.
 """
 import logging
-import asyncio
 from typing import Any, Optional
 
+from gdocs.docs_cache import execute_batch_update, get_document
+
 logger = logging.getLogger(__name__)
 
 
@@ -86,10 +87,8 @@ class HeaderFooterManager:
             return False, f"Failed to update {section_type}: {str(e)}"
     
     async def _get_document(self, document_id: str) -> dict[str, Any]:
-        """Get the full document data."""
-        return await asyncio.to_thread(
-            self.service.documents().get(documentId=document_id).execute
-        )
+        """Get the full document data (shared with the model cache; do not modify)."""
+        return await get_document(self.service, document_id)
     
     async def _find_target_section(
         self,
@@ -197,12 +196,7 @@ class HeaderFooterManager:
         })
         
         try:
-            await asyncio.to_thread(
-                self.service.documents().batchUpdate(
-                    documentId=document_id,
-                    body={'requests': requests}
-                ).execute
-            )
+            await execute_batch_update(self.service, document_id, requests)
             return True
             
         except Exception as e:
@@ -316,12 +310,7 @@ class HeaderFooterManager:
                 batch_request = {'createFooter': request}
             
             # Execute the request
-            await asyncio.to_thread(
-                self.service.documents().batchUpdate(
-                    documentId=document_id,
-                    body={'requests': [batch_request]}
-                ).execute
-            )
+            await execute_batch_update(self.service, document_id, [batch_request])
             
             return True, f"Successfully created {section_type} with type {api_type}"
             
@@ -5,11 +5,15 @@ This module provides high-level table operations that orchestrate
 multiple Google Docs API calls for complex table manipulations.
 """
 import logging
-import asyncio
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 
-from gdocs.docs_helpers import create_insert_table_request
-from gdocs.docs_structure import find_tables
+from gdocs.docs_helpers import (
+    create_delete_range_request,
+    create_format_text_request,
+    create_insert_table_request,
+    create_insert_text_request,
+)
+from gdocs.docs_cache import execute_batch_update, get_document_model
 from gdocs.docs_tables import validate_table_data
 
 logger = logging.getLogger(__name__)
@@ -22,7 +26,8 @@ class TableOperationManager:
     Handles complex multi-step table operations including:
     - Creating tables with data population
     - Populating existing tables
-    - Managing cell-by-cell operations with proper index refreshing
+    - Computing all cell positions from a single structure read and
+      writing every cell in one batchUpdate
     """
     
     def __init__(self, service):
@@ -68,30 +73,32 @@ class TableOperationManager:
         try:
             # Step 1: Create empty table
             await self._create_empty_table(document_id, index, rows, cols)
-            
-            # Step 2: Get fresh document structure to find actual cell positions
+
+            # Step 2: Read the structure once to find the new table's cell positions
             fresh_tables = await self._get_document_tables(document_id)
-            if not fresh_tables:
+            table = self._find_inserted_table(fresh_tables, index)
+            if table is None:
                 return False, "Could not find table after creation", {}
-                
-            # Step 3: Populate each cell with proper index refreshing
-            population_count = await self._populate_table_cells(
-                document_id, table_data, bold_headers
+
+            # Step 3: Fill every cell (and bold the header) in a single batchUpdate
+            requests, population_count = self._build_cell_requests(
+                table, table_data, bold_headers=bold_headers
             )
-            
+            await self._execute_requests(document_id, requests)
+
             metadata = {
                 'rows': rows,
                 'columns': cols,
                 'populated_cells': population_count,
-                'table_index': len(fresh_tables) - 1
+                'table_index': table['index']
             }
-            
+
             return True, f"Successfully created {rows}x{cols} table and populated {population_count} cells", metadata
-            
+
         except Exception as e:
             logger.error(f"Failed to create and populate table: {str(e)}")
             return False, f"Table creation failed: {str(e)}", {}
-    
+
     async def _create_empty_table(
         self, 
         document_id: str, 
@@ -102,140 +109,90 @@ class TableOperationManager:
         """Create an empty table at the specified index."""
         logger.debug(f"Creating {rows}x{cols} table at index {index}")
         
-        await asyncio.to_thread(
-            self.service.documents().batchUpdate(
-                documentId=document_id,
-                body={'requests': [create_insert_table_request(index, rows, cols)]}
-            ).execute
+        await execute_batch_update(
+            self.service, document_id, [create_insert_table_request(index, rows, cols)]
         )
         
     async def _get_document_tables(self, document_id: str) -> List[Dict[str, Any]]:
-        """Get fresh document structure and extract table information."""
-        doc = await asyncio.to_thread(
-            self.service.documents().get(documentId=document_id).execute
-        )
-        return find_tables(doc)
-    
-    async def _populate_table_cells(
-        self,
-        document_id: str,
+        """Get the current document structure and extract table information."""
+        return (await get_document_model(self.service, document_id)).tables
+
+    @staticmethod
+    def _find_inserted_table(
+        tables: List[Dict[str, Any]], index: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Identify the table just inserted at `index`.
+
+        insertTable may place a newline before the table, so the table starts
+        at or just after the requested index; pick the first table there.
+        """
+        candidates = [t for t in tables if t['start_index'] >= index]
+        if candidates:
+            return min(candidates, key=lambda t: t['start_index'])
+        return tables[-1] if tables else None
+
+    @staticmethod
+    def _build_cell_requests(
+        table: Dict[str, Any],
         table_data: List[List[str]],
-        bold_headers: bool
-    ) -> int:
+        bold_headers: bool = False,
+        clear_existing: bool = False,
+        append: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], int]:
         """
-        Populate table cells with data, refreshing structure after each insertion.
-        
-        This prevents index shifting issues by getting fresh cell positions
-        before each insertion.
+        Build the requests that write table_data into a table, from one structure read.
+
+        Cells are processed in reverse document order so that text inserted in a
+        later cell never shifts the indices of the cells still to be written.
+        Each cell's formatting request directly follows its insertion, while
+        the cell's range is still exact.
+
+        Args:
+            table: Table info from find_tables
+            table_data: 2D list of cell strings
+            bold_headers: Bold the text written into the first row
+            clear_existing: Delete each target cell's current content first
+            append: Insert after existing content instead of at the cell start
+
+        Returns:
+            Tuple of (requests, number of cells written)
         """
+        cells = table.get('cells', [])
+        requests: List[Dict[str, Any]] = []
         population_count = 0
-        
-        for row_idx, row_data in enumerate(table_data):
-            logger.debug(f"Processing row {row_idx}: {len(row_data)} cells")
-            
-            for col_idx, cell_text in enumerate(row_data):
-                if not cell_text:  # Skip empty cells
+
+        for row_idx in range(min(len(table_data), len(cells)) - 1, -1, -1):
+            row_data = table_data[row_idx]
+            for col_idx in range(min(len(row_data), len(cells[row_idx])) - 1, -1, -1):
+                cell_text = row_data[col_idx]
+                cell = cells[row_idx][col_idx]
+                start = cell.get('insertion_index')
+                # The cell's last paragraph ends with a newline that must be kept
+                content_end = cell['end_index'] - 1
+
+                if clear_existing and content_end > start:
+                    requests.append(create_delete_range_request(start, content_end))
+                if not cell_text:
                     continue
-                    
-                try:
-                    # CRITICAL: Refresh document structure before each insertion
-                    success = await self._populate_single_cell(
-                        document_id, row_idx, col_idx, cell_text, bold_headers and row_idx == 0
+
+                insert_at = content_end if append and not clear_existing else start
+                requests.append(create_insert_text_request(insert_at, cell_text))
+                if bold_headers and row_idx == 0:
+                    requests.append(
+                        create_format_text_request(insert_at, insert_at + len(cell_text), bold=True)
                     )
-                    
-                    if success:
-                        population_count += 1
-                        logger.debug(f"Populated cell ({row_idx},{col_idx})")
-                    else:
-                        logger.warning(f"Failed to populate cell ({row_idx},{col_idx})")
-                        
-                except Exception as e:
-                    logger.error(f"Error populating cell ({row_idx},{col_idx}): {str(e)}")
-                    
-        return population_count
-    
-    async def _populate_single_cell(
-        self,
-        document_id: str,
-        row_idx: int,
-        col_idx: int,
-        cell_text: str,
-        apply_bold: bool = False
-    ) -> bool:
-        """
-        Populate a single cell with text, with optional bold formatting.
-        
-        Returns True if successful, False otherwise.
-        """
-        try:
-            # Get fresh table structure to avoid index shifting issues
-            tables = await self._get_document_tables(document_id)
-            if not tables:
-                return False
-                
-            table = tables[-1]  # Use the last table (newly created one)
-            cells = table.get('cells', [])
-            
-            # Bounds checking
-            if row_idx >= len(cells) or col_idx >= len(cells[row_idx]):
-                logger.error(f"Cell ({row_idx},{col_idx}) out of bounds")
-                return False
-                
-            cell = cells[row_idx][col_idx]
-            insertion_index = cell.get('insertion_index')
-            
-            if not insertion_index:
-                logger.warning(f"No insertion_index for cell ({row_idx},{col_idx})")
-                return False
-                
-            # Insert text
-            await asyncio.to_thread(
-                self.service.documents().batchUpdate(
-                    documentId=document_id,
-                    body={'requests': [{
-                        'insertText': {
-                            'location': {'index': insertion_index},
-                            'text': cell_text
-                        }
-                    }]}
-                ).execute
-            )
-            
-            # Apply bold formatting if requested
-            if apply_bold:
-                await self._apply_bold_formatting(
-                    document_id, insertion_index, insertion_index + len(cell_text)
-                )
-                
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to populate single cell: {str(e)}")
-            return False
-    
-    async def _apply_bold_formatting(
-        self,
-        document_id: str,
-        start_index: int,
-        end_index: int
-    ) -> None:
-        """Apply bold formatting to a text range."""
-        await asyncio.to_thread(
-            self.service.documents().batchUpdate(
-                documentId=document_id,
-                body={'requests': [{
-                    'updateTextStyle': {
-                        'range': {
-                            'startIndex': start_index,
-                            'endIndex': end_index
-                        },
-                        'textStyle': {'bold': True},
-                        'fields': 'bold'
-                    }
-                }]}
-            ).execute
-        )
-    
+                population_count += 1
+
+        return requests, population_count
+
+    async def _execute_requests(self, document_id: str, requests: List[Dict[str, Any]]) -> None:
+        """Submit all requests in one batchUpdate."""
+        if not requests:
+            return
+        logger.debug(f"Submitting {len(requests)} table requests in one batchUpdate")
+        await execute_batch_update(self.service, document_id, requests)
+
     async def populate_existing_table(
         self,
         document_id: str,
@@ -271,11 +228,15 @@ class TableOperationManager:
             if data_rows > table_rows or data_cols > table_cols:
                 return False, f"Data ({data_rows}x{data_cols}) exceeds table dimensions ({table_rows}x{table_cols})", {}
             
-            # Populate cells
-            population_count = await self._populate_existing_table_cells(
-                document_id, table_index, table_data
+            # Populate cells from this single structure read, in one batchUpdate
+            requests, population_count = self._build_cell_requests(
+                table_info,
+                table_data,
+                clear_existing=clear_existing,
+                append=True,
             )
-            
+            await self._execute_requests(document_id, requests)
+
             metadata = {
                 'table_index': table_index,
                 'populated_cells': population_count,
@@ -287,52 +248,3 @@ class TableOperationManager:
             
         except Exception as e:
             return False, f"Failed to populate existing table: {str(e)}", {}
-    
-    async def _populate_existing_table_cells(
-        self,
-        document_id: str,
-        table_index: int,
-        table_data: List[List[str]]
-    ) -> int:
-        """Populate cells in an existing table."""
-        population_count = 0
-        
-        for row_idx, row_data in enumerate(table_data):
-            for col_idx, cell_text in enumerate(row_data):
-                if not cell_text:
-                    continue
-                    
-                # Get fresh table structure for each cell
-                tables = await self._get_document_tables(document_id)
-                if table_index >= len(tables):
-                    break
-                    
-                table = tables[table_index]
-                cells = table.get('cells', [])
-                
-                if row_idx >= len(cells) or col_idx >= len(cells[row_idx]):
-                    continue
-                    
-                cell = cells[row_idx][col_idx]
-                
-                # For existing tables, append to existing content
-                cell_end = cell['end_index'] - 1  # Don't include cell end marker
-                
-                try:
-                    await asyncio.to_thread(
-                        self.service.documents().batchUpdate(
-                            documentId=document_id,
-                            body={'requests': [{
-                                'insertText': {
-                                    'location': {'index': cell_end},
-                                    'text': cell_text
-                                }
-                            }]}
-                        ).execute
-                    )
-                    population_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to populate existing cell ({row_idx},{col_idx}): {str(e)}")
-                    
-        return population_count
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""
+Drive Permission Audit
+
+Bulk sharing audit across many Drive files. Permissions are fetched with
+files.get through batch HTTP requests, several batches at a time, and each
+permission is classified as public, domain-wide, external or internal
+relative to the auditing user's domain.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from core.batching import (
+    chunked,
+    execute_batch_with_retry,
+    execute_with_retry,
+    new_authorized_http,
+    report_progress,
+    run_bounded,
+)
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = 50
+AUDIT_CONCURRENCY = 4
+
+PERMISSION_FIELDS = "permissions(id, type, role, emailAddress, domain, allowFileDiscovery)"
+AUDIT_FILE_FIELDS = f"id, name, mimeType, webViewLink, owners(emailAddress), {PERMISSION_FIELDS}"
+PERMISSION_LIST_PAGE_SIZE = 100
+
+# Finding categories, in report order
+PUBLIC_ON_WEB = "public_on_web"
+ANYONE_WITH_LINK = "anyone_with_link"
+EXTERNAL_DOMAIN = "external_domain"
+EXTERNAL_USER = "external_user"
+INTERNAL_DOMAIN = "internal_domain"
+
+CATEGORY_LABELS = {
+    PUBLIC_ON_WEB: "Public on the web (discoverable)",
+    ANYONE_WITH_LINK: "Anyone with the link",
+    EXTERNAL_DOMAIN: "Shared with another domain",
+    EXTERNAL_USER: "Shared with external users/groups",
+    INTERNAL_DOMAIN: "Shared with the whole internal domain",
+}
+
+
+def _email_domain(email: Optional[str]) -> str:
+    return email.rsplit("@", 1)[-1].lower() if email and "@" in email else ""
+
+
+def classify_permission(permission: Dict[str, Any], internal_domain: str) -> Optional[str]:
+    """
+    Classify one permission for the audit report.
+
+    Args:
+        permission: A Drive permission resource
+        internal_domain: The organisation's domain (lowercase)
+
+    Returns:
+        A finding category, or None for internal user/group shares
+    """
+    perm_type = permission.get("type")
+    if perm_type == "anyone":
+        return PUBLIC_ON_WEB if permission.get("allowFileDiscovery") else ANYONE_WITH_LINK
+    if perm_type == "domain":
+        domain = (permission.get("domain") or "").lower()
+        return INTERNAL_DOMAIN if domain == internal_domain else EXTERNAL_DOMAIN
+    if perm_type in ("user", "group"):
+        if _email_domain(permission.get("emailAddress")) != internal_domain:
+            return EXTERNAL_USER
+    return None
+
+
+def _describe_permission(permission: Dict[str, Any]) -> str:
+    target = permission.get("emailAddress") or permission.get("domain") or permission.get("type", "unknown")
+    return f"{target} ({permission.get('role', 'unknown')})"
+
+
+class PermissionAudit:
+    """Aggregated audit results."""
+
+    def __init__(self, internal_domain: str):
+        self.internal_domain = internal_domain
+        self.files_audited = 0
+        self.findings: Dict[str, List[Dict[str, Any]]] = {category: [] for category in CATEGORY_LABELS}
+        self.errors: List[str] = []
+
+    def add_file(self, file: Dict[str, Any], permissions: List[Dict[str, Any]]) -> None:
+        """Classify a file's permissions and record any findings."""
+        self.files_audited += 1
+        by_category: Dict[str, List[str]] = {}
+        for permission in permissions:
+            category = classify_permission(permission, self.internal_domain)
+            if category:
+                by_category.setdefault(category, []).append(_describe_permission(permission))
+        for category, grantees in by_category.items():
+            self.findings[category].append({"file": file, "grantees": grantees})
+
+    @property
+    def flagged_file_count(self) -> int:
+        return len({f["file"]["id"] for items in self.findings.values() for f in items})
+
+    def summary(self) -> str:
+        counts = ", ".join(
+            f"{len(self.findings[category])} {category.replace('_', ' ')}" for category in CATEGORY_LABELS
+        )
+        return f"{self.files_audited} files audited, {self.flagged_file_count} flagged ({counts})"
+
+
+async def _list_remaining_permissions(service, file_id: str, page_token: str, http=None) -> List[Dict[str, Any]]:
+    """Read the permissions.list pages after the first one."""
+    permissions: List[Dict[str, Any]] = []
+    while page_token:
+        response = await execute_with_retry(
+            service.permissions().list(
+                fileId=file_id,
+                fields=f"nextPageToken, {PERMISSION_FIELDS}",
+                pageSize=PERMISSION_LIST_PAGE_SIZE,
+                pageToken=page_token,
+                supportsAllDrives=True,
+            ),
+            http=http,
+            label="audit_drive_permissions",
+        )
+        permissions.extend(response.get("permissions", []))
+        page_token = response.get("nextPageToken")
+    return permissions
+
+
+async def audit_file_permissions(
+    service,
+    files: List[Dict[str, Any]],
+    internal_domain: str,
+    max_concurrency: int = AUDIT_CONCURRENCY,
+) -> PermissionAudit:
+    """
+    Fetch and classify permissions for many files.
+
+    Args:
+        service: Authenticated Drive API service
+        files: Files to audit; only "id" is required
+        internal_domain: The organisation's domain
+        max_concurrency: Maximum number of batch requests in flight
+
+    Returns:
+        PermissionAudit with aggregated findings
+    """
+    audit = PermissionAudit(internal_domain.lower())
+    chunks = list(chunked(files, AUDIT_BATCH_SIZE))
+    total = len(files)
+
+    async def _audit_chunk(chunk: List[Dict[str, Any]]) -> None:
+        http = new_authorized_http(service)
+        requests = {
+            f["id"]: service.files().get(fileId=f["id"], fields=AUDIT_FILE_FIELDS, supportsAllDrives=True)
+            for f in chunk
+        }
+        results = await execute_batch_with_retry(service, requests, http=http, label="audit_drive_permissions")
+
+        # Shared drive items may omit permissions from files.get; list them explicitly
+        missing = {
+            file_id: service.permissions().list(
+                fileId=file_id,
+                fields=f"nextPageToken, {PERMISSION_FIELDS}",
+                pageSize=PERMISSION_LIST_PAGE_SIZE,
+                supportsAllDrives=True,
+            )
+            for file_id, (response, error) in results.items()
+            if error is None and "permissions" not in response
+        }
+        permission_results = (
+            await execute_batch_with_retry(service, missing, http=http, label="audit_drive_permissions")
+            if missing
+            else {}
+        )
+
+        for file_id, (response, error) in results.items():
+            if error is not None:
+                audit.errors.append(f"{file_id}: {error}")
+                continue
+            permissions = response.get("permissions")
+            if permissions is None:
+                listed, list_error = permission_results.get(file_id, (None, "No response"))
+                if list_error is not None:
+                    audit.errors.append(f"{file_id}: could not list permissions: {list_error}")
+                    continue
+                permissions = listed.get("permissions", [])
+                if listed.get("nextPageToken"):
+                    # Rare: more permissions than fit on one page
+                    try:
+                        permissions = permissions + await _list_remaining_permissions(
+                            service, file_id, listed["nextPageToken"], http
+                        )
+                    except Exception as e:
+                        audit.errors.append(f"{file_id}: could not list all permissions: {e}")
+                        continue
+            audit.add_file(response, permissions)
+
+        await report_progress(
+            audit.files_audited + len(audit.errors), total, f"Audited {audit.files_audited}/{total}: {audit.summary()}"
+        )
+
+    for chunk, _, error in await run_bounded(chunks, _audit_chunk, max_concurrency):
+        if error is not None:
+            audit.errors.extend(f"{f['id']}: {error}" for f in chunk)
+
+    logger.info(f"[audit_drive_permissions] {audit.summary()}")
+    return audit
+
+
+def format_permission_audit(audit: PermissionAudit, max_listed: int = 100) -> str:
+    """Render an audit as a report grouped by finding category."""
+    lines = [f"Sharing audit (internal domain: {audit.internal_domain}): {audit.summary()}."]
+    for category, label in CATEGORY_LABELS.items():
+        items = audit.findings[category]
+        if not items:
+            continue
+        lines.append("")
+        lines.append(f"{label} - {len(items)} files:")
+        for item in items[:max_listed]:
+            file = item["file"]
+            lines.append(
+                f"  - \"{file.get('name', 'Unknown')}\" (ID: {file['id']}) → {', '.join(item['grantees'])}"
+            )
+        if len(items) > max_listed:
+            lines.append(f"  ... and {len(items) - max_listed} more")
+    if audit.errors:
+        lines.append("")
+        lines.append(f"Errors ({len(audit.errors)}):")
+        lines.extend(f"  - {error}" for error in audit.errors[:max_listed])
+        if len(audit.errors) > max_listed:
+            lines.append(f"  ... and {len(audit.errors) - max_listed} more")
+    return "\n".join(lines)
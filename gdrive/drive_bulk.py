@@ -0,0 +1,236 @@
+"""
+Bulk Drive File Operations
+
+Executes many move / copy / rename / trash / untrash operations through Drive
+batch HTTP requests with bounded concurrency. Every item's outcome is tracked
+individually and written to a resumable job checkpoint, retryable sub-request
+failures are re-submitted, and a dry run reports what would change without
+modifying anything. Copies are only re-submitted after rate limiting: a copy
+that failed with a server error may still have been made, so it is reported
+(and journaled) as having an unknown outcome instead of being copied again.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.batching import (
+    chunked,
+    execute_batch_with_retry,
+    is_ambiguous_error,
+    is_rate_limit_error,
+    is_retryable_error,
+    new_authorized_http,
+    report_progress,
+    run_bounded,
+)
+from core.job_checkpoint import JobCheckpoint
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 50
+BULK_CONCURRENCY = 4
+BULK_MAX_REPORTED_ITEMS = 100
+
+BULK_ACTIONS = {"move", "copy", "rename", "trash", "untrash"}
+
+# Keys each action requires besides file_id
+_REQUIRED_KEYS = {
+    "move": ("target_folder_id",),
+    "copy": (),
+    "rename": ("name",),
+    "trash": (),
+    "untrash": (),
+}
+
+
+def validate_operations(operations: List[Dict[str, Any]]) -> List[str]:
+    """
+    Check operation records before anything is executed.
+
+    Returns:
+        List of validation error messages (empty if all records are valid)
+    """
+    errors = []
+    for position, op in enumerate(operations):
+        if not isinstance(op, dict):
+            errors.append(f"#{position}: operation must be an object")
+            continue
+        action = op.get("action")
+        if action not in BULK_ACTIONS:
+            errors.append(f"#{position}: unknown action '{action}' (expected one of {', '.join(sorted(BULK_ACTIONS))})")
+            continue
+        missing = [key for key in ("file_id",) + _REQUIRED_KEYS[action] if not op.get(key)]
+        if missing:
+            errors.append(f"#{position}: {action} requires {', '.join(missing)}")
+    return errors
+
+
+def _build_request(service, op: Dict[str, Any], current: Dict[str, Any]):
+    """Build the files.update / files.copy request for one operation."""
+    files = service.files()
+    action = op["action"]
+    file_id = op["file_id"]
+    if action == "copy":
+        body: Dict[str, Any] = {}
+        if op.get("name"):
+            body["name"] = op["name"]
+        if op.get("target_folder_id"):
+            body["parents"] = [op["target_folder_id"]]
+        return files.copy(fileId=file_id, body=body, fields="id, name, parents", supportsAllDrives=True)
+    if action == "move":
+        params = {"addParents": op["target_folder_id"]}
+        remove_parents = [p for p in current.get("parents", []) if p != op["target_folder_id"]]
+        if remove_parents:
+            params["removeParents"] = ",".join(remove_parents)
+        return files.update(fileId=file_id, fields="id, name, parents", supportsAllDrives=True, **params)
+    if action == "rename":
+        body = {"name": op["name"]}
+    else:
+        body = {"trashed": action == "trash"}
+    return files.update(fileId=file_id, body=body, fields="id, name, parents", supportsAllDrives=True)
+
+
+def describe_operation(op: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """Describe what an operation will do, for dry runs and reports."""
+    name = current.get("name", op["file_id"])
+    action = op["action"]
+    if action == "move":
+        return f"move \"{name}\" from {', '.join(current.get('parents', [])) or '(no parent)'} to {op['target_folder_id']}"
+    if action == "copy":
+        destination = op.get("target_folder_id") or "same folder"
+        return f"copy \"{name}\" as \"{op.get('name') or 'Copy of ' + name}\" into {destination}"
+    if action == "rename":
+        return f"rename \"{name}\" to \"{op['name']}\""
+    return f"{action} \"{name}\""
+
+
+class BulkOperationResult:
+    """Per-item outcomes of a bulk run."""
+
+    def __init__(self, total: int, previously_completed: int = 0):
+        self.total = total
+        self.previously_completed = previously_completed
+        self.succeeded: List[Tuple[str, str]] = []
+        self.failed: List[Tuple[str, str]] = []
+        self.unknown: List[Tuple[str, str]] = []
+        self.planned: List[Tuple[str, str]] = []
+
+    @property
+    def processed(self) -> int:
+        return (
+            self.previously_completed + len(self.succeeded) + len(self.failed) + len(self.unknown) + len(self.planned)
+        )
+
+
+async def _fetch_current(service, keyed_ops: List[Tuple[str, Dict[str, Any]]]):
+    """Batch files.get for the current name and parents of each operation's file."""
+    requests = {
+        key: service.files().get(fileId=op["file_id"], fields="id, name, parents, mimeType", supportsAllDrives=True)
+        for key, op in keyed_ops
+    }
+    return await execute_batch_with_retry(
+        service, requests, http=new_authorized_http(service), label="bulk_drive_operations"
+    )
+
+
+async def run_bulk_operations(
+    service,
+    operations: List[Dict[str, Any]],
+    checkpoint: Optional[JobCheckpoint] = None,
+    dry_run: bool = False,
+    max_concurrency: int = BULK_CONCURRENCY,
+) -> BulkOperationResult:
+    """
+    Execute (or plan) bulk Drive operations.
+
+    Each batch first reads the current metadata of its files (one batch
+    request), then applies the changes (a second batch request). Items
+    already completed in the checkpoint are skipped.
+
+    Args:
+        service: Authenticated Drive API service
+        operations: Validated operation records (see validate_operations)
+        checkpoint: Progress journal for resuming; not written in dry runs
+        dry_run: Only describe what would change
+        max_concurrency: Maximum number of batches in flight
+
+    Returns:
+        BulkOperationResult with per-item outcomes keyed by operation position
+    """
+    completed = checkpoint.load_completed() if checkpoint is not None and not dry_run else set()
+    keyed_ops = [(str(position), op) for position, op in enumerate(operations) if str(position) not in completed]
+    result = BulkOperationResult(len(operations), len(operations) - len(keyed_ops))
+
+    def _fail(key: str, op: Dict[str, Any], error: Any) -> None:
+        message = f"{op['action']} {op['file_id']}: {error}"
+        status = "error"
+        if op["action"] == "copy" and isinstance(error, Exception) and is_ambiguous_error(error):
+            # The copy may exist already; a re-run must not make a second one
+            result.unknown.append((key, message))
+            status = "unknown"
+        else:
+            result.failed.append((key, message))
+        if checkpoint is not None and not dry_run:
+            checkpoint.record(key, status, action=op["action"], file_id=op["file_id"], error=str(error))
+
+    async def _execute(ready: List[Tuple[str, Dict[str, Any], Dict[str, Any]]], retry_if):
+        requests = {key: _build_request(service, op, current) for key, op, current in ready}
+        try:
+            return await execute_batch_with_retry(
+                service, requests, http=new_authorized_http(service), label="bulk_drive_operations", retry_if=retry_if
+            )
+        except Exception as e:
+            return {key: (None, e) for key in requests}
+
+    async def _run_chunk(chunk: List[Tuple[str, Dict[str, Any]]]) -> None:
+        current_results = await _fetch_current(service, chunk)
+        ready = []
+        for key, op in chunk:
+            current, error = current_results.get(key, (None, "No response"))
+            if error is not None:
+                _fail(key, op, error)
+            elif dry_run:
+                result.planned.append((key, describe_operation(op, current)))
+            else:
+                ready.append((key, op, current))
+
+        if ready:
+            # Updates are idempotent and retried on any transient error; copies only after rate limiting
+            copies = [item for item in ready if item[1]["action"] == "copy"]
+            updates = [item for item in ready if item[1]["action"] != "copy"]
+            responses = {}
+            if updates:
+                responses.update(await _execute(updates, is_retryable_error))
+            if copies:
+                responses.update(await _execute(copies, is_rate_limit_error))
+            for key, op, current in ready:
+                response, error = responses.get(key, (None, "No response"))
+                if error is not None:
+                    _fail(key, op, error)
+                    continue
+                result.succeeded.append((key, describe_operation(op, current)))
+                if checkpoint is not None:
+                    checkpoint.record(
+                        key, "ok", action=op["action"], file_id=op["file_id"], result_id=(response or {}).get("id")
+                    )
+
+        await report_progress(
+            result.processed,
+            result.total,
+            f"{'Planned' if dry_run else 'Processed'} {result.processed}/{result.total} operations "
+            f"({len(result.failed)} failed, {len(result.unknown)} unknown)",
+        )
+
+    chunks = list(chunked(keyed_ops, BULK_BATCH_SIZE))
+    for chunk, _, error in await run_bounded(chunks, _run_chunk, max_concurrency):
+        if error is not None:
+            # Whole batch failed (e.g. auth); items stay pending in the checkpoint
+            for key, op in chunk:
+                result.failed.append((key, f"{op['action']} {op['file_id']}: {error}"))
+
+    logger.info(
+        f"[bulk_drive_operations] {'Dry run' if dry_run else 'Run'} finished: {len(result.succeeded)} succeeded, "
+        f"{len(result.failed)} failed, {len(result.unknown)} unknown, {len(result.planned)} planned, "
+        f"{result.previously_completed} skipped"
+    )
+    return result
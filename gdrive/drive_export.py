@@ -0,0 +1,273 @@
+"""
+Streaming Exports of Google Docs, Sheets and Slides
+
+Exports native Google files with the Drive files.export endpoint and streams
+each export either into a new Drive file (through a resumable upload, see
+gdrive.drive_upload) or into a local spool file, never holding a whole
+export in memory. All (file, format) pairs of a call are processed
+concurrently with a bounded number in flight, and every pair gets its own
+result so one failure does not abort the rest.
+
+Drive limits export output to about 10 MB per file.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from auth.oauth_config import is_stateless_mode
+from core.batching import (
+    execute_batch_with_retry,
+    new_authorized_http,
+    report_progress,
+    run_bounded,
+)
+from core.job_checkpoint import get_default_state_dir
+from gdrive.drive_upload import (
+    UPLOAD_TIMEOUT,
+    DriveUploadError,
+    UploadAuth,
+    upload_response_to_drive,
+)
+
+logger = logging.getLogger(__name__)
+
+DRIVE_EXPORT_URL = "https://www.googleapis.com/drive/v3/files/{file_id}/export"
+EXPORT_CONCURRENCY = 4
+EXPORT_MAX_BYTES = 10 * 1024 * 1024
+
+DOCUMENT_MIME_TYPE = "application/vnd.google-apps.document"
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+PRESENTATION_MIME_TYPE = "application/vnd.google-apps.presentation"
+
+# Source MIME type -> format name -> export MIME type
+EXPORT_FORMATS: Dict[str, Dict[str, str]] = {
+    DOCUMENT_MIME_TYPE: {
+        "pdf": "application/pdf",
+        "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "odt": "application/vnd.oasis.opendocument.text",
+        "txt": "text/plain",
+        "md": "text/markdown",
+        "epub": "application/epub+zip",
+    },
+    SPREADSHEET_MIME_TYPE: {
+        "pdf": "application/pdf",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "ods": "application/vnd.oasis.opendocument.spreadsheet",
+        "csv": "text/csv",
+        "tsv": "text/tab-separated-values",
+    },
+    PRESENTATION_MIME_TYPE: {
+        "pdf": "application/pdf",
+        "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "odp": "application/vnd.oasis.opendocument.presentation",
+        "txt": "text/plain",
+    },
+}
+
+EXPORT_DESTINATIONS = ("drive", "local")
+
+
+def get_export_dir() -> str:
+    """Directory for local export spool files (EXPORT_LOCAL_DIR, default <state dir>/exports)."""
+    return os.path.expanduser(os.getenv("EXPORT_LOCAL_DIR") or os.path.join(get_default_state_dir(), "exports"))
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.\- ]+", "_", name).strip() or "export"
+
+
+class ExportResult:
+    """Outcome of exporting one file to one format."""
+
+    def __init__(self, file_id: str, export_format: str, name: Optional[str] = None):
+        self.file_id = file_id
+        self.export_format = export_format
+        self.name = name
+        self.output: Optional[Dict[str, Any]] = None  # Drive file resource or {"path": ...}
+        self.size: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def describe(self) -> str:
+        label = f"{self.name or self.file_id} → {self.export_format}"
+        if self.error:
+            return f"{label}: ERROR {self.error}"
+        size = f", {self.size:,} bytes" if self.size is not None else ""
+        if self.output and "path" in self.output:
+            return f"{label}: saved to {self.output['path']}{size}"
+        output = self.output or {}
+        return f"{label}: '{output.get('name')}' (ID: {output.get('id')}{size}) {output.get('webViewLink', '')}".rstrip()
+
+
+async def _spool_to_file(response: httpx.Response, path: str, max_bytes: int) -> int:
+    """Write a streamed response to path via a temporary file; returns the byte count."""
+    tmp_path = f"{path}.part"
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            async for piece in response.aiter_bytes():
+                written += len(piece)
+                if written > max_bytes:
+                    raise DriveUploadError(f"Export exceeds the size limit of {max_bytes} bytes")
+                await asyncio.to_thread(f.write, piece)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+async def export_file(
+    service,
+    client: httpx.AsyncClient,
+    file: Dict[str, Any],
+    export_format: str,
+    destination: str = "drive",
+    folder_id: Optional[str] = None,
+    output_name: Optional[str] = None,
+    max_bytes: int = EXPORT_MAX_BYTES,
+) -> ExportResult:
+    """
+    Export one native Google file to one format, streaming the output.
+
+    Args:
+        service: Authenticated Drive API service (used for its credentials)
+        client: HTTP client shared by the exports of one call
+        file: Drive metadata with id, name and mimeType
+        export_format: Format name from EXPORT_FORMATS
+        destination: "drive" to upload a new Drive file, "local" to spool to get_export_dir()
+        folder_id: Drive folder for uploaded exports (default: the source's first parent)
+        output_name: File name for the export (default: "<name>.<format>")
+
+    Returns:
+        ExportResult; errors are recorded on it rather than raised
+    """
+    result = ExportResult(file["id"], export_format, file.get("name"))
+    export_mime = EXPORT_FORMATS.get(file.get("mimeType"), {}).get(export_format)
+    if export_mime is None:
+        supported = ", ".join(EXPORT_FORMATS.get(file.get("mimeType"), {})) or "none"
+        result.error = f"cannot export {file.get('mimeType')} as {export_format} (supported: {supported})"
+        return result
+    name = output_name or f"{file.get('name', file['id'])}.{export_format}"
+
+    try:
+        auth = UploadAuth(service)
+        access_token = await auth.get_token()
+        async with client.stream(
+            "GET",
+            DRIVE_EXPORT_URL.format(file_id=file["id"]),
+            params={"mimeType": export_mime},
+            headers={"Authorization": f"Bearer {access_token}"},
+        ) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode("utf-8", errors="replace")
+                raise DriveUploadError(f"export failed (status {response.status_code}): {body[:300]}")
+
+            if destination == "local":
+                # Keep the extension last: "<name>-<file id>.<format>"
+                stem = name[: -len(export_format) - 1] if name.endswith(f".{export_format}") else name
+                path = os.path.join(get_export_dir(), f"{_safe_name(stem)}-{file['id']}.{export_format}")
+                result.size = await _spool_to_file(response, path, max_bytes)
+                result.output = {"path": path}
+            else:
+                parents = [folder_id] if folder_id else file.get("parents", [])[:1]
+                metadata: Dict[str, Any] = {"name": name, "mimeType": export_mime}
+                if parents:
+                    metadata["parents"] = parents
+                result.output = await upload_response_to_drive(
+                    client,
+                    response,
+                    auth,
+                    metadata,
+                    export_mime,
+                    max_bytes=max_bytes,
+                    fields="id, name, webViewLink, parents, size",
+                    source=f"export of {file['id']} as {export_format}",
+                )
+                if result.output.get("size"):
+                    result.size = int(result.output["size"])
+    except (httpx.HTTPError, DriveUploadError, OSError) as e:
+        result.error = str(e)
+    return result
+
+
+async def export_files(
+    service,
+    file_ids: List[str],
+    formats: List[str],
+    destination: str = "drive",
+    folder_id: Optional[str] = None,
+    max_concurrency: int = EXPORT_CONCURRENCY,
+) -> List[ExportResult]:
+    """
+    Export many files to one or more formats concurrently.
+
+    Args:
+        service: Authenticated Drive API service
+        file_ids: Native Google files to export
+        formats: Format names; each file is exported to every format it supports
+            (unsupported combinations produce an error result)
+        destination: "drive" or "local"
+        folder_id: Drive folder for uploaded exports
+        max_concurrency: Maximum number of exports in flight
+
+    Returns:
+        One ExportResult per (file, format) pair, in input order
+    """
+    if destination not in EXPORT_DESTINATIONS:
+        raise ValueError(f"Unsupported destination '{destination}'. Supported: {', '.join(EXPORT_DESTINATIONS)}")
+    if destination == "local":
+        if is_stateless_mode():
+            raise ValueError("Local export destination is not available in stateless mode")
+        os.makedirs(get_export_dir(), exist_ok=True)
+
+    unique_ids = list(dict.fromkeys(file_ids))
+    metadata = await execute_batch_with_retry(
+        service,
+        {
+            file_id: service.files().get(fileId=file_id, fields="id, name, mimeType, parents", supportsAllDrives=True)
+            for file_id in unique_ids
+        },
+        http=new_authorized_http(service),
+        label="export_drive_files",
+    )
+
+    results: List[ExportResult] = []
+    pairs = []
+    for file_id in unique_ids:
+        file, error = metadata.get(file_id, (None, "No response"))
+        for export_format in formats:
+            if error is not None:
+                failed = ExportResult(file_id, export_format)
+                failed.error = f"could not read file metadata: {error}"
+                results.append(failed)
+            else:
+                pairs.append((file, export_format))
+
+    done = 0
+    total = len(pairs)
+    async with httpx.AsyncClient(timeout=UPLOAD_TIMEOUT) as client:
+
+        async def _export(pair) -> ExportResult:
+            nonlocal done
+            result = await export_file(service, client, pair[0], pair[1], destination, folder_id)
+            done += 1
+            await report_progress(done, total, f"Exported {done}/{total}")
+            return result
+
+        for pair, result, error in await run_bounded(pairs, _export, max_concurrency):
+            if error is not None:
+                result = ExportResult(pair[0]["id"], pair[1], pair[0].get("name"))
+                result.error = str(error)
+            results.append(result)
+
+    order = {file_id: position for position, file_id in enumerate(unique_ids)}
+    results.sort(key=lambda r: (order.get(r.file_id, 0), formats.index(r.export_format)))
+    failed = sum(1 for r in results if r.error)
+    logger.info(f"[export_drive_files] {len(results) - failed} exports succeeded, {failed} failed")
+    return results
@@ -1,10 +1,15 @@
 """
 Google Drive Helper Functions
 
-Shared utilities for Google Drive operations including permission checking.
+Shared utilities for Google Drive operations including permission checking
+and ranged content downloads.
 """
+import asyncio
+import codecs
 import re
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+
+from core.batching import new_authorized_http
 
 
 def check_public_link_permission(permissions: List[Dict[str, Any]]) -> bool:
@@ -70,12 +75,20 @@ DRIVE_QUERY_PATTERNS = [
 ]
 
 
+# files.list field projections; keep them to what callers actually display
+DRIVE_FILE_FIELDS = "id, name, mimeType, webViewLink, modifiedTime, size"
+DRIVE_LIST_MAX_PAGE_SIZE = 1000  # API maximum for files.list
+
+
 def build_drive_list_params(
     query: str,
     page_size: int,
     drive_id: Optional[str] = None,
     include_items_from_all_drives: bool = True,
     corpora: Optional[str] = None,
+    file_fields: str = DRIVE_FILE_FIELDS,
+    order_by: Optional[str] = None,
+    page_token: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Helper function to build common list parameters for Drive API calls.
@@ -86,6 +99,9 @@ def build_drive_list_params(
         drive_id: Optional shared drive ID
         include_items_from_all_drives: Whether to include items from all drives
         corpora: Optional corpus specification
+        file_fields: Fields to request for each file
+        order_by: Optional sort order (e.g. "modifiedTime desc")
+        page_token: Optional token of the page to start from
 
     Returns:
         Dictionary of parameters for Drive API list calls
@@ -93,7 +109,7 @@ def build_drive_list_params(
     list_params = {
         "q": query,
         "pageSize": page_size,
-        "fields": "nextPageToken, files(id, name, mimeType, webViewLink, iconLink, modifiedTime, size)",
+        "fields": f"nextPageToken, files({file_fields})",
         "supportsAllDrives": True,
         "includeItemsFromAllDrives": include_items_from_all_drives,
     }
@@ -107,4 +123,277 @@ def build_drive_list_params(
     elif corpora:
         list_params["corpora"] = corpora
 
-    return list_params
\ No newline at end of file
+    if order_by:
+        list_params["orderBy"] = order_by
+    if page_token:
+        list_params["pageToken"] = page_token
+
+    return list_params
+
+
+class DriveFileLister:
+    """
+    Async iterator over files.list results across pages.
+
+    Fetches up to `max_results` files, requesting each page sized to what is
+    still needed so iteration always stops on a page boundary. While the
+    caller consumes one page, the next one is already being fetched. After
+    iteration, `next_page_token` holds the cursor to continue from (None when
+    the listing is exhausted).
+
+    Usage:
+        lister = DriveFileLister(service, build_drive_list_params(...), max_results=200)
+        async for file in lister:
+            ...
+    """
+
+    def __init__(self, service, list_params: Dict[str, Any], max_results: int):
+        self.service = service
+        self.list_params = dict(list_params)
+        self.max_results = max(1, max_results)
+        self.next_page_token: Optional[str] = self.list_params.pop("pageToken", None)
+        # Pages are fetched one at a time, so one dedicated transport suffices
+        self._http = new_authorized_http(service)
+
+    def _fetch(self, page_token: Optional[str], page_size: int) -> "asyncio.Task":
+        params = dict(self.list_params, pageSize=min(page_size, DRIVE_LIST_MAX_PAGE_SIZE))
+        if page_token:
+            params["pageToken"] = page_token
+        request = self.service.files().list(**params)
+        return asyncio.ensure_future(asyncio.to_thread(request.execute, http=self._http))
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Dict[str, Any]]:
+        remaining = self.max_results
+        pending = self._fetch(self.next_page_token, remaining)
+        try:
+            while pending is not None:
+                response = await pending
+                files = response.get("files", [])[:remaining]
+                remaining -= len(files)
+                self.next_page_token = response.get("nextPageToken")
+                # Prefetch the next page while this one is consumed
+                pending = (
+                    self._fetch(self.next_page_token, remaining)
+                    if self.next_page_token and remaining > 0
+                    else None
+                )
+                for file in files:
+                    yield file
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def collect(self) -> List[Dict[str, Any]]:
+        """Fetch all results (up to max_results) into a list."""
+        return [file async for file in self]
+
+
+def format_page_token_hint(page_token: Optional[str]) -> str:
+    """Format the continuation hint appended to listing output."""
+    if not page_token:
+        return ""
+    return f"\n\nMore results available. Call again with page_token='{page_token}' to continue."
+
+
+# Content download limits for get_drive_file_content
+DRIVE_CONTENT_DEFAULT_MAX_BYTES = 1024 * 1024
+DRIVE_CONTENT_MAX_BYTES_LIMIT = 10 * 1024 * 1024
+DRIVE_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Office files must be fetched whole (the zip directory sits at the end)
+DRIVE_OFFICE_MAX_BYTES = 50 * 1024 * 1024
+# Bytes inspected for NUL characters when sniffing content of unknown type
+BINARY_SNIFF_BYTES = 8192
+
+TEXT_MIME_TYPES = {
+    "application/json",
+    "application/ld+json",
+    "application/xml",
+    "application/javascript",
+    "application/x-javascript",
+    "application/ecmascript",
+    "application/x-yaml",
+    "application/yaml",
+    "application/toml",
+    "application/sql",
+    "application/csv",
+    "application/x-sh",
+    "application/x-python",
+    "application/x-httpd-php",
+    "application/rtf",
+    "image/svg+xml",
+}
+
+BINARY_MIME_PREFIXES = ("image/", "video/", "audio/", "font/")
+
+BINARY_MIME_TYPES = {
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-tar",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.rar",
+    "application/x-bzip2",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.ms-powerpoint",
+    "application/x-msdownload",
+    "application/java-archive",
+    "application/vnd.android.package-archive",
+    "application/x-iso9660-image",
+    "application/x-apple-diskimage",
+}
+
+
+def classify_mime_type(mime_type: str) -> str:
+    """
+    Decide from the MIME type alone whether a file's bytes are worth decoding.
+
+    Args:
+        mime_type: The file's Drive mimeType
+
+    Returns:
+        str: "text", "binary", or "unknown" (content must be sniffed)
+    """
+    mime_type = (mime_type or "").lower()
+    if (
+        mime_type.startswith("text/")
+        or mime_type in TEXT_MIME_TYPES
+        or mime_type.endswith(("+json", "+xml"))
+    ):
+        return "text"
+    if mime_type.startswith(BINARY_MIME_PREFIXES) or mime_type in BINARY_MIME_TYPES:
+        return "binary"
+    return "unknown"
+
+
+def _skip_utf8_continuation_bytes(data: bytes, start: int) -> int:
+    """Advance past UTF-8 continuation bytes so decoding starts on a character boundary."""
+    limit = min(len(data), start + 3)
+    while start < limit and 0x80 <= data[start] <= 0xBF:
+        start += 1
+    return start
+
+
+def slice_utf8_window(
+    data: bytes, offset: int, max_bytes: int
+) -> Tuple[str, Optional[int]]:
+    """
+    Decode a byte window of in-memory UTF-8 content without splitting characters.
+
+    Args:
+        data: UTF-8 encoded content
+        offset: Byte offset to start from (moved forward to a character boundary)
+        max_bytes: Maximum number of bytes to decode
+
+    Returns:
+        Tuple of (text, next_offset) where next_offset is None at end of content
+
+    Raises:
+        UnicodeDecodeError: If the window is not valid UTF-8
+    """
+    start = _skip_utf8_continuation_bytes(data, offset)
+    end = min(len(data), start + max_bytes)
+    if end < len(data):
+        # Back off so the window does not end in the middle of a character
+        boundary = end
+        while boundary > start and 0x80 <= data[boundary] <= 0xBF:
+            boundary -= 1
+        if boundary > start:
+            end = boundary
+    text = data[start:end].decode("utf-8")
+    return text, (end if end < len(data) else None)
+
+
+def _fetch_byte_range(service, file_id: str, start: int, end: int) -> bytes:
+    """
+    Download bytes start..end (inclusive) of a file's content with an HTTP Range request.
+
+    Runs synchronously; call through asyncio.to_thread.
+    """
+    request = service.files().get_media(fileId=file_id)
+    request.headers["Range"] = f"bytes={start}-{end}"
+    content = request.execute()
+    # Guard against a server that ignores Range and returns the whole body
+    return content[: end - start + 1]
+
+
+async def stream_utf8_window(
+    service,
+    file_id: str,
+    offset: int,
+    max_bytes: int,
+    file_size: Optional[int] = None,
+    chunk_size: int = DRIVE_DOWNLOAD_CHUNK_SIZE,
+) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Download and incrementally decode a byte window of a file's content as UTF-8.
+
+    Content is fetched in Range-request chunks and decoded as it arrives, so
+    only the requested window is ever transferred or held in memory. Content
+    containing NUL bytes or invalid UTF-8 is treated as binary.
+
+    Args:
+        service: Authenticated Drive API service
+        file_id: Drive file ID
+        offset: Byte offset to start from (moved forward to a character boundary)
+        max_bytes: Maximum number of bytes to download
+        file_size: Size of the file in bytes, if known
+        chunk_size: Bytes requested per Range request
+
+    Returns:
+        Tuple of (text, next_offset). text is None if the content is binary;
+        next_offset is None when the end of the file was reached.
+    """
+    end = offset + max_bytes
+    if file_size is not None:
+        end = min(end, file_size)
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts: List[str] = []
+    position = offset
+    reached_eof = file_size is not None and position >= end
+
+    while position < end:
+        requested = min(chunk_size, end - position)
+        data = await asyncio.to_thread(
+            _fetch_byte_range, service, file_id, position, position + requested - 1
+        )
+        if not data:
+            reached_eof = True
+            break
+
+        chunk = data
+        if position == offset:
+            if offset > 0:
+                chunk = chunk[_skip_utf8_continuation_bytes(chunk, 0):]
+            if b"\x00" in chunk[:BINARY_SNIFF_BYTES]:
+                return None, None
+
+        try:
+            parts.append(decoder.decode(chunk))
+        except UnicodeDecodeError:
+            return None, None
+
+        position += len(data)
+        if len(data) < requested:
+            reached_eof = True
+            break
+
+    if file_size is not None and position >= file_size:
+        reached_eof = True
+
+    if reached_eof:
+        try:
+            parts.append(decoder.decode(b"", final=True))
+        except UnicodeDecodeError:
+            return None, None
+        return "".join(parts), None
+
+    # Bytes of a character split across the window edge are re-read next time
+    pending, _ = decoder.getstate()
+    return "".join(parts), position - len(pending)
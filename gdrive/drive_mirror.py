@@ -0,0 +1,423 @@
+"""
+Drive Metadata Mirror
+
+Opt-in local SQLite index of Drive file metadata, one database per user.
+Each corpus (the user's own files, or one shared drive) is bootstrapped once
+with files.list and then kept current with changes.list, so folder listings
+and name/type/modified-time queries are answered locally.
+
+Tools that create, move or rename files through this server call
+mark_drive_mirror_stale so the next lookup replays changes.list first.
+
+Enable with DRIVE_MIRROR_ENABLED=true. The mirror is never used in stateless
+mode. Databases live under WORKSPACE_MCP_STATE_DIR/drive_mirror.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+from auth.oauth_config import is_stateless_mode
+from core.batching import execute_with_retry
+from core.job_checkpoint import get_default_state_dir
+
+logger = logging.getLogger(__name__)
+
+# Minimum interval between changes.list refreshes of one corpus
+DRIVE_MIRROR_REFRESH_SECONDS = float(os.getenv("DRIVE_MIRROR_REFRESH_SECONDS", "30"))
+DRIVE_MIRROR_PAGE_SIZE = 1000
+
+# Scope key used for the user's own corpus (My Drive and shared with me)
+USER_SCOPE = "user"
+
+MIRROR_FILE_FIELDS = "id, name, mimeType, parents, modifiedTime, size, webViewLink, trashed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    scope TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    modified_time TEXT,
+    size INTEGER,
+    web_view_link TEXT,
+    PRIMARY KEY (scope, id)
+);
+CREATE INDEX IF NOT EXISTS files_modified ON files (scope, modified_time);
+CREATE INDEX IF NOT EXISTS files_mime ON files (scope, mime_type);
+CREATE TABLE IF NOT EXISTS parents (
+    scope TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    PRIMARY KEY (scope, parent_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS parents_file ON parents (scope, file_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,
+    page_token TEXT NOT NULL,
+    root_id TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def is_drive_mirror_enabled() -> bool:
+    """Check whether the Drive metadata mirror is enabled for this server."""
+    if is_stateless_mode():
+        return False
+    return os.getenv("DRIVE_MIRROR_ENABLED", "false").lower() in ("true", "1", "yes")
+
+
+def mirror_scope(drive_id: Optional[str] = None, corpora: Optional[str] = None) -> Optional[str]:
+    """
+    Map listing parameters to a mirror scope.
+
+    Returns:
+        The scope key, or None if the corpus cannot be served by the mirror
+        (e.g. 'allDrives' or 'domain')
+    """
+    if drive_id:
+        return drive_id
+    if corpora in (None, "user"):
+        return USER_SCOPE
+    return None
+
+
+def _row_to_file(row: sqlite3.Row) -> Dict[str, Any]:
+    """Convert a files row into the dict shape returned by files.list."""
+    item = {
+        "id": row["id"],
+        "name": row["name"],
+        "mimeType": row["mime_type"],
+        "modifiedTime": row["modified_time"],
+        "webViewLink": row["web_view_link"],
+    }
+    if row["size"] is not None:
+        item["size"] = str(row["size"])
+    return item
+
+
+class DriveMirror:
+    """SQLite-backed metadata index for one user's Drive corpora."""
+
+    def __init__(self, user_google_email: str, db_path: str):
+        self.user_google_email = user_google_email
+        self.db_path = db_path
+        self._sync_lock = asyncio.Lock()
+        # Syncs that started before this time may have missed this server's own writes
+        self._stale_at = time.time()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # ---- sync -------------------------------------------------------------
+
+    def _scope_params(self, scope: str) -> Dict[str, Any]:
+        if scope == USER_SCOPE:
+            return {"supportsAllDrives": True, "includeItemsFromAllDrives": False}
+        return {"supportsAllDrives": True, "includeItemsFromAllDrives": True, "driveId": scope}
+
+    def _get_sync_state(self, scope: str) -> Optional[sqlite3.Row]:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT page_token, root_id, synced_at FROM sync_state WHERE scope = ?", (scope,)
+            ).fetchone()
+
+    def _upsert_files(self, conn: sqlite3.Connection, scope: str, files: List[Dict[str, Any]]) -> None:
+        live = [f for f in files if not f.get("trashed")]
+        trashed_ids = [(scope, f["id"]) for f in files if f.get("trashed")]
+        if trashed_ids:
+            conn.executemany("DELETE FROM files WHERE scope = ? AND id = ?", trashed_ids)
+            conn.executemany("DELETE FROM parents WHERE scope = ? AND file_id = ?", trashed_ids)
+        conn.executemany(
+            "INSERT OR REPLACE INTO files (scope, id, name, mime_type, modified_time, size, web_view_link) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    scope,
+                    f["id"],
+                    f.get("name", ""),
+                    f.get("mimeType", ""),
+                    f.get("modifiedTime"),
+                    int(f["size"]) if f.get("size") else None,
+                    f.get("webViewLink"),
+                )
+                for f in live
+            ],
+        )
+        conn.executemany(
+            "DELETE FROM parents WHERE scope = ? AND file_id = ?",
+            [(scope, f["id"]) for f in live],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO parents (scope, file_id, parent_id) VALUES (?, ?, ?)",
+            [(scope, f["id"], parent) for f in live for parent in f.get("parents", [])],
+        )
+
+    def _remove_files(self, conn: sqlite3.Connection, scope: str, file_ids: List[str]) -> None:
+        rows = [(scope, file_id) for file_id in file_ids]
+        conn.executemany("DELETE FROM files WHERE scope = ? AND id = ?", rows)
+        conn.executemany("DELETE FROM parents WHERE scope = ? AND file_id = ?", rows)
+
+    def _apply_page(
+        self, conn: sqlite3.Connection, scope: str, removed: List[str], updated: List[Dict[str, Any]]
+    ) -> None:
+        self._remove_files(conn, scope, removed)
+        self._upsert_files(conn, scope, updated)
+
+    def _clear_scope(self, conn: sqlite3.Connection, scope: str) -> None:
+        conn.execute("DELETE FROM files WHERE scope = ?", (scope,))
+        conn.execute("DELETE FROM parents WHERE scope = ?", (scope,))
+
+    def _commit_sync_state(
+        self, conn: sqlite3.Connection, scope: str, page_token: str, root_id: str, synced_at: float
+    ) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state (scope, page_token, root_id, synced_at) VALUES (?, ?, ?, ?)",
+            (scope, page_token, root_id, synced_at),
+        )
+        conn.commit()
+
+    async def _bootstrap(self, service, scope: str) -> None:
+        """Load a corpus with files.list and record where changes.list should resume."""
+        started = time.monotonic()
+        synced_at = time.time()
+        scope_params = self._scope_params(scope)
+        # Take the change token first so edits made during the bootstrap are replayed
+        token_params = {"supportsAllDrives": True}
+        if scope != USER_SCOPE:
+            token_params["driveId"] = scope
+        start_token = (
+            await execute_with_retry(
+                service.changes().getStartPageToken(**token_params), label="drive_mirror"
+            )
+        )["startPageToken"]
+
+        root_id = scope
+        if scope == USER_SCOPE:
+            root = await execute_with_retry(
+                service.files().get(fileId="root", fields="id"), label="drive_mirror"
+            )
+            root_id = root["id"]
+
+        list_params = {
+            "q": "trashed=false",
+            "pageSize": DRIVE_MIRROR_PAGE_SIZE,
+            "fields": f"nextPageToken, files({MIRROR_FILE_FIELDS})",
+            "includeItemsFromAllDrives": scope_params["includeItemsFromAllDrives"],
+            "supportsAllDrives": True,
+        }
+        if scope == USER_SCOPE:
+            list_params["corpora"] = "user"
+        else:
+            list_params["corpora"] = "drive"
+            list_params["driveId"] = scope
+
+        # One connection carries the whole bootstrap transaction. It is used by
+        # one worker thread at a time, so the event loop never blocks on sqlite
+        conn = await asyncio.to_thread(self._connect, False)
+        try:
+            await asyncio.to_thread(self._clear_scope, conn, scope)
+            page_token = None
+            total = 0
+            while True:
+                params = dict(list_params)
+                if page_token:
+                    params["pageToken"] = page_token
+                response = await execute_with_retry(
+                    service.files().list(**params), label="drive_mirror"
+                )
+                files = response.get("files", [])
+                await asyncio.to_thread(self._upsert_files, conn, scope, files)
+                total += len(files)
+                page_token = response.get("nextPageToken")
+                if not page_token:
+                    break
+            await asyncio.to_thread(self._commit_sync_state, conn, scope, start_token, root_id, synced_at)
+        finally:
+            await asyncio.to_thread(conn.close)
+        logger.info(
+            f"[drive_mirror] Bootstrapped scope '{scope}' for {self.user_google_email}: "
+            f"{total} files in {time.monotonic() - started:.1f}s"
+        )
+
+    async def _apply_changes(self, service, scope: str, page_token: str, root_id: str) -> None:
+        """Replay changes.list from the stored token and advance it."""
+        scope_params = self._scope_params(scope)
+        synced_at = time.time()
+        conn = await asyncio.to_thread(self._connect, False)
+        applied = 0
+        try:
+            while True:
+                response = await execute_with_retry(
+                    service.changes().list(
+                        pageToken=page_token,
+                        pageSize=DRIVE_MIRROR_PAGE_SIZE,
+                        fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({MIRROR_FILE_FIELDS}))",
+                        **scope_params,
+                    ),
+                    label="drive_mirror",
+                )
+                changes = response.get("changes", [])
+                # Shared drive changes (changeType "drive") carry no fileId
+                file_changes = [c for c in changes if c.get("fileId")]
+                removed = [c["fileId"] for c in file_changes if c.get("removed") or not c.get("file")]
+                updated = [c["file"] for c in file_changes if not c.get("removed") and c.get("file")]
+                await asyncio.to_thread(self._apply_page, conn, scope, removed, updated)
+                applied += len(changes)
+
+                if response.get("newStartPageToken"):
+                    page_token = response["newStartPageToken"]
+                    break
+                page_token = response["nextPageToken"]
+
+            await asyncio.to_thread(self._commit_sync_state, conn, scope, page_token, root_id, synced_at)
+        finally:
+            await asyncio.to_thread(conn.close)
+        if applied:
+            logger.info(f"[drive_mirror] Applied {applied} changes to scope '{scope}' for {self.user_google_email}")
+
+    async def sync(self, service, scope: str, force: bool = False) -> str:
+        """
+        Make sure a corpus is loaded and no older than DRIVE_MIRROR_REFRESH_SECONDS.
+
+        Returns:
+            The corpus root folder ID (My Drive root, or the shared drive ID)
+        """
+        async with self._sync_lock:
+            state = await asyncio.to_thread(self._get_sync_state, scope)
+            if state is None:
+                await self._bootstrap(service, scope)
+            elif (
+                force
+                or state["synced_at"] <= self._stale_at
+                or time.time() - state["synced_at"] >= DRIVE_MIRROR_REFRESH_SECONDS
+            ):
+                await self._apply_changes(service, scope, state["page_token"], state["root_id"])
+            state = await asyncio.to_thread(self._get_sync_state, scope)
+            return state["root_id"]
+
+    def mark_stale(self) -> None:
+        """Make the next lookup of every corpus replay changes.list before answering."""
+        self._stale_at = time.time()
+
+    # ---- queries ----------------------------------------------------------
+
+    def _has_file(self, scope: str, file_id: str) -> bool:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT 1 FROM files WHERE scope = ? AND id = ?", (scope, file_id)
+            ).fetchone() is not None
+
+    def _list_children(self, scope: str, folder_id: str, limit: int) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT f.* FROM parents p JOIN files f ON f.scope = p.scope AND f.id = p.file_id "
+                "WHERE p.scope = ? AND p.parent_id = ? "
+                "ORDER BY f.mime_type != 'application/vnd.google-apps.folder', f.name COLLATE NOCASE "
+                "LIMIT ?",
+                (scope, folder_id, limit),
+            ).fetchall()
+        return [_row_to_file(row) for row in rows]
+
+    def _search(
+        self,
+        scope: str,
+        name_contains: Optional[str],
+        mime_type: Optional[str],
+        modified_after: Optional[str],
+        folder_id: Optional[str],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        clauses = ["f.scope = ?"]
+        params: List[Any] = [scope]
+        if name_contains:
+            clauses.append("f.name LIKE ? ESCAPE '\\'")
+            params.append("%" + re.sub(r"([%_\\])", r"\\\1", name_contains) + "%")
+        if mime_type:
+            clauses.append("f.mime_type = ?")
+            params.append(mime_type)
+        if modified_after:
+            clauses.append("f.modified_time > ?")
+            params.append(modified_after)
+        if folder_id:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM parents p WHERE p.scope = f.scope AND p.file_id = f.id AND p.parent_id = ?)"
+            )
+            params.append(folder_id)
+        params.append(limit)
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                f"SELECT f.* FROM files f WHERE {' AND '.join(clauses)} "
+                "ORDER BY f.modified_time DESC LIMIT ?",
+                params,
+            ).fetchall()
+        return [_row_to_file(row) for row in rows]
+
+    async def list_children(
+        self, service, folder_id: str, limit: int, scope: str = USER_SCOPE
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        List a folder's children from the mirror.
+
+        Returns:
+            The children, or None if the folder is not part of this corpus
+        """
+        root_id = await self.sync(service, scope)
+        if folder_id == "root" or folder_id == root_id:
+            folder_id = root_id
+        elif not await asyncio.to_thread(self._has_file, scope, folder_id):
+            return None
+        return await asyncio.to_thread(self._list_children, scope, folder_id, limit)
+
+    async def search(
+        self,
+        service,
+        limit: int,
+        name_contains: Optional[str] = None,
+        mime_type: Optional[str] = None,
+        modified_after: Optional[str] = None,
+        folder_id: Optional[str] = None,
+        scope: str = USER_SCOPE,
+    ) -> List[Dict[str, Any]]:
+        """Filter the mirror by name substring, MIME type, modification time and parent folder, newest first."""
+        root_id = await self.sync(service, scope)
+        if folder_id == "root":
+            folder_id = root_id
+        return await asyncio.to_thread(
+            self._search, scope, name_contains, mime_type, modified_after, folder_id, limit
+        )
+
+
+_mirrors: Dict[str, DriveMirror] = {}
+
+
+def get_drive_mirror(user_google_email: str) -> Optional[DriveMirror]:
+    """Get the user's Drive mirror, or None if the mirror is disabled."""
+    if not is_drive_mirror_enabled():
+        return None
+    mirror = _mirrors.get(user_google_email)
+    if mirror is None:
+        safe_name = re.sub(r"[^A-Za-z0-9_.@-]", "_", user_google_email)
+        db_path = os.path.join(get_default_state_dir(), "drive_mirror", f"{safe_name}.sqlite")
+        mirror = DriveMirror(user_google_email, db_path)
+        _mirrors[user_google_email] = mirror
+    return mirror
+
+
+def mark_drive_mirror_stale(user_google_email: str) -> None:
+    """Record that this server changed the user's Drive, so mirror lookups refresh first."""
+    mirror = _mirrors.get(user_google_email)
+    if mirror is not None:
+        mirror.mark_stale()
@@ -5,16 +5,34 @@ This module provides MCP tools for interacting with Google Drive API.
 """
 import logging
 import asyncio
-from typing import Optional
+from typing import Dict, List, Optional
 
 from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
 import io
-import httpx
 
 from auth.service_decorator import require_google_service
-from core.utils import extract_office_xml_text, handle_http_errors
+from core.utils import extract_office_xml_text_async, handle_http_errors
 from core.server import server
-from gdrive.drive_helpers import DRIVE_QUERY_PATTERNS, build_drive_list_params
+from core.job_checkpoint import JobCheckpoint, compute_job_fingerprint
+from core.content_cache import CONTENT_VERSION_FIELDS, content_version_tag, get_content_cache
+from gdrive.drive_audit import audit_file_permissions, format_permission_audit
+from gdrive.drive_bulk import BULK_MAX_REPORTED_ITEMS, run_bulk_operations, validate_operations
+from gdrive.drive_export import EXPORT_CONCURRENCY, export_files
+from gdrive.drive_mirror import get_drive_mirror, mark_drive_mirror_stale, mirror_scope
+from gdrive.drive_tree import format_drive_tree, walk_drive_tree
+from gdrive.drive_upload import DriveUploadError, stream_url_to_drive
+from gdrive.drive_helpers import (
+    DRIVE_CONTENT_DEFAULT_MAX_BYTES,
+    DRIVE_CONTENT_MAX_BYTES_LIMIT,
+    DRIVE_OFFICE_MAX_BYTES,
+    DRIVE_QUERY_PATTERNS,
+    DriveFileLister,
+    build_drive_list_params,
+    classify_mime_type,
+    format_page_token_hint,
+    slice_utf8_window,
+    stream_utf8_window,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,9 +47,11 @@ async def search_drive_files(
     drive_id: Optional[str] = None,
     include_items_from_all_drives: bool = True,
     corpora: Optional[str] = None,
+    page_token: Optional[str] = None,
 ) -> str:
     """
     Searches for files and folders within a user's Google Drive, including shared drives.
+    Results are fetched across as many API pages as needed to return up to `page_size` files.
 
     Args:
         user_google_email (str): The user's Google email address. Required.
@@ -42,9 +62,10 @@ async def search_drive_files(
         corpora (Optional[str]): Bodies of items to query (e.g., 'user', 'domain', 'drive', 'allDrives').
                                  If 'drive_id' is specified and 'corpora' is None, it defaults to 'drive'.
                                  Otherwise, Drive API default behavior applies. Prefer 'user' or 'drive' over 'allDrives' for efficiency.
+        page_token (Optional[str]): Token from a previous call to continue the listing where it stopped.
 
     Returns:
-        str: A formatted list of found files/folders with their details (ID, name, type, size, modified time, link).
+        str: A formatted list of found files/folders with their details (ID, name, type, size, modified time, link), plus a page token if more results exist.
     """
     logger.info(f"[search_drive_files] Invoked. Email: '{user_google_email}', Query: '{query}'")
 
@@ -67,12 +88,11 @@ async def search_drive_files(
         drive_id=drive_id,
         include_items_from_all_drives=include_items_from_all_drives,
         corpora=corpora,
+        page_token=page_token,
     )
 
-    results = await asyncio.to_thread(
-        service.files().list(**list_params).execute
-    )
-    files = results.get('files', [])
+    lister = DriveFileLister(service, list_params, max_results=page_size)
+    files = await lister.collect()
     if not files:
         return f"No files found for '{query}'."
 
@@ -83,7 +103,7 @@ async def search_drive_files(
             f"- Name: \"{item['name']}\" (ID: {item['id']}, Type: {item['mimeType']}{size_str}, Modified: {item.get('modifiedTime', 'N/A')}) Link: {item.get('webViewLink', '#')}"
         )
     text_output = "\n".join(formatted_files_text_parts)
-    return text_output
+    return text_output + format_page_token_hint(lister.next_page_token)
 
 @server.tool()
 @handle_http_errors("get_drive_file_content", is_read_only=True, service_type="drive")
@@ -92,6 +112,8 @@ async def get_drive_file_content(
     service,
     user_google_email: str,
     file_id: str,
+    offset: int = 0,
+    max_bytes: int = DRIVE_CONTENT_DEFAULT_MAX_BYTES,
 ) -> str:
     """
     Retrieves the content of a specific Google Drive file by ID, supporting files in shared drives.
@@ -99,44 +121,42 @@ async def get_drive_file_content(
     • Native Google Docs, Sheets, Slides → exported as text / CSV.
     • Office files (.docx, .xlsx, .pptx) → unzipped & parsed with std-lib to
       extract readable text.
-    • Any other file → downloaded; tries UTF-8 decode, else notes binary.
+    • Any other file → only the requested byte window is downloaded (HTTP Range)
+      and decoded as UTF-8; binary files (by type or content) are not downloaded.
+
+    Large text is returned in windows of at most `max_bytes` bytes. When more
+    content remains, the response ends with the `offset` to pass on the next call.
 
     Args:
         user_google_email: The user’s Google email address.
         file_id: Drive file ID.
+        offset: Byte offset into the text content to start from. Defaults to 0.
+        max_bytes: Maximum number of bytes of text to return. Defaults to 1 MiB (max 10 MiB).
 
     Returns:
         str: The file content as plain text with metadata header.
     """
-    logger.info(f"[get_drive_file_content] Invoked. File ID: '{file_id}'")
+    logger.info(f"[get_drive_file_content] Invoked. File ID: '{file_id}', Offset: {offset}, Max bytes: {max_bytes}")
+
+    offset = max(0, offset)
+    max_bytes = max(1, min(max_bytes, DRIVE_CONTENT_MAX_BYTES_LIMIT))
 
     file_metadata = await asyncio.to_thread(
         service.files().get(
-            fileId=file_id, fields="id, name, mimeType, webViewLink", supportsAllDrives=True
+            fileId=file_id,
+            fields=f"id, name, mimeType, webViewLink, size, {CONTENT_VERSION_FIELDS}",
+            supportsAllDrives=True,
         ).execute
     )
     mime_type = file_metadata.get("mimeType", "")
     file_name = file_metadata.get("name", "Unknown File")
+    file_size = int(file_metadata["size"]) if file_metadata.get("size") else None
     export_mime_type = {
         "application/vnd.google-apps.document": "text/plain",
         "application/vnd.google-apps.spreadsheet": "text/csv",
         "application/vnd.google-apps.presentation": "text/plain",
     }.get(mime_type)
 
-    request_obj = (
-        service.files().export_media(fileId=file_id, mimeType=export_mime_type)
-        if export_mime_type
-        else service.files().get_media(fileId=file_id)
-    )
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request_obj)
-    loop = asyncio.get_event_loop()
-    done = False
-    while not done:
-        status, done = await loop.run_in_executor(None, downloader.next_chunk)
-
-    file_content_bytes = fh.getvalue()
-
     # Attempt Office XML extraction only for actual Office XML files
     office_mime_types = {
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -144,35 +164,94 @@ async def get_drive_file_content(
         "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     }
 
-    if mime_type in office_mime_types:
-        office_text = extract_office_xml_text(file_content_bytes, mime_type)
-        if office_text:
-            body_text = office_text
+    binary_note = (
+        f"[Binary or unsupported text encoding for mimeType '{mime_type}' - "
+        f"{file_size if file_size is not None else 'unknown'} bytes]"
+    )
+    body_text: Optional[str] = None
+    next_offset: Optional[int] = None
+    content_size: Optional[int] = None
+
+    content_cache = get_content_cache()
+    version_tag = content_version_tag(file_metadata)
+
+    if export_mime_type or mime_type in office_mime_types:
+        # Exports and Office archives are only usable whole; window the extracted text
+        if mime_type in office_mime_types and file_size is not None and file_size > DRIVE_OFFICE_MAX_BYTES:
+            body_text = (
+                f"[Office file too large to extract text - {file_size} bytes "
+                f"(limit {DRIVE_OFFICE_MAX_BYTES} bytes)]"
+            )
         else:
-            # Fallback: try UTF-8; otherwise flag binary
-            try:
-                body_text = file_content_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                body_text = (
-                    f"[Binary or unsupported text encoding for mimeType '{mime_type}' - "
-                    f"{len(file_content_bytes)} bytes]"
+            cached = await content_cache.get(file_id, version_tag, "drive_text")
+            if cached is not None:
+                logger.info(f"[get_drive_file_content] Serving cached content for {file_id} ({version_tag})")
+                file_content_bytes = cached["text"].encode("utf-8") if cached.get("text") is not None else None
+            else:
+                request_obj = (
+                    service.files().export_media(fileId=file_id, mimeType=export_mime_type)
+                    if export_mime_type
+                    else service.files().get_media(fileId=file_id)
                 )
+                fh = io.BytesIO()
+                downloader = MediaIoBaseDownload(fh, request_obj)
+                loop = asyncio.get_event_loop()
+                done = False
+                while not done:
+                    status, done = await loop.run_in_executor(None, downloader.next_chunk)
+
+                file_content_bytes = fh.getvalue()
+                if mime_type in office_mime_types:
+                    office_text = await extract_office_xml_text_async(file_content_bytes, mime_type)
+                    if office_text:
+                        file_content_bytes = office_text.encode("utf-8")
+
+                try:
+                    content_cache.put(file_id, version_tag, "drive_text", {"text": file_content_bytes.decode("utf-8")})
+                except UnicodeDecodeError:
+                    content_cache.put(file_id, version_tag, "drive_text", {"text": None})
+                    file_content_bytes = None
+
+            if file_content_bytes is None:
+                body_text = binary_note
+            else:
+                body_text, next_offset = slice_utf8_window(file_content_bytes, offset, max_bytes)
+                content_size = len(file_content_bytes)
+    elif classify_mime_type(mime_type) == "binary":
+        # Decided from metadata alone - nothing is downloaded
+        body_text = binary_note
+    elif file_size is not None and offset >= file_size:
+        body_text = f"[Offset {offset} is past the end of the file ({file_size} bytes)]"
     else:
-        # For non-Office files (including Google native files), try UTF-8 decode directly
-        try:
-            body_text = file_content_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            body_text = (
-                f"[Binary or unsupported text encoding for mimeType '{mime_type}' - "
-                f"{len(file_content_bytes)} bytes]"
+        window_variant = f"drive_window:{offset}:{max_bytes}"
+        cached = await content_cache.get(file_id, version_tag, window_variant)
+        if cached is not None:
+            logger.info(f"[get_drive_file_content] Serving cached window for {file_id} ({version_tag})")
+            body_text, next_offset = cached["text"], cached.get("next_offset")
+        else:
+            body_text, next_offset = await stream_utf8_window(
+                service, file_id, offset, max_bytes, file_size
             )
+            content_cache.put(
+                file_id, version_tag, window_variant, {"text": body_text, "next_offset": next_offset}
+            )
+        if body_text is None:
+            body_text = binary_note
+        content_size = file_size
 
     # Assemble response
     header = (
         f'File: "{file_name}" (ID: {file_id}, Type: {mime_type})\n'
         f'Link: {file_metadata.get("webViewLink", "#")}\n\n--- CONTENT ---\n'
     )
-    return header + body_text
+    footer = ""
+    if next_offset is not None:
+        total = f" of {content_size}" if content_size is not None else ""
+        footer = (
+            f"\n\n--- TRUNCATED: returned bytes {offset}-{next_offset}{total}. "
+            f"Call again with offset={next_offset} to continue. ---"
+        )
+    return header + body_text + footer
 
 
 @server.tool()
@@ -186,6 +265,7 @@ async def list_drive_items(
     drive_id: Optional[str] = None,
     include_items_from_all_drives: bool = True,
     corpora: Optional[str] = None,
+    page_token: Optional[str] = None,
 ) -> str:
     """
     Lists files and folders, supporting shared drives.
@@ -199,26 +279,40 @@ async def list_drive_items(
         drive_id (Optional[str]): ID of the shared drive. If provided, the listing is scoped to this drive.
         include_items_from_all_drives (bool): Whether items from all accessible shared drives should be included if `drive_id` is not set. Defaults to True.
         corpora (Optional[str]): Corpus to query ('user', 'drive', 'allDrives'). If `drive_id` is set and `corpora` is None, 'drive' is used. If None and no `drive_id`, API defaults apply.
+        page_token (Optional[str]): Token from a previous call to continue the listing where it stopped.
 
     Returns:
-        str: A formatted list of files/folders in the specified folder.
+        str: A formatted list of files/folders in the specified folder, plus a page token if more items exist.
     """
     logger.info(f"[list_drive_items] Invoked. Email: '{user_google_email}', Folder ID: '{folder_id}'")
 
-    final_query = f"'{folder_id}' in parents and trashed=false"
-
-    list_params = build_drive_list_params(
-        query=final_query,
-        page_size=page_size,
-        drive_id=drive_id,
-        include_items_from_all_drives=include_items_from_all_drives,
-        corpora=corpora,
-    )
+    files = None
+    next_page_token = None
+    more_in_mirror = False
+    mirror = get_drive_mirror(user_google_email)
+    scope = mirror_scope(drive_id, corpora)
+    if mirror is not None and scope is not None and not page_token:
+        files = await mirror.list_children(service, folder_id, page_size + 1, scope=scope)
+        if files is not None:
+            logger.info(f"[list_drive_items] Served folder '{folder_id}' from local Drive mirror")
+            more_in_mirror = len(files) > page_size
+            files = files[:page_size]
+
+    if files is None:
+        final_query = f"'{folder_id}' in parents and trashed=false"
+
+        list_params = build_drive_list_params(
+            query=final_query,
+            page_size=page_size,
+            drive_id=drive_id,
+            include_items_from_all_drives=include_items_from_all_drives,
+            corpora=corpora,
+            page_token=page_token,
+        )
 
-    results = await asyncio.to_thread(
-        service.files().list(**list_params).execute
-    )
-    files = results.get('files', [])
+        lister = DriveFileLister(service, list_params, max_results=page_size)
+        files = await lister.collect()
+        next_page_token = lister.next_page_token
     if not files:
         return f"No items found in folder '{folder_id}'."
 
@@ -228,8 +322,147 @@ async def list_drive_items(
         formatted_items_text_parts.append(
             f"- Name: \"{item['name']}\" (ID: {item['id']}, Type: {item['mimeType']}{size_str}, Modified: {item.get('modifiedTime', 'N/A')}) Link: {item.get('webViewLink', '#')}"
         )
+    if more_in_mirror:
+        formatted_items_text_parts.append(f"\n(More items exist; increase page_size above {page_size} to see them.)")
     text_output = "\n".join(formatted_items_text_parts)
-    return text_output
+    return text_output + format_page_token_hint(next_page_token)
+
+@server.tool()
+@handle_http_errors("find_drive_files", is_read_only=True, service_type="drive")
+@require_google_service("drive", "drive_read")
+async def find_drive_files(
+    service,
+    user_google_email: str,
+    name_contains: Optional[str] = None,
+    mime_type: Optional[str] = None,
+    modified_after: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    drive_id: Optional[str] = None,
+    max_results: int = 50,
+) -> str:
+    """
+    Finds files by name, type, modification time and/or parent folder, most recently modified first.
+    Served from the local Drive metadata mirror when it is enabled (DRIVE_MIRROR_ENABLED), otherwise via the Drive API.
+    With no filters, returns the most recently modified files.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        name_contains (Optional[str]): Substring the file name must contain (case-insensitive).
+        mime_type (Optional[str]): Exact MIME type, e.g. 'application/vnd.google-apps.folder'.
+        modified_after (Optional[str]): RFC 3339 timestamp, e.g. '2024-06-01T00:00:00Z'.
+        folder_id (Optional[str]): Only return direct children of this folder ('root' for My Drive).
+        drive_id (Optional[str]): Shared drive to search instead of the user's own files.
+        max_results (int): Maximum number of files to return. Defaults to 50.
+
+    Returns:
+        str: A formatted list of matching files.
+    """
+    logger.info(
+        f"[find_drive_files] Invoked. Email: '{user_google_email}', Name: '{name_contains}', "
+        f"MimeType: '{mime_type}', Modified after: '{modified_after}', Folder: '{folder_id}'"
+    )
+
+    mirror = get_drive_mirror(user_google_email)
+    if mirror is not None:
+        files = await mirror.search(
+            service,
+            max_results,
+            name_contains=name_contains,
+            mime_type=mime_type,
+            modified_after=modified_after,
+            folder_id=folder_id,
+            scope=mirror_scope(drive_id),
+        )
+        source = "local Drive mirror"
+    else:
+        conditions = ["trashed=false"]
+        if name_contains:
+            escaped_name = name_contains.replace("'", "\\'")
+            conditions.append(f"name contains '{escaped_name}'")
+        if mime_type:
+            conditions.append(f"mimeType='{mime_type}'")
+        if modified_after:
+            conditions.append(f"modifiedTime > '{modified_after}'")
+        if folder_id:
+            conditions.append(f"'{folder_id}' in parents")
+        list_params = build_drive_list_params(
+            query=" and ".join(conditions),
+            page_size=max_results,
+            drive_id=drive_id,
+            include_items_from_all_drives=bool(drive_id),
+            corpora=None if drive_id else "user",
+            order_by="modifiedTime desc",
+        )
+        files = await DriveFileLister(service, list_params, max_results=max_results).collect()
+        source = "Drive API"
+
+    if not files:
+        return "No files found matching the given filters."
+
+    output = [f"Found {len(files)} files for {user_google_email} (via {source}), most recently modified first:"]
+    for item in files:
+        size_str = f", Size: {item.get('size', 'N/A')}" if 'size' in item else ""
+        output.append(
+            f"- Name: \"{item['name']}\" (ID: {item['id']}, Type: {item['mimeType']}{size_str}, Modified: {item.get('modifiedTime', 'N/A')}) Link: {item.get('webViewLink', '#')}"
+        )
+    return "\n".join(output)
+
+@server.tool()
+@handle_http_errors("walk_drive_folder_tree", is_read_only=True, service_type="drive")
+@require_google_service("drive", "drive_read")
+async def walk_drive_folder_tree(
+    service,
+    user_google_email: str,
+    folder_id: str = 'root',
+    max_depth: int = 5,
+    max_items: int = 2000,
+    drive_id: Optional[str] = None,
+) -> str:
+    """
+    Lists an entire folder hierarchy in one call as a compact indented tree.
+    Folders are walked breadth-first; each level's folders are listed together
+    through batched requests. Progress is reported as each level completes.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        folder_id (str): The folder to start from. Defaults to 'root' (My Drive).
+        max_depth (int): Number of levels below the folder to list. Defaults to 5.
+        max_items (int): Maximum number of items to return. Defaults to 2000.
+        drive_id (Optional[str]): ID of the shared drive containing the folder, if any.
+
+    Returns:
+        str: Summary line followed by the folder tree.
+    """
+    logger.info(
+        f"[walk_drive_folder_tree] Invoked. Email: '{user_google_email}', Folder ID: '{folder_id}', "
+        f"Max depth: {max_depth}, Max items: {max_items}"
+    )
+
+    walk = await walk_drive_tree(
+        service,
+        folder_id,
+        max_depth=max(1, max_depth),
+        max_items=max(1, max_items),
+        drive_id=drive_id,
+    )
+
+    folder_count = walk.folder_count
+    summary = (
+        f"Folder tree for {user_google_email}: {folder_count} folders, "
+        f"{len(walk.entries) - folder_count} files, {walk.max_depth_reached} levels deep."
+    )
+    lines = [summary, "", format_drive_tree(walk)]
+    if walk.truncated:
+        lines.append(f"\n(Stopped at max_items={max_items}; increase it or walk a subfolder to see more.)")
+    if walk.unexpanded_folders:
+        lines.append(
+            f"\n({walk.unexpanded_folders} folders at depth {max_depth} were not expanded; increase max_depth to see their contents.)"
+        )
+    if walk.errors:
+        lines.append("\nErrors:")
+        lines.extend(f"  - {error}" for error in walk.errors)
+    return "\n".join(lines)
+
 
 @server.tool()
 @handle_http_errors("create_drive_file", service_type="drive")
@@ -253,7 +486,8 @@ async def create_drive_file(
         content (Optional[str]): If provided, the content to write to the file.
         folder_id (str): The ID of the parent folder. Defaults to 'root'. For shared drives, this must be a folder ID within the shared drive.
         mime_type (str): The MIME type of the file. Defaults to 'text/plain'.
-        fileUrl (Optional[str]): If provided, fetches the file content from this URL.
+        fileUrl (Optional[str]): If provided, fetches the file content from this URL. The content is streamed
+            into Drive chunk by chunk, so large files are supported (up to DRIVE_UPLOAD_MAX_BYTES, default 2 GiB).
 
     Returns:
         str: Confirmation message of the successful file creation with file link.
@@ -263,38 +497,31 @@ async def create_drive_file(
     if not content and not fileUrl:
         raise Exception("You must provide either 'content' or 'fileUrl'.")
 
-    file_data = None
-    # Prefer fileUrl if both are provided
-    if fileUrl:
-        logger.info(f"[create_drive_file] Fetching file from URL: {fileUrl}")
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(fileUrl)
-            if resp.status_code != 200:
-                raise Exception(f"Failed to fetch file from URL: {fileUrl} (status {resp.status_code})")
-            file_data = await resp.aread()
-            # Try to get MIME type from Content-Type header
-            content_type = resp.headers.get("Content-Type")
-            if content_type and content_type != "application/octet-stream":
-                mime_type = content_type
-                logger.info(f"[create_drive_file] Using MIME type from Content-Type header: {mime_type}")
-    elif content:
-        file_data = content.encode('utf-8')
-
     file_metadata = {
         'name': file_name,
         'parents': [folder_id],
         'mimeType': mime_type
     }
-    media = io.BytesIO(file_data)
 
-    created_file = await asyncio.to_thread(
-        service.files().create(
-            body=file_metadata,
-            media_body=MediaIoBaseUpload(media, mimetype=mime_type, resumable=True),
-            fields='id, name, webViewLink',
-            supportsAllDrives=True
-        ).execute
-    )
+    # Prefer fileUrl if both are provided
+    if fileUrl:
+        logger.info(f"[create_drive_file] Streaming file from URL into Drive: {fileUrl}")
+        try:
+            created_file = await stream_url_to_drive(service, fileUrl, file_metadata, mime_type)
+        except DriveUploadError as e:
+            raise Exception(str(e))
+    else:
+        media = io.BytesIO(content.encode('utf-8'))
+
+        created_file = await asyncio.to_thread(
+            service.files().create(
+                body=file_metadata,
+                media_body=MediaIoBaseUpload(media, mimetype=mime_type, resumable=True),
+                fields='id, name, webViewLink',
+                supportsAllDrives=True
+            ).execute
+        )
+    mark_drive_mirror_stale(user_google_email)
 
     link = created_file.get('webViewLink', 'No link available')
     confirmation_message = f"Successfully created file '{created_file.get('name', file_name)}' (ID: {created_file.get('id', 'N/A')}) in folder '{folder_id}' for {user_google_email}. Link: {link}"
@@ -493,4 +720,214 @@ async def check_drive_file_public_access(
             "Fix: Drive → Share → 'Anyone with the link' → 'Viewer'"
         ])
     
-    return "\n".join(output_parts)
\ No newline at end of file
+    return "\n".join(output_parts)
+
+@server.tool()
+@handle_http_errors("audit_drive_permissions", is_read_only=True, service_type="drive")
+@require_google_service("drive", "drive_read")
+async def audit_drive_permissions(
+    service,
+    user_google_email: str,
+    folder_id: Optional[str] = None,
+    file_ids: Optional[List[str]] = None,
+    internal_domain: Optional[str] = None,
+    max_depth: int = 10,
+    max_files: int = 5000,
+    drive_id: Optional[str] = None,
+) -> str:
+    """
+    Audits sharing across many files at once: everything under a folder (recursively) or a list of file IDs.
+    Reports files that are public on the web, shared with anyone with the link, shared with other domains,
+    shared with external users/groups, or shared with the whole internal domain. Progress is reported as
+    batches complete.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        folder_id (Optional[str]): Folder to audit, including the folder itself and all subfolders.
+        file_ids (Optional[List[str]]): Specific file IDs to audit. Can be combined with folder_id.
+        internal_domain (Optional[str]): Domain treated as internal. Defaults to the domain of user_google_email.
+        max_depth (int): Folder levels to descend when auditing a folder. Defaults to 10.
+        max_files (int): Maximum number of files to audit. Defaults to 5000.
+        drive_id (Optional[str]): ID of the shared drive containing the folder, if any.
+
+    Returns:
+        str: Aggregated report of risky shares grouped by category.
+    """
+    logger.info(
+        f"[audit_drive_permissions] Invoked. Email: '{user_google_email}', Folder ID: '{folder_id}', "
+        f"File IDs: {len(file_ids or [])}"
+    )
+
+    if not folder_id and not file_ids:
+        raise Exception("You must provide either 'folder_id' or 'file_ids'.")
+
+    targets = [{"id": file_id} for file_id in (file_ids or [])]
+    notes = []
+    if folder_id:
+        walk = await walk_drive_tree(
+            service,
+            folder_id,
+            max_depth=max(1, max_depth),
+            max_items=max(1, max_files),
+            drive_id=drive_id,
+            file_fields="id, name, mimeType",
+        )
+        targets.append(walk.root)
+        targets.extend(entry["file"] for entry in walk.entries)
+        if walk.truncated:
+            notes.append(f"Folder listing stopped at max_files={max_files}; not every file was audited.")
+        if walk.unexpanded_folders:
+            notes.append(f"{walk.unexpanded_folders} folders below max_depth={max_depth} were not audited.")
+        notes.extend(walk.errors)
+
+    # De-duplicate while keeping order
+    unique_targets = {}
+    for target in targets:
+        unique_targets.setdefault(target["id"], target)
+    targets = list(unique_targets.values())[:max_files]
+
+    domain = internal_domain or user_google_email.rsplit("@", 1)[-1]
+    audit = await audit_file_permissions(service, targets, domain)
+
+    report = format_permission_audit(audit)
+    if notes:
+        report += "\n\nNotes:\n" + "\n".join(f"  - {note}" for note in notes)
+    return report
+
+
+@server.tool()
+@handle_http_errors("bulk_drive_operations", service_type="drive")
+@require_google_service("drive", "drive_file")
+async def bulk_drive_operations(
+    service,
+    user_google_email: str,
+    operations: List[Dict[str, str]],
+    dry_run: bool = False,
+    job_id: Optional[str] = None,
+) -> str:
+    """
+    Moves, copies, renames, trashes or restores many Drive files in one call, including files in shared drives.
+    Operations are sent in batched requests; each item succeeds or fails independently. Progress is saved so an
+    interrupted run resumes when called again with the same operations (or the same job_id).
+
+    Each operation is an object with:
+        action: "move", "copy", "rename", "trash" or "untrash"
+        file_id: The file to operate on
+        target_folder_id: Destination folder (required for move, optional for copy)
+        name: New name (required for rename, optional for copy)
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        operations (List[Dict[str, str]]): The operations to perform.
+        dry_run (bool): If True, only report what would change. Defaults to False.
+        job_id (Optional[str]): Identifier for resuming. Defaults to a fingerprint of the operations.
+
+    Returns:
+        str: Summary of succeeded and failed operations (or the plan for a dry run).
+    """
+    logger.info(
+        f"[bulk_drive_operations] Invoked. Email: '{user_google_email}', Operations: {len(operations)}, Dry run: {dry_run}"
+    )
+
+    if not operations:
+        raise Exception("No operations provided.")
+    validation_errors = validate_operations(operations)
+    if validation_errors:
+        shown = "\n".join(f"  - {error}" for error in validation_errors[:BULK_MAX_REPORTED_ITEMS])
+        raise Exception(f"Invalid operations ({len(validation_errors)}):\n{shown}")
+
+    checkpoint = None
+    if not dry_run:
+        fingerprint = compute_job_fingerprint(operations)
+        job_id = job_id or fingerprint[:16]
+        checkpoint = JobCheckpoint("drive_bulk_operations", job_id, user_google_email, fingerprint)
+
+    try:
+        result = await run_bulk_operations(service, operations, checkpoint=checkpoint, dry_run=dry_run)
+    except ValueError as e:
+        # Checkpoint belongs to a job with different operations
+        raise Exception(str(e))
+    if not dry_run:
+        mark_drive_mirror_stale(user_google_email)
+
+    if dry_run:
+        lines = [f"Dry run: {len(result.planned)} of {result.total} operations would be applied, {len(result.failed)} would fail."]
+        lines.extend(f"  - #{key}: {description}" for key, description in result.planned[:BULK_MAX_REPORTED_ITEMS])
+        if len(result.planned) > BULK_MAX_REPORTED_ITEMS:
+            lines.append(f"  ... and {len(result.planned) - BULK_MAX_REPORTED_ITEMS} more")
+    else:
+        lines = [
+            f"Bulk job '{job_id}' for {user_google_email}: {len(result.succeeded)} succeeded, {len(result.failed)} failed"
+            + (f", {len(result.unknown)} with unknown outcome" if result.unknown else "")
+            + (f", {result.previously_completed} already completed in a previous run" if result.previously_completed else "")
+            + f" (of {result.total} operations)."
+        ]
+        if checkpoint.path:
+            lines.append(f"Per-item results: {checkpoint.path}")
+
+    if result.failed:
+        lines.append("")
+        lines.append("Failures:")
+        lines.extend(f"  - #{key} {message}" for key, message in result.failed[:BULK_MAX_REPORTED_ITEMS])
+        if len(result.failed) > BULK_MAX_REPORTED_ITEMS:
+            lines.append(f"  ... and {len(result.failed) - BULK_MAX_REPORTED_ITEMS} more")
+        if not dry_run:
+            lines.append("Re-run with the same operations to retry failed items.")
+    if result.unknown:
+        lines.append("")
+        lines.append("Unknown outcome (server or network error; the copy may have been made):")
+        lines.extend(f"  - #{key} {message}" for key, message in result.unknown[:BULK_MAX_REPORTED_ITEMS])
+        if len(result.unknown) > BULK_MAX_REPORTED_ITEMS:
+            lines.append(f"  ... and {len(result.unknown) - BULK_MAX_REPORTED_ITEMS} more")
+        lines.append("These are not retried on re-run. Check the target folders before copying them again.")
+    return "\n".join(lines)
+
+
+@server.tool()
+@handle_http_errors("export_drive_files", service_type="drive")
+@require_google_service("drive", "drive_file")
+async def export_drive_files(
+    service,
+    user_google_email: str,
+    file_ids: List[str],
+    formats: List[str],
+    folder_id: Optional[str] = None,
+    destination: str = "drive",
+    max_concurrency: int = EXPORT_CONCURRENCY,
+) -> str:
+    """
+    Exports Google Docs, Sheets and Slides to other formats, several files and formats at once.
+    Each export is streamed straight into a new Drive file (or a local file) without being held in memory.
+    Supported formats: Docs pdf/docx/odt/txt/md/epub, Sheets pdf/xlsx/ods/csv/tsv (first sheet only for
+    csv/tsv), Slides pdf/pptx/odp/txt. Drive limits each export to about 10 MB.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        file_ids (List[str]): IDs of the Google Docs, Sheets or Slides files to export.
+        formats (List[str]): Formats to export every file to, e.g. ["pdf", "docx"].
+        folder_id (Optional[str]): Drive folder for the exported files. Defaults to each source file's folder.
+        destination (str): "drive" to save exports to Drive, "local" to save them on the server. Defaults to "drive".
+        max_concurrency (int): Maximum number of exports running at once. Defaults to 4.
+
+    Returns:
+        str: One line per exported file and format, with links or errors.
+    """
+    logger.info(
+        f"[export_drive_files] Invoked. Email: '{user_google_email}', Files: {len(file_ids)}, Formats: {formats}, Destination: {destination}"
+    )
+
+    if not file_ids or not formats:
+        raise Exception("Provide at least one file ID and one format.")
+    formats = list(dict.fromkeys(f.lower().lstrip(".") for f in formats))
+
+    try:
+        results = await export_files(service, file_ids, formats, destination, folder_id, max(1, max_concurrency))
+    except ValueError as e:
+        raise Exception(str(e))
+    if destination == "drive":
+        mark_drive_mirror_stale(user_google_email)
+
+    failed = sum(1 for result in results if result.error)
+    lines = [f"Exported {len(results) - failed} of {len(results)} file/format pairs for {user_google_email}:"]
+    lines.extend(f"  - {result.describe()}" for result in results)
+    return "\n".join(lines)
@@ -0,0 +1,198 @@
+"""
+Drive Folder Tree Walker
+
+Breadth-first traversal of a Drive folder hierarchy. Each level's folder
+listings are fetched together through batch HTTP requests, with several
+batches in flight at once, so walking a tree costs one round of requests per
+level rather than one request per folder.
+
+Used by walk_drive_folder_tree and by tools that operate on whole folder trees.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.batching import (
+    chunked,
+    execute_batch_with_retry,
+    execute_with_retry,
+    new_authorized_http,
+    report_progress,
+    run_bounded,
+)
+from gdrive.drive_helpers import DRIVE_LIST_MAX_PAGE_SIZE, build_drive_list_params
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+DRIVE_TREE_FILE_FIELDS = "id, name, mimeType, size, modifiedTime"
+DRIVE_TREE_BATCH_SIZE = 50  # Drive allows up to 100 calls per batch request
+DRIVE_TREE_CONCURRENCY = 4
+
+
+class DriveTreeWalk:
+    """
+    Result of a folder tree walk.
+
+    `entries` lists every item found in breadth-first order as dicts with the
+    file metadata ("file"), its depth below the root ("depth", children of the
+    root are depth 1) and the folder it was listed in ("parent_id").
+    """
+
+    def __init__(self, root: Dict[str, Any]):
+        self.root = root
+        self.entries: List[Dict[str, Any]] = []
+        self.truncated = False
+        self.unexpanded_folders = 0
+        self.errors: List[str] = []
+
+    @property
+    def folder_count(self) -> int:
+        return sum(1 for entry in self.entries if entry["file"].get("mimeType") == FOLDER_MIME_TYPE)
+
+    @property
+    def max_depth_reached(self) -> int:
+        return max((entry["depth"] for entry in self.entries), default=0)
+
+    def children_by_parent(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Group entries by the folder they were listed in, preserving order."""
+        children: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in self.entries:
+            children.setdefault(entry["parent_id"], []).append(entry)
+        return children
+
+
+async def walk_drive_tree(
+    service,
+    root_folder_id: str,
+    max_depth: int = 5,
+    max_items: int = 2000,
+    drive_id: Optional[str] = None,
+    file_fields: str = DRIVE_TREE_FILE_FIELDS,
+    max_concurrency: int = DRIVE_TREE_CONCURRENCY,
+) -> DriveTreeWalk:
+    """
+    Walk a folder tree breadth-first.
+
+    Args:
+        service: Authenticated Drive API service
+        root_folder_id: Folder to start from ('root' for My Drive)
+        max_depth: Number of levels below the root to list
+        max_items: Stop after this many items have been collected
+        drive_id: Optional shared drive ID containing the tree
+        file_fields: Fields to request for each item (id, name and mimeType are always included)
+        max_concurrency: Maximum number of batch requests in flight
+
+    Returns:
+        DriveTreeWalk with the items found
+    """
+    fields = file_fields
+    for required in ("id", "name", "mimeType"):
+        if required not in [f.strip() for f in fields.split(",")]:
+            fields = f"{required}, {fields}"
+
+    root = await execute_with_retry(
+        service.files().get(fileId=root_folder_id, fields=fields, supportsAllDrives=True),
+        label="walk_drive_tree",
+    )
+    walk = DriveTreeWalk(root)
+    if root.get("mimeType") != FOLDER_MIME_TYPE:
+        walk.errors.append(f"'{root.get('name')}' ({root['id']}) is not a folder")
+        return walk
+
+    visited = {root["id"]}
+    level = [root["id"]]
+    depth = 1
+
+    async def _fetch(chunk: List[Tuple[str, Optional[str]]]):
+        requests = {
+            folder_id: service.files().list(
+                **build_drive_list_params(
+                    query=f"'{folder_id}' in parents and trashed=false",
+                    page_size=DRIVE_LIST_MAX_PAGE_SIZE,
+                    drive_id=drive_id,
+                    include_items_from_all_drives=True,
+                    file_fields=fields,
+                    order_by="folder,name",
+                    page_token=page_token,
+                )
+            )
+            for folder_id, page_token in chunk
+        }
+        return await execute_batch_with_retry(
+            service, requests, http=new_authorized_http(service), label="walk_drive_tree"
+        )
+
+    while level and depth <= max_depth and not walk.truncated:
+        next_level: List[str] = []
+        # Folder ID -> page token still to fetch (None for the first page)
+        pending: Dict[str, Optional[str]] = {folder_id: None for folder_id in level}
+
+        while pending and not walk.truncated:
+            chunks = list(chunked(list(pending.items()), DRIVE_TREE_BATCH_SIZE))
+            pending = {}
+            for chunk, results, error in await run_bounded(chunks, _fetch, max_concurrency):
+                if error is not None:
+                    walk.errors.extend(f"Listing folder {folder_id} failed: {error}" for folder_id, _ in chunk)
+                    continue
+                for folder_id, _ in chunk:
+                    response, list_error = results.get(folder_id, (None, "No response"))
+                    if list_error is not None:
+                        walk.errors.append(f"Listing folder {folder_id} failed: {list_error}")
+                        continue
+                    for item in response.get("files", []):
+                        if len(walk.entries) >= max_items:
+                            walk.truncated = True
+                            break
+                        if item["id"] in visited:
+                            continue
+                        visited.add(item["id"])
+                        walk.entries.append({"file": item, "depth": depth, "parent_id": folder_id})
+                        if item.get("mimeType") == FOLDER_MIME_TYPE:
+                            next_level.append(item["id"])
+                    if walk.truncated:
+                        break
+                    if response.get("nextPageToken"):
+                        pending[folder_id] = response["nextPageToken"]
+
+        await report_progress(
+            len(walk.entries),
+            None,
+            f"Depth {depth}: {len(walk.entries)} items, {len(next_level)} folders to expand",
+        )
+        logger.info(
+            f"[walk_drive_tree] Depth {depth} done: {len(walk.entries)} items so far, {len(next_level)} folders next"
+        )
+        level = next_level
+        depth += 1
+
+    if not walk.truncated:
+        walk.unexpanded_folders = len(level)
+    return walk
+
+
+def _short_mime_type(mime_type: str) -> str:
+    """Shorten Google-native MIME types for compact display."""
+    return mime_type.replace("application/vnd.google-apps.", "google-")
+
+
+def format_drive_tree(walk: DriveTreeWalk, indent: str = "  ") -> str:
+    """Render a tree walk as a compact indented outline."""
+    children = walk.children_by_parent()
+    lines = [f"{walk.root.get('name', 'Untitled')}/ (ID: {walk.root['id']})"]
+
+    # Iterative depth-first rendering so deep trees cannot hit the recursion limit
+    stack = [(entry, 1) for entry in reversed(children.get(walk.root["id"], []))]
+    while stack:
+        entry, level = stack.pop()
+        item = entry["file"]
+        if item.get("mimeType") == FOLDER_MIME_TYPE:
+            lines.append(f"{indent * level}{item['name']}/ (ID: {item['id']})")
+            stack.extend((child, level + 1) for child in reversed(children.get(item["id"], [])))
+        else:
+            size_str = f", {item['size']} B" if item.get("size") else ""
+            lines.append(
+                f"{indent * level}{item['name']} (ID: {item['id']}, {_short_mime_type(item.get('mimeType', ''))}{size_str})"
+            )
+    return "\n".join(lines)
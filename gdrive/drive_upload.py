@@ -0,0 +1,375 @@
+"""
+Streaming Drive Uploads
+
+Pipes a remote HTTP response body into a Drive resumable upload session
+without holding the whole file in memory. The download is split into fixed
+size chunks that pass through a small bounded queue: the downloader pauses
+whenever the uploader falls behind, so memory stays at a few chunks no matter
+how large the file is, and downloading and uploading overlap.
+
+Each chunk is retried on transient failures, resuming from the byte offset
+the upload session reports as committed. Uploads can outlive an access token;
+when Drive answers 401 the credentials are refreshed and the upload resumes.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from typing import Any, Dict, Optional, Union
+
+import httpx
+import google.auth.transport.requests
+
+from core.batching import DEFAULT_MAX_RETRIES, RETRYABLE_STATUS_CODES, retry_delay
+
+logger = logging.getLogger(__name__)
+
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+
+# Resumable upload chunks must be a multiple of 256 KiB (except the last)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_QUEUE_CHUNKS = 2
+DRIVE_UPLOAD_MAX_BYTES = int(os.getenv("DRIVE_UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+UPLOAD_TIMEOUT = httpx.Timeout(120.0, connect=15.0)
+
+_RANGE_HEADER_PATTERN = re.compile(r"bytes=0-(\d+)")
+
+
+class DriveUploadError(Exception):
+    """Raised when a streamed upload cannot be completed."""
+
+
+def get_access_token(service, force_refresh: bool = False) -> str:
+    """
+    Get a valid OAuth access token from a Drive service's credentials.
+
+    Runs synchronously (may refresh the token); call through asyncio.to_thread.
+
+    Args:
+        service: Authenticated Google API service
+        force_refresh: Refresh even if the token looks valid (e.g. after a 401)
+    """
+    credentials = getattr(getattr(service, "_http", None), "credentials", None)
+    if credentials is None:
+        raise DriveUploadError("Drive service has no credentials attached")
+    if force_refresh or not credentials.valid:
+        credentials.refresh(google.auth.transport.requests.Request())
+    return credentials.token
+
+
+class UploadAuth:
+    """The access token of one upload, refreshed when Drive rejects it."""
+
+    def __init__(self, service):
+        self.service = service
+        self.token: Optional[str] = None
+
+    async def get_token(self) -> str:
+        if self.token is None:
+            self.token = await asyncio.to_thread(get_access_token, self.service)
+        return self.token
+
+    async def refresh(self) -> str:
+        logger.info("[drive_upload] Access token rejected; refreshing credentials")
+        self.token = await asyncio.to_thread(get_access_token, self.service, True)
+        return self.token
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+
+def _committed_bytes(response: httpx.Response) -> int:
+    """Number of bytes the upload session has stored, from a 308 response."""
+    match = _RANGE_HEADER_PATTERN.match(response.headers.get("Range", ""))
+    return int(match.group(1)) + 1 if match else 0
+
+
+async def start_resumable_upload(
+    client: httpx.AsyncClient,
+    access_token: str,
+    metadata: Dict[str, Any],
+    mime_type: str,
+    total_size: Optional[int] = None,
+    fields: str = "id, name, webViewLink",
+) -> str:
+    """
+    Open a Drive resumable upload session.
+
+    Returns:
+        The session URI to send chunks to
+    """
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "X-Upload-Content-Type": mime_type,
+    }
+    if total_size is not None:
+        headers["X-Upload-Content-Length"] = str(total_size)
+    response = await client.post(
+        DRIVE_UPLOAD_URL,
+        params={"uploadType": "resumable", "supportsAllDrives": "true", "fields": fields},
+        headers=headers,
+        json=metadata,
+    )
+    if response.status_code != 200 or "Location" not in response.headers:
+        raise DriveUploadError(
+            f"Could not start upload session (status {response.status_code}): {response.text}"
+        )
+    return response.headers["Location"]
+
+
+async def _query_upload_status(
+    client: httpx.AsyncClient, session_url: str, total: str, auth: Optional[UploadAuth] = None
+) -> Union[int, Dict[str, Any]]:
+    """Ask the session how many bytes it has; returns the file resource if the upload already completed."""
+    headers = {"Content-Range": f"bytes */{total}", **(auth.headers if auth else {})}
+    response = await client.put(session_url, content=b"", headers=headers)
+    if response.status_code in (200, 201):
+        return response.json()
+    if response.status_code == 308:
+        return _committed_bytes(response)
+    raise DriveUploadError(f"Upload status check failed (status {response.status_code}): {response.text}")
+
+
+async def upload_chunk(
+    client: httpx.AsyncClient,
+    session_url: str,
+    chunk: bytes,
+    start: int,
+    total_size: Optional[int] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    auth: Optional[UploadAuth] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Send one chunk of a resumable upload, retrying transient failures.
+
+    After a failure the session is asked which bytes it committed and only the
+    remainder of the chunk is re-sent.
+
+    Args:
+        client: HTTP client
+        session_url: Resumable session URI
+        chunk: Chunk bytes
+        start: Offset of the chunk within the file
+        total_size: Total file size if this is the last chunk, else None
+        max_retries: Maximum retries of transient failures
+        auth: Upload credentials, refreshed once if the token expired mid-upload
+
+    Returns:
+        The created file resource when the upload is complete, else None
+    """
+    total = str(total_size) if total_size is not None else "*"
+    sent_from = 0  # Offset within the chunk still to be sent
+    refreshed = False
+
+    for attempt in range(max_retries + 1):
+        data = chunk[sent_from:]
+        first_byte = start + sent_from
+        content_range = (
+            f"bytes {first_byte}-{first_byte + len(data) - 1}/{total}" if data else f"bytes */{total}"
+        )
+        error: Optional[str] = None
+        try:
+            response = await client.put(
+                session_url, content=data, headers={"Content-Range": content_range, **(auth.headers if auth else {})}
+            )
+        except httpx.TransportError as e:
+            error = str(e)
+        else:
+            if response.status_code in (200, 201):
+                return response.json()
+            if response.status_code == 308:
+                committed = _committed_bytes(response)
+                if committed >= start + len(chunk):
+                    return None
+                # Server kept only part of the chunk; send the rest
+                sent_from = max(0, committed - start)
+                continue
+            if response.status_code == 401 and auth is not None and not refreshed:
+                # The token expired during a long upload; resume from what the session committed
+                refreshed = True
+                await auth.refresh()
+                status = await _query_upload_status(client, session_url, total, auth)
+                if isinstance(status, dict):
+                    return status
+                sent_from = min(len(chunk), max(0, status - start))
+                continue
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                raise DriveUploadError(
+                    f"Chunk upload failed at byte {first_byte} (status {response.status_code}): {response.text}"
+                )
+            error = f"status {response.status_code}"
+
+        if attempt >= max_retries:
+            raise DriveUploadError(f"Chunk upload failed at byte {first_byte} after {max_retries} retries: {error}")
+        delay = retry_delay(None, attempt)
+        logger.warning(f"[drive_upload] Chunk at byte {first_byte} failed ({error}). Retrying in {delay:.1f}s...")
+        await asyncio.sleep(delay)
+        try:
+            status = await _query_upload_status(client, session_url, total, auth)
+        except (httpx.TransportError, DriveUploadError) as e:
+            logger.warning(f"[drive_upload] Upload status check failed: {e}")
+            continue
+        if isinstance(status, dict):
+            return status
+        sent_from = min(len(chunk), max(0, status - start))
+
+    raise DriveUploadError(f"Chunk upload at byte {start} did not complete")
+
+
+async def _produce_chunks(
+    response: httpx.Response, queue: asyncio.Queue, max_bytes: int, chunk_size: int
+) -> None:
+    """Split a streamed response body into fixed-size chunks on the queue, then None."""
+    try:
+        buffer = bytearray()
+        received = 0
+        async for piece in response.aiter_bytes():
+            received += len(piece)
+            if received > max_bytes:
+                raise DriveUploadError(f"Remote file exceeds the upload size limit of {max_bytes} bytes")
+            buffer.extend(piece)
+            while len(buffer) >= chunk_size:
+                # Blocks while the uploader is behind (backpressure)
+                await queue.put(bytes(buffer[:chunk_size]))
+                del buffer[:chunk_size]
+        if buffer:
+            await queue.put(bytes(buffer))
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def stream_url_to_drive(
+    service,
+    url: str,
+    metadata: Dict[str, Any],
+    mime_type: Optional[str] = None,
+    max_bytes: int = DRIVE_UPLOAD_MAX_BYTES,
+    fields: str = "id, name, webViewLink",
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """
+    Download a URL and upload it to Drive as a new file, chunk by chunk.
+
+    Args:
+        service: Authenticated Drive API service (used for its credentials)
+        url: URL to fetch the file content from
+        metadata: Drive file metadata (name, parents, ...)
+        mime_type: Content type to upload as; the response Content-Type is used
+            when it is more specific than application/octet-stream
+        max_bytes: Maximum accepted file size
+        fields: Fields of the created file to return
+        chunk_size: Upload chunk size (a multiple of 256 KiB)
+
+    Returns:
+        The created file resource
+    """
+    auth = UploadAuth(service)
+    await auth.get_token()
+
+    async with httpx.AsyncClient(timeout=UPLOAD_TIMEOUT) as client:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise DriveUploadError(f"Failed to fetch file from URL: {url} (status {response.status_code})")
+
+            content_length = response.headers.get("Content-Length")
+            total_size = int(content_length) if content_length and content_length.isdigit() else None
+            if total_size is not None and total_size > max_bytes:
+                raise DriveUploadError(
+                    f"Remote file is {total_size} bytes, over the upload size limit of {max_bytes} bytes"
+                )
+
+            content_type = response.headers.get("Content-Type")
+            if content_type and content_type != "application/octet-stream":
+                mime_type = content_type
+                logger.info(f"[drive_upload] Using MIME type from Content-Type header: {mime_type}")
+            mime_type = mime_type or "application/octet-stream"
+
+            return await upload_response_to_drive(
+                client,
+                response,
+                auth,
+                dict(metadata, mimeType=mime_type),
+                mime_type,
+                max_bytes,
+                fields,
+                chunk_size,
+                # Content-Length describes the encoded body when compressed
+                total_size if not response.headers.get("Content-Encoding") else None,
+                source=url,
+            )
+
+
+async def upload_response_to_drive(
+    client: httpx.AsyncClient,
+    response: httpx.Response,
+    auth: UploadAuth,
+    metadata: Dict[str, Any],
+    mime_type: str,
+    max_bytes: int = DRIVE_UPLOAD_MAX_BYTES,
+    fields: str = "id, name, webViewLink",
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    total_size: Optional[int] = None,
+    source: str = "stream",
+) -> Dict[str, Any]:
+    """
+    Pipe an open streaming HTTP response into a new Drive resumable upload.
+
+    Args:
+        client: HTTP client for the upload requests
+        response: Streaming response to read the content from
+        auth: Drive credentials for the upload
+        metadata: Drive file metadata (name, parents, mimeType, ...)
+        mime_type: Content type of the uploaded bytes
+        max_bytes: Maximum accepted size
+        fields: Fields of the created file to return
+        chunk_size: Upload chunk size (a multiple of 256 KiB)
+        total_size: Exact content size if known in advance
+        source: Description of the content source for logs
+
+    Returns:
+        The created file resource
+    """
+    session_url = await start_resumable_upload(
+        client, await auth.get_token(), metadata, mime_type, total_size, fields
+    )
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_CHUNKS)
+    producer = asyncio.create_task(_produce_chunks(response, queue, max_bytes, chunk_size))
+    try:
+        offset = 0
+        current = await queue.get()
+        while True:
+            if isinstance(current, Exception):
+                raise current
+            if current is None:
+                # Empty body: finalize a zero-byte upload
+                result = await upload_chunk(client, session_url, b"", 0, 0, auth=auth)
+                break
+            following = await queue.get()
+            if isinstance(following, Exception):
+                raise following
+            is_last = following is None
+            result = await upload_chunk(
+                client,
+                session_url,
+                current,
+                offset,
+                offset + len(current) if is_last else None,
+                auth=auth,
+            )
+            offset += len(current)
+            if is_last:
+                break
+            current = following
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+    if not result:
+        raise DriveUploadError("Upload finished without returning the created file")
+    logger.info(f"[drive_upload] Uploaded {offset} bytes from {source} as file {result.get('id')}")
+    return result
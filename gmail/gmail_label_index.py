@@ -0,0 +1,218 @@
+"""
+Gmail Label Index
+
+Per-user cache of Gmail labels that lets tools accept label names as well as
+label IDs without listing labels on every call.
+
+The index is loaded once per user, revalidated with a conditional request
+(If-None-Match on the labels.list ETag) once it is older than
+LABEL_INDEX_TTL_SECONDS, and kept current by manage_gmail_label writes.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+LABEL_INDEX_TTL_SECONDS = 300
+
+# Built-in label IDs that never need to be looked up
+SYSTEM_LABEL_IDS = {
+    "INBOX",
+    "SPAM",
+    "TRASH",
+    "UNREAD",
+    "STARRED",
+    "IMPORTANT",
+    "SENT",
+    "DRAFT",
+    "CHAT",
+    "CATEGORY_PERSONAL",
+    "CATEGORY_SOCIAL",
+    "CATEGORY_PROMOTIONS",
+    "CATEGORY_UPDATES",
+    "CATEGORY_FORUMS",
+}
+
+# User label IDs always have this shape, so they can be passed through as-is
+USER_LABEL_ID_PATTERN = re.compile(r"^Label_\d+$")
+
+
+class GmailLabelIndex:
+    """Name and ID lookup over a snapshot of a user's Gmail labels."""
+
+    def __init__(self, labels: List[dict], etag: Optional[str] = None):
+        self.etag = etag
+        self.loaded_at = time.monotonic()
+        self._by_id: Dict[str, dict] = {}
+        self._by_name: Dict[str, dict] = {}
+        for label in labels:
+            self.upsert(label)
+
+    @property
+    def labels(self) -> List[dict]:
+        """All labels in the index."""
+        return list(self._by_id.values())
+
+    def is_stale(self) -> bool:
+        """Whether the index should be revalidated against the API."""
+        return time.monotonic() - self.loaded_at > LABEL_INDEX_TTL_SECONDS
+
+    def mark_fresh(self) -> None:
+        """Record that the index was just confirmed to be current."""
+        self.loaded_at = time.monotonic()
+
+    def get(self, label_id: str) -> Optional[dict]:
+        """Get a cached label by ID."""
+        return self._by_id.get(label_id)
+
+    def upsert(self, label: dict) -> None:
+        """Add or replace a label, e.g. after a create or update."""
+        previous = self._by_id.get(label["id"])
+        if previous is not None:
+            self._by_name.pop(previous["name"].lower(), None)
+        self._by_id[label["id"]] = label
+        self._by_name[label["name"].lower()] = label
+
+    def remove(self, label_id: str) -> None:
+        """Remove a label, e.g. after a delete."""
+        label = self._by_id.pop(label_id, None)
+        if label is not None:
+            self._by_name.pop(label["name"].lower(), None)
+
+    def resolve(self, name_or_id: str) -> Optional[str]:
+        """
+        Resolve a label ID or (case-insensitive) label name to a label ID.
+
+        Returns:
+            The label ID, or None if no label matches
+        """
+        if name_or_id in self._by_id:
+            return name_or_id
+        label = self._by_name.get(name_or_id.lower())
+        return label["id"] if label else None
+
+
+_label_indexes: Dict[str, GmailLabelIndex] = {}
+
+
+def _is_known_label_id(value: str) -> bool:
+    """Check whether a value is syntactically a Gmail label ID."""
+    return value in SYSTEM_LABEL_IDS or bool(USER_LABEL_ID_PATTERN.match(value))
+
+
+def _fetch_labels(service, etag: Optional[str]) -> Optional[tuple[List[dict], Optional[str]]]:
+    """
+    List labels, sending If-None-Match when an ETag is known.
+
+    Runs synchronously; call through asyncio.to_thread.
+
+    Returns:
+        Tuple of (labels, etag), or None if the server reports no changes (304)
+    """
+    request = service.users().labels().list(userId="me")
+    captured: Dict[str, Optional[str]] = {}
+    postproc = request.postproc
+
+    def _capture_etag(resp, content):
+        captured["etag"] = resp.get("etag")
+        return postproc(resp, content)
+
+    request.postproc = _capture_etag
+    if etag:
+        request.headers["If-None-Match"] = etag
+
+    try:
+        response = request.execute()
+    except HttpError as e:
+        if e.resp.status == 304:
+            return None
+        raise
+    return response.get("labels", []), captured.get("etag")
+
+
+async def get_label_index(
+    service, user_google_email: str, refresh: bool = False
+) -> GmailLabelIndex:
+    """
+    Get the label index for a user, loading or revalidating it as needed.
+
+    Args:
+        service: Authenticated Gmail API service
+        user_google_email: The user the index belongs to
+        refresh: Revalidate against the API even if the index is not stale
+
+    Returns:
+        The user's GmailLabelIndex
+    """
+    index = _label_indexes.get(user_google_email)
+    if index is not None and not refresh and not index.is_stale():
+        return index
+
+    result = await asyncio.to_thread(
+        _fetch_labels, service, index.etag if index is not None else None
+    )
+    if result is None:
+        index.mark_fresh()
+        logger.debug(f"Gmail label index for {user_google_email} is unchanged")
+        return index
+
+    labels, etag = result
+    index = GmailLabelIndex(labels, etag)
+    _label_indexes[user_google_email] = index
+    logger.debug(f"Loaded {len(labels)} Gmail labels into index for {user_google_email}")
+    return index
+
+
+def get_cached_label_index(user_google_email: str) -> Optional[GmailLabelIndex]:
+    """Get a user's label index if it has been loaded, without any API call."""
+    return _label_indexes.get(user_google_email)
+
+
+async def resolve_label_id(service, user_google_email: str, label: str) -> str:
+    """
+    Resolve a single label name or ID to a label ID.
+
+    Raises:
+        ValueError: If the label cannot be resolved
+    """
+    return (await resolve_label_ids(service, user_google_email, [label]))[0]
+
+
+async def resolve_label_ids(
+    service, user_google_email: str, labels: List[str]
+) -> List[str]:
+    """
+    Resolve a list of label names and/or IDs to label IDs.
+
+    Values that are already label IDs are passed through without an API call.
+    Names are resolved through the cached index, which is revalidated once if a
+    name is not found (the label may have been created since it was cached).
+
+    Raises:
+        ValueError: If any label cannot be resolved
+    """
+    if all(_is_known_label_id(label) for label in labels):
+        return list(labels)
+
+    index = await get_label_index(service, user_google_email)
+    if any(index.resolve(label) is None for label in labels):
+        index = await get_label_index(service, user_google_email, refresh=True)
+
+    resolved = []
+    unknown = []
+    for label in labels:
+        label_id = index.resolve(label)
+        if label_id is None:
+            unknown.append(label)
+        else:
+            resolved.append(label_id)
+
+    if unknown:
+        raise ValueError(f"Unknown Gmail label(s): {', '.join(unknown)}")
+    return resolved
@@ -8,7 +8,8 @@ import logging
 import asyncio
 import base64
 import ssl
-from typing import Optional, List, Dict, Literal
+from string import Template
+from typing import Optional, List, Dict, Literal, Iterator, Set, Tuple
 
 from email.mime.text import MIMEText
 
@@ -18,6 +19,24 @@ from pydantic import Field
 from auth.service_decorator import require_google_service
 from core.utils import handle_http_errors
 from core.server import server
+from core.batching import (
+    chunked,
+    execute_batch_with_retry,
+    execute_with_retry,
+    get_rate_limiter,
+    is_ambiguous_error,
+    is_rate_limit_error,
+    new_authorized_http,
+    report_progress,
+    run_bounded,
+)
+from core.job_checkpoint import JobCheckpoint, compute_job_fingerprint
+from gmail.gmail_label_index import (
+    get_cached_label_index,
+    get_label_index,
+    resolve_label_id,
+    resolve_label_ids,
+)
 from auth.scopes import (
     GMAIL_SEND_SCOPE,
     GMAIL_COMPOSE_SCOPE,
@@ -30,6 +49,15 @@ logger = logging.getLogger(__name__)
 GMAIL_BATCH_SIZE = 25
 GMAIL_REQUEST_DELAY = 0.1
 HTML_BODY_TRUNCATE_LIMIT = 20000
+GMAIL_BATCH_MODIFY_MAX_IDS = 1000  # API limit for users.messages.batchModify
+GMAIL_BATCH_MODIFY_CONCURRENCY = 4
+GMAIL_LIST_PAGE_SIZE = 500  # API maximum for users.messages.list
+
+# Per-user Gmail quota: 250 units/second; messages.send costs 100, drafts.create 10
+GMAIL_USER_QUOTA_UNITS_PER_SECOND = 250
+GMAIL_SEND_QUOTA_UNITS = 100
+GMAIL_DRAFT_QUOTA_UNITS = 10
+MAIL_MERGE_MAX_REPORTED_FAILURES = 50
 
 
 def _extract_message_body(payload):
@@ -273,6 +301,41 @@ def _format_gmail_results_plain(messages: list, query: str) -> str:
     return "\n".join(lines)
 
 
+async def _collect_message_ids(service, query: str, max_messages: int) -> Tuple[List[str], bool]:
+    """
+    Collect the IDs of all messages matching a Gmail search query.
+
+    Args:
+        service: Authenticated Gmail API service
+        query: Gmail search query
+        max_messages: Stop after collecting this many IDs
+
+    Returns:
+        Tuple of (message IDs in the order returned by the API, whether more
+        messages matched than max_messages)
+    """
+    message_ids: List[str] = []
+    page_token = None
+    while len(message_ids) < max_messages:
+        response = await execute_with_retry(
+            service.users()
+            .messages()
+            .list(
+                userId="me",
+                q=query,
+                maxResults=min(GMAIL_LIST_PAGE_SIZE, max_messages - len(message_ids)),
+                pageToken=page_token,
+                fields="messages/id,nextPageToken",
+            ),
+            label="list_gmail_messages",
+        )
+        message_ids.extend(m["id"] for m in response.get("messages", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+    return message_ids, page_token is not None
+
+
 @server.tool()
 @handle_http_errors("search_gmail_messages", is_read_only=True, service_type="gmail")
 @require_google_service("gmail", "gmail_read")
@@ -736,6 +799,226 @@ async def draft_gmail_message(
     return f"Draft created! Draft ID: {draft_id}"
 
 
+def _render_mail_merge_messages(
+    recipients: List[Dict[str, str]],
+    subject_template: str,
+    body_template: str,
+    cc: Optional[str],
+    bcc: Optional[str],
+    skip_keys: Set[str],
+) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+    """
+    Lazily render one MIME message per recipient record.
+
+    Args:
+        recipients: Recipient records; each must contain 'to' plus template fields
+        subject_template: string.Template for the subject
+        body_template: string.Template for the plain text body
+        cc: Default CC address (a record's 'cc' field overrides it)
+        bcc: Default BCC address (a record's 'bcc' field overrides it)
+        skip_keys: Keys of recipients already handled in a previous run
+
+    Yields:
+        Tuples of (key, recipient address, raw_message, error) where exactly one
+        of raw_message and error is set
+    """
+    subject_tpl = Template(subject_template)
+    body_tpl = Template(body_template)
+
+    for position, recipient in enumerate(recipients):
+        key = str(position)
+        if key in skip_keys:
+            continue
+
+        if not isinstance(recipient, dict) or not recipient.get("to"):
+            yield key, "(missing)", None, "Recipient record must include a 'to' address"
+            continue
+
+        fields = {name: "" if value is None else str(value) for name, value in recipient.items()}
+        try:
+            raw_message, _ = _prepare_gmail_message(
+                subject=subject_tpl.substitute(fields),
+                body=body_tpl.substitute(fields),
+                to=fields["to"],
+                cc=fields.get("cc") or cc,
+                bcc=fields.get("bcc") or bcc,
+            )
+        except KeyError as e:
+            yield key, fields["to"], None, f"Template field {e} missing from recipient record"
+            continue
+        except ValueError as e:
+            yield key, fields["to"], None, f"Invalid template: {e}"
+            continue
+
+        yield key, fields["to"], raw_message, None
+
+
+@server.tool()
+@handle_http_errors("send_gmail_mail_merge", service_type="gmail")
+@require_google_service("gmail", GMAIL_COMPOSE_SCOPE)
+async def send_gmail_mail_merge(
+    service,
+    user_google_email: str,
+    recipients: List[Dict[str, str]],
+    subject_template: str,
+    body_template: str,
+    mode: Literal["send", "draft"] = "send",
+    cc: Optional[str] = None,
+    bcc: Optional[str] = None,
+    job_id: Optional[str] = None,
+) -> str:
+    """
+    Sends (or drafts) one personalized email per recipient record in a single call.
+    Messages are rendered on the fly, submitted through batch requests under the
+    user's Gmail send-rate quota, and checkpointed so an interrupted job resumes
+    where it stopped when called again with the same inputs (or the same job_id).
+
+    Templates use $field or ${field} placeholders filled from each record, e.g.
+    subject_template="Welcome, $first_name". Use $$ for a literal dollar sign.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        recipients (List[Dict[str, str]]): Recipient records. Each needs a 'to' address plus the template fields; optional 'cc'/'bcc' override the defaults.
+        subject_template (str): Subject template.
+        body_template (str): Plain text body template.
+        mode (Literal["send", "draft"]): "send" to send immediately, "draft" to create drafts. Defaults to "send".
+        cc (Optional[str]): Default CC address for every message.
+        bcc (Optional[str]): Default BCC address for every message.
+        job_id (Optional[str]): Identifier for resuming. Defaults to a fingerprint of the inputs.
+
+    Returns:
+        str: Summary of per-recipient results, including failures and the results journal location.
+    """
+    logger.info(
+        f"[send_gmail_mail_merge] Invoked. Email: '{user_google_email}', Recipients: {len(recipients)}, Mode: {mode}"
+    )
+
+    if not recipients:
+        raise Exception("No recipients provided.")
+
+    fingerprint = compute_job_fingerprint(
+        {
+            "recipients": recipients,
+            "subject_template": subject_template,
+            "body_template": body_template,
+            "mode": mode,
+            "cc": cc,
+            "bcc": bcc,
+        }
+    )
+    job_id = job_id or fingerprint[:16]
+    checkpoint = JobCheckpoint("gmail_mail_merge", job_id, user_google_email, fingerprint)
+    try:
+        completed_keys = checkpoint.load_completed()
+    except ValueError as e:
+        raise Exception(str(e))
+
+    limiter = get_rate_limiter(
+        f"gmail:{user_google_email}",
+        GMAIL_USER_QUOTA_UNITS_PER_SECOND,
+        GMAIL_USER_QUOTA_UNITS_PER_SECOND,
+    )
+    quota_cost = GMAIL_SEND_QUOTA_UNITS if mode == "send" else GMAIL_DRAFT_QUOTA_UNITS
+
+    total = len(recipients)
+    previously_completed = len(completed_keys)
+    succeeded = 0
+    failures: List[str] = []
+    failed_count = 0
+    unknown: List[str] = []
+    unknown_count = 0
+
+    def _record_failure(key: str, to: str, error) -> None:
+        nonlocal failed_count, unknown_count
+        if isinstance(error, Exception) and is_ambiguous_error(error):
+            # The message may have gone out; never re-send it automatically
+            unknown_count += 1
+            checkpoint.record(key, "unknown", to=to, error=str(error))
+            if len(unknown) < MAIL_MERGE_MAX_REPORTED_FAILURES:
+                unknown.append(f"  - #{key} {to}: {error}")
+            return
+        failed_count += 1
+        checkpoint.record(key, "error", to=to, error=str(error))
+        if len(failures) < MAIL_MERGE_MAX_REPORTED_FAILURES:
+            failures.append(f"  - #{key} {to}: {error}")
+
+    async def _submit(window: List[Tuple[str, str, str]]) -> None:
+        nonlocal succeeded
+        requests = {}
+        for key, _, raw_message in window:
+            await limiter.acquire(quota_cost)
+            if mode == "send":
+                requests[key] = service.users().messages().send(
+                    userId="me", body={"raw": raw_message}
+                )
+            else:
+                requests[key] = service.users().drafts().create(
+                    userId="me", body={"message": {"raw": raw_message}}
+                )
+
+        # Only rate-limited sub-requests are known not to have been applied;
+        # retrying a server error could deliver the same message twice
+        try:
+            results = await execute_batch_with_retry(
+                service, requests, label="send_gmail_mail_merge", retry_if=is_rate_limit_error
+            )
+        except Exception as e:
+            results = {key: (None, e) for key in requests}
+        for key, to, _ in window:
+            response, error = results.get(key, (None, "No result"))
+            if error:
+                _record_failure(key, to, error)
+            else:
+                succeeded += 1
+                checkpoint.record(key, "ok", to=to, id=(response or {}).get("id"))
+
+        processed = previously_completed + succeeded + failed_count + unknown_count
+        await report_progress(
+            processed, total, f"Processed {processed}/{total} recipients"
+        )
+
+    window: List[Tuple[str, str, str]] = []
+    for key, to, raw_message, error in _render_mail_merge_messages(
+        recipients, subject_template, body_template, cc, bcc, completed_keys
+    ):
+        if error:
+            _record_failure(key, to, error)
+            continue
+        window.append((key, to, raw_message))
+        if len(window) >= GMAIL_BATCH_SIZE:
+            await _submit(window)
+            window = []
+    if window:
+        await _submit(window)
+
+    action = "sent" if mode == "send" else "drafted"
+    lines = [
+        f"Mail merge job '{job_id}' for {user_google_email}: {succeeded} {action}, {failed_count} failed"
+        + (f", {unknown_count} with unknown outcome" if unknown_count else "")
+        + (f", {previously_completed} already completed in a previous run" if previously_completed else "")
+        + f" (of {total} recipients)."
+    ]
+    if checkpoint.path:
+        lines.append(f"Per-recipient results: {checkpoint.path}")
+    if failures:
+        lines.append("")
+        lines.append("Failures:")
+        lines.extend(failures)
+        if failed_count > len(failures):
+            lines.append(f"  ... and {failed_count - len(failures)} more")
+        lines.append("Re-run with the same inputs to retry failed recipients.")
+    if unknown:
+        lines.append("")
+        lines.append(f"Unknown outcome (server or network error; the message may have been {action}):")
+        lines.extend(unknown)
+        if unknown_count > len(unknown):
+            lines.append(f"  ... and {unknown_count - len(unknown)} more")
+        lines.append(
+            "These are not retried on re-run. Check the Sent/Drafts folder and call again with only the missing recipients."
+        )
+    return "\n".join(lines)
+
+
 def _format_thread_content(thread_data: dict, thread_id: str) -> str:
     """
     Helper function to format thread content from Gmail API response.
@@ -961,10 +1244,8 @@ async def list_gmail_labels(service, user_google_email: str) -> str:
     """
     logger.info(f"[list_gmail_labels] Invoked. Email: '{user_google_email}'")
 
-    response = await asyncio.to_thread(
-        service.users().labels().list(userId="me").execute
-    )
-    labels = response.get("labels", [])
+    label_index = await get_label_index(service, user_google_email)
+    labels = label_index.labels
 
     if not labels:
         return "No labels found."
@@ -1013,7 +1294,7 @@ async def manage_gmail_label(
         user_google_email (str): The user's Google email address. Required.
         action (Literal["create", "update", "delete"]): Action to perform on the label.
         name (Optional[str]): Label name. Required for create, optional for update.
-        label_id (Optional[str]): Label ID. Required for update and delete operations.
+        label_id (Optional[str]): Label ID or current label name. Required for update and delete operations.
         label_list_visibility (Literal["labelShow", "labelHide"]): Whether the label is shown in the label list.
         message_list_visibility (Literal["show", "hide"]): Whether the label is shown in the message list.
 
@@ -1030,6 +1311,8 @@ async def manage_gmail_label(
     if action in ["update", "delete"] and not label_id:
         raise Exception("Label ID is required for update and delete actions.")
 
+    label_index = get_cached_label_index(user_google_email)
+
     if action == "create":
         label_object = {
             "name": name,
@@ -1039,13 +1322,19 @@ async def manage_gmail_label(
         created_label = await asyncio.to_thread(
             service.users().labels().create(userId="me", body=label_object).execute
         )
+        if label_index:
+            label_index.upsert(created_label)
         return f"Label created successfully!\nName: {created_label['name']}\nID: {created_label['id']}"
 
-    elif action == "update":
+    label_id = await resolve_label_id(service, user_google_email, label_id)
+    label_index = get_cached_label_index(user_google_email)
+    current_label = label_index.get(label_id) if label_index else None
+    if current_label is None:
         current_label = await asyncio.to_thread(
             service.users().labels().get(userId="me", id=label_id).execute
         )
 
+    if action == "update":
         label_object = {
             "id": label_id,
             "name": name if name is not None else current_label["name"],
@@ -1059,17 +1348,18 @@ async def manage_gmail_label(
             .update(userId="me", id=label_id, body=label_object)
             .execute
         )
+        if label_index:
+            label_index.upsert(updated_label)
         return f"Label updated successfully!\nName: {updated_label['name']}\nID: {updated_label['id']}"
 
     elif action == "delete":
-        label = await asyncio.to_thread(
-            service.users().labels().get(userId="me", id=label_id).execute
-        )
-        label_name = label["name"]
+        label_name = current_label["name"]
 
         await asyncio.to_thread(
             service.users().labels().delete(userId="me", id=label_id).execute
         )
+        if label_index:
+            label_index.remove(label_id)
         return f"Label '{label_name}' (ID: {label_id}) deleted successfully!"
 
 
@@ -1080,19 +1370,20 @@ async def modify_gmail_message_labels(
     service,
     user_google_email: str,
     message_id: str,
-    add_label_ids: List[str] = Field(default=[], description="Label IDs to add to the message."),
-    remove_label_ids: List[str] = Field(default=[], description="Label IDs to remove from the message."),
+    add_label_ids: List[str] = Field(default=[], description="Label IDs or names to add to the message."),
+    remove_label_ids: List[str] = Field(default=[], description="Label IDs or names to remove from the message."),
 ) -> str:
     """
     Adds or removes labels from a Gmail message.
     To archive an email, remove the INBOX label.
     To delete an email, add the TRASH label.
+    Labels may be given by ID or by name; there is no need to call list_gmail_labels first.
 
     Args:
         user_google_email (str): The user's Google email address. Required.
         message_id (str): The ID of the message to modify.
-        add_label_ids (Optional[List[str]]): List of label IDs to add to the message.
-        remove_label_ids (Optional[List[str]]): List of label IDs to remove from the message.
+        add_label_ids (Optional[List[str]]): List of label IDs or label names to add to the message.
+        remove_label_ids (Optional[List[str]]): List of label IDs or label names to remove from the message.
 
     Returns:
         str: Confirmation message of the label changes applied to the message.
@@ -1106,6 +1397,9 @@ async def modify_gmail_message_labels(
             "At least one of add_label_ids or remove_label_ids must be provided."
         )
 
+    add_label_ids = await resolve_label_ids(service, user_google_email, add_label_ids)
+    remove_label_ids = await resolve_label_ids(service, user_google_email, remove_label_ids)
+
     body = {}
     if add_label_ids:
         body["addLabelIds"] = add_label_ids
@@ -1131,24 +1425,30 @@ async def modify_gmail_message_labels(
 async def batch_modify_gmail_message_labels(
     service,
     user_google_email: str,
-    message_ids: List[str],
-    add_label_ids: List[str] = Field(default=[], description="Label IDs to add to messages."),
-    remove_label_ids: List[str] = Field(default=[], description="Label IDs to remove from messages."),
+    message_ids: Optional[List[str]] = None,
+    add_label_ids: List[str] = Field(default=[], description="Label IDs or names to add to messages."),
+    remove_label_ids: List[str] = Field(default=[], description="Label IDs or names to remove from messages."),
+    query: Optional[str] = None,
+    max_messages: int = 50000,
 ) -> str:
     """
-    Adds or removes labels from multiple Gmail messages in a single batch request.
+    Adds or removes labels from any number of Gmail messages.
+    Messages are split into API-sized chunks that run concurrently with automatic
+    backoff on rate limiting. Failed chunks are reported individually.
 
     Args:
         user_google_email (str): The user's Google email address. Required.
-        message_ids (List[str]): A list of message IDs to modify.
-        add_label_ids (Optional[List[str]]): List of label IDs to add to the messages.
-        remove_label_ids (Optional[List[str]]): List of label IDs to remove from the messages.
+        message_ids (Optional[List[str]]): A list of message IDs to modify. Any size is accepted.
+        add_label_ids (Optional[List[str]]): List of label IDs or label names to add to the messages.
+        remove_label_ids (Optional[List[str]]): List of label IDs or label names to remove from the messages.
+        query (Optional[str]): Gmail search query selecting the messages to modify instead of (or in addition to) message_ids.
+        max_messages (int): Maximum number of messages a query may select; the result notes when more matched. Defaults to 50000.
 
     Returns:
-        str: Confirmation message of the label changes applied to the messages.
+        str: Confirmation message of the label changes applied, including any chunks that failed.
     """
     logger.info(
-        f"[batch_modify_gmail_message_labels] Invoked. Email: '{user_google_email}', Message IDs: '{message_ids}'"
+        f"[batch_modify_gmail_message_labels] Invoked. Email: '{user_google_email}', Message IDs: {len(message_ids or [])}, Query: '{query}'"
     )
 
     if not add_label_ids and not remove_label_ids:
@@ -1156,21 +1456,68 @@ async def batch_modify_gmail_message_labels(
             "At least one of add_label_ids or remove_label_ids must be provided."
         )
 
-    body = {"ids": message_ids}
-    if add_label_ids:
-        body["addLabelIds"] = add_label_ids
-    if remove_label_ids:
-        body["removeLabelIds"] = remove_label_ids
+    if not message_ids and not query:
+        raise Exception("Either message_ids or query must be provided.")
+
+    add_ids = await resolve_label_ids(service, user_google_email, add_label_ids)
+    remove_ids = await resolve_label_ids(service, user_google_email, remove_label_ids)
+
+    target_ids = list(dict.fromkeys(message_ids or []))
+    truncated = False
+    if query:
+        query_ids, truncated = await _collect_message_ids(service, query, max_messages)
+        target_ids = list(dict.fromkeys(target_ids + query_ids))
+
+    if not target_ids:
+        return f"No messages matched; no labels were changed for {user_google_email}."
+
+    chunks = list(chunked(target_ids, GMAIL_BATCH_MODIFY_MAX_IDS))
+    completed = 0
+
+    async def _modify_chunk(chunk_ids: List[str]) -> int:
+        nonlocal completed
+        body = {"ids": chunk_ids}
+        if add_ids:
+            body["addLabelIds"] = add_ids
+        if remove_ids:
+            body["removeLabelIds"] = remove_ids
+        await execute_with_retry(
+            service.users().messages().batchModify(userId="me", body=body),
+            http=new_authorized_http(service),
+            label="batch_modify_gmail_message_labels",
+        )
+        completed += len(chunk_ids)
+        await report_progress(
+            completed, len(target_ids), f"Updated labels on {completed}/{len(target_ids)} messages"
+        )
+        return len(chunk_ids)
 
-    await asyncio.to_thread(
-        service.users().messages().batchModify(userId="me", body=body).execute
-    )
+    results = await run_bounded(chunks, _modify_chunk, GMAIL_BATCH_MODIFY_CONCURRENCY)
 
-    actions = []
-    if add_label_ids:
-        actions.append(f"Added labels: {', '.join(add_label_ids)}")
-    if remove_label_ids:
-        actions.append(f"Removed labels: {', '.join(remove_label_ids)}")
+    failures = []
+    for chunk_number, (chunk_ids, _, error) in enumerate(results, 1):
+        if error is not None:
+            failures.append(
+                f"  - Chunk {chunk_number} ({len(chunk_ids)} messages, first ID {chunk_ids[0]}): {error}"
+            )
 
-    return f"Labels updated for {len(message_ids)} messages: {'; '.join(actions)}"
+    if len(failures) == len(chunks):
+        raise Exception(
+            f"All {len(chunks)} chunks failed to update labels:\n" + "\n".join(failures)
+        )
 
+    actions = []
+    if add_ids:
+        actions.append(f"Added labels: {', '.join(add_ids)}")
+    if remove_ids:
+        actions.append(f"Removed labels: {', '.join(remove_ids)}")
+
+    output = f"Labels updated for {completed} of {len(target_ids)} messages in {len(chunks)} chunk(s): {'; '.join(actions)}"
+    if truncated:
+        output += (
+            f"\n\n⚠️ The query matched more than max_messages ({max_messages}) messages; only the first "
+            f"{max_messages} were modified. Run again (or raise max_messages) to update the rest."
+        )
+    if failures:
+        output += f"\n\n⚠️ {len(failures)} chunk(s) failed:\n" + "\n".join(failures)
+    return output
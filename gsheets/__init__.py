@@ -8,7 +8,10 @@ from .sheets_tools import (
     list_spreadsheets,
     get_spreadsheet_info,
     read_sheet_values,
+    read_sheet_ranges,
     modify_sheet_values,
+    write_sheet_ranges,
+    query_sheet,
     create_spreadsheet,
     create_sheet,
 )
@@ -17,7 +20,10 @@ __all__ = [
     "list_spreadsheets",
     "get_spreadsheet_info", 
     "read_sheet_values",
+    "read_sheet_ranges",
     "modify_sheet_values",
+    "write_sheet_ranges",
+    "query_sheet",
     "create_spreadsheet",
     "create_sheet",
 ]
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+Google Sheets Helper Functions
+
+A1 notation parsing, row windowing and compact value formatting shared by the
+Sheets tools.
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VALUE_RENDER_OPTIONS = ("FORMATTED_VALUE", "UNFORMATTED_VALUE", "FORMULA")
+DATE_TIME_RENDER_OPTIONS = ("SERIAL_NUMBER", "FORMATTED_STRING")
+
+SHEETS_READ_DEFAULT_MAX_ROWS = 1000
+SHEETS_READ_MAX_ROWS_LIMIT = 10000
+
+_CELL_REF = re.compile(r"^\$?([A-Za-z]{0,3})\$?(\d*)$")
+
+
+def column_to_index(letters: str) -> int:
+    """Convert column letters to a zero-based index ("A" -> 0, "AA" -> 26)."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + (ord(letter) - ord("A") + 1)
+    return index - 1
+
+
+def index_to_column(index: int) -> str:
+    """Convert a zero-based column index to letters (0 -> "A", 26 -> "AA")."""
+    letters = ""
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def quote_sheet_name(name: str) -> str:
+    """Quote a sheet title for use in A1 notation."""
+    return "'" + name.replace("'", "''") + "'"
+
+
+def _parse_cell(ref: str) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """Parse "B3", "B", "3" into (column index, row number); None if not a cell reference."""
+    match = _CELL_REF.match(ref.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    column = column_to_index(match.group(1)) if match.group(1) else None
+    row = int(match.group(2)) if match.group(2) else None
+    return column, row
+
+
+class A1Range:
+    """
+    A parsed A1 range. Columns are zero-based indices, rows are 1-based row
+    numbers; None means unbounded on that side (e.g. "A:D" has no rows).
+    """
+
+    def __init__(
+        self,
+        sheet: Optional[str],
+        start_column: Optional[int] = None,
+        start_row: Optional[int] = None,
+        end_column: Optional[int] = None,
+        end_row: Optional[int] = None,
+    ):
+        self.sheet = sheet
+        self.start_column = start_column
+        self.start_row = start_row
+        self.end_column = end_column
+        self.end_row = end_row
+
+    @property
+    def is_whole_sheet(self) -> bool:
+        return self.start_column is None and self.start_row is None and self.end_column is None and self.end_row is None
+
+    def with_rows(self, start_row: int, end_row: Optional[int]) -> "A1Range":
+        """Copy of this range limited to rows start_row..end_row."""
+        return A1Range(self.sheet, self.start_column, start_row, self.end_column, end_row)
+
+    def to_a1(self) -> str:
+        prefix = f"{quote_sheet_name(self.sheet)}!" if self.sheet is not None else ""
+        if self.is_whole_sheet:
+            return quote_sheet_name(self.sheet) if self.sheet is not None else ""
+
+        def _ref(column: Optional[int], row: Optional[int]) -> str:
+            return (index_to_column(column) if column is not None else "") + (str(row) if row is not None else "")
+
+        start = _ref(self.start_column, self.start_row)
+        end = _ref(self.end_column, self.end_row)
+        if end and end != start:
+            return f"{prefix}{start}:{end}"
+        return f"{prefix}{start}"
+
+
+def split_sheet_name(range_name: str) -> Tuple[Optional[str], str]:
+    """Split "Sheet 1!A1:B2" / "'It''s'!A1" into (sheet title, cell part)."""
+    range_name = range_name.strip()
+    if range_name.startswith("'"):
+        closing = 1
+        while True:
+            closing = range_name.find("'", closing)
+            if closing == -1:
+                raise ValueError(f"Unterminated sheet name quote in range '{range_name}'")
+            if range_name[closing + 1:closing + 2] == "'":
+                closing += 2
+                continue
+            break
+        sheet = range_name[1:closing].replace("''", "'")
+        rest = range_name[closing + 1:]
+        if rest and not rest.startswith("!"):
+            raise ValueError(f"Invalid range '{range_name}'")
+        return sheet, rest[1:]
+    if "!" in range_name:
+        sheet, _, cells = range_name.rpartition("!")
+        return sheet, cells
+    return None, range_name
+
+
+def parse_a1_range(range_name: str) -> Optional[A1Range]:
+    """
+    Parse an A1 range such as "Sheet1!A1:D", "A:C", "'My Sheet'" or "B2".
+
+    Returns:
+        The parsed range, or None for something that is not A1 notation
+        (e.g. a named range), which callers should pass through unchanged
+    """
+    sheet, cells = split_sheet_name(range_name)
+    if not cells:
+        return A1Range(sheet) if sheet is not None else None
+    start_ref, _, end_ref = cells.partition(":")
+    start = _parse_cell(start_ref)
+    end = _parse_cell(end_ref) if end_ref else start
+    if sheet is None and not end_ref and (start is None or start[0] is None or start[1] is None):
+        # A lone word like "Data" or "AB" refers to a sheet (or a named range)
+        return A1Range(cells)
+    if start is None or end is None:
+        return None
+    return A1Range(sheet, start[0], start[1], end[0], end[1])
+
+
+def is_bare_name(range_name: str) -> bool:
+    """
+    Whether a range is a lone unquoted word such as "Data", which may be
+    either a sheet title or a named range.
+    """
+    try:
+        sheet, _ = split_sheet_name(range_name)
+        parsed = parse_a1_range(range_name)
+    except ValueError:
+        return False
+    return sheet is None and parsed is not None and parsed.is_whole_sheet
+
+
+def window_range(
+    range_name: str, row_offset: int, max_rows: int, sheet_rows: Optional[int] = None
+) -> Tuple[str, Optional[int], Optional[int], Optional[int]]:
+    """
+    Limit a range to max_rows rows starting row_offset rows below its first row.
+
+    A bare name (see is_bare_name) may be a named range, which cannot be
+    windowed, so it is read whole; callers that know it is a sheet title
+    should pass the quoted title instead (SpreadsheetMetadata.sheet_range).
+
+    Args:
+        range_name: Range in A1 notation
+        row_offset: Rows to skip from the start of the range
+        max_rows: Maximum rows in the window
+        sheet_rows: Row count of the sheet's grid, if known; windows never extend past it
+
+    Returns:
+        (A1 range to read, first row number, last row number, last row of the
+        whole range or None if unbounded). The row numbers are None when the
+        range could not be windowed (it is read whole). An empty range string
+        means the window lies past the end of the range.
+    """
+    parsed = parse_a1_range(range_name)
+    if parsed is None or is_bare_name(range_name):
+        return range_name, None, None, None
+    end_row = parsed.end_row
+    if sheet_rows is not None:
+        end_row = min(end_row, sheet_rows) if end_row is not None else sheet_rows
+    first = (parsed.start_row or 1) + row_offset
+    last = first + max_rows - 1
+    if end_row is not None:
+        if first > end_row:
+            return "", first, first - 1, end_row
+        last = min(last, end_row)
+    return parsed.with_rows(first, last).to_a1(), first, last, end_row
+
+
+def values_to_csv(values: List[List[Any]]) -> str:
+    """Format rows as CSV, padding ragged rows to the widest returned row."""
+    width = max((len(row) for row in values), default=0)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(row + [""] * (width - len(row)) if len(row) < width else row for row in values)
+    return buffer.getvalue()
+
+
+async def batch_get_values(
+    service,
+    spreadsheet_id: str,
+    ranges: List[str],
+    value_render_option: str = "FORMATTED_VALUE",
+    date_time_render_option: str = "SERIAL_NUMBER",
+) -> List[Dict[str, Any]]:
+    """
+    Read several ranges with one values.batchGet.
+
+    Returns:
+        ValueRange dicts in the order of `ranges`
+    """
+    if value_render_option not in VALUE_RENDER_OPTIONS:
+        raise ValueError(f"Unsupported value_render_option '{value_render_option}'. Supported: {', '.join(VALUE_RENDER_OPTIONS)}")
+    if date_time_render_option not in DATE_TIME_RENDER_OPTIONS:
+        raise ValueError(
+            f"Unsupported date_time_render_option '{date_time_render_option}'. "
+            f"Supported: {', '.join(DATE_TIME_RENDER_OPTIONS)}"
+        )
+    params: Dict[str, Any] = {
+        "spreadsheetId": spreadsheet_id,
+        "ranges": ranges,
+        "majorDimension": "ROWS",
+        "valueRenderOption": value_render_option,
+    }
+    if value_render_option != "FORMATTED_VALUE":
+        # Ignored by the API for formatted values
+        params["dateTimeRenderOption"] = date_time_render_option
+    response = await asyncio.to_thread(service.spreadsheets().values().batchGet(**params).execute)
+    return response.get("valueRanges", [])
@@ -0,0 +1,260 @@
+"""
+Spreadsheet Metadata Cache
+
+Keeps each spreadsheet's title and sheet properties, fetched with a tight
+fields mask, and indexes the sheets by title so tools can resolve sheet
+names and grid sizes without another spreadsheets.get.
+
+A cached entry is trusted for SHEETS_METADATA_TTL_SECONDS. After that it is
+revalidated against the file's Drive modifiedTime when the caller has a
+Drive service, or refetched otherwise. Tools that add sheets update the
+cache from their API responses, and tools that write values drop the entry,
+since writes can grow a sheet's grid. Ranges are only checked against a
+fresh entry: without one, fetching metadata just to validate would cost
+more than letting the API reject a bad range. A lookup of an unknown sheet
+title forces one refetch before the range is rejected, so a stale entry
+never blocks a valid request.
+
+Entries are keyed by user and spreadsheet ID, because a fresh entry is
+served without any API call: a user only ever reaches metadata fetched with
+their own credentials, so the cache cannot reveal a spreadsheet's title,
+sheets or grid sizes to someone who cannot open it. Invalidation after a
+write drops every user's entry for the spreadsheet.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from gsheets.sheets_helpers import index_to_column, is_bare_name, parse_a1_range, quote_sheet_name
+
+logger = logging.getLogger(__name__)
+
+SHEETS_METADATA_TTL_SECONDS = float(os.getenv("SHEETS_METADATA_TTL_SECONDS", "30"))
+SHEETS_METADATA_CACHE_MAX_SPREADSHEETS = int(os.getenv("SHEETS_METADATA_CACHE_MAX_SPREADSHEETS", "64"))
+
+SPREADSHEET_METADATA_FIELDS = (
+    "spreadsheetId,properties(title,locale,timeZone),"
+    "sheets(properties(sheetId,title,index,sheetType,hidden,"
+    "gridProperties(rowCount,columnCount,frozenRowCount,frozenColumnCount)))"
+)
+
+
+class SpreadsheetMetadata:
+    """A spreadsheet's properties with a sheet-title index."""
+
+    def __init__(self, spreadsheet: Dict[str, Any], modified_time: Optional[str] = None):
+        self.spreadsheet_id: str = spreadsheet.get("spreadsheetId", "")
+        self.properties: Dict[str, Any] = spreadsheet.get("properties", {})
+        self.sheets: List[Dict[str, Any]] = sorted(
+            (sheet.get("properties", {}) for sheet in spreadsheet.get("sheets", [])),
+            key=lambda props: props.get("index", 0),
+        )
+        self.modified_time = modified_time
+        self.fetched_at = time.monotonic()
+        # Sheet titles are matched case-insensitively, as in A1 references
+        self._by_title = {props.get("title", "").lower(): props for props in self.sheets}
+
+    @property
+    def title(self) -> str:
+        return self.properties.get("title", "Unknown")
+
+    def sheet(self, title: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Properties of the sheet with this title; None title means the first sheet."""
+        if title is None:
+            return self.sheets[0] if self.sheets else None
+        return self._by_title.get(title.lower())
+
+    def add_sheet(self, properties: Dict[str, Any]) -> None:
+        """Record a sheet created through the API (addSheet reply properties)."""
+        self.sheets = sorted(
+            [props for props in self.sheets if props.get("sheetId") != properties.get("sheetId")] + [properties],
+            key=lambda props: props.get("index", 0),
+        )
+        self._by_title[properties.get("title", "").lower()] = properties
+
+    def check_range(self, range_name: str, check_grid: bool = False) -> Optional[str]:
+        """
+        Validate a range against the sheet index.
+
+        Args:
+            range_name: A1 range (named ranges are not checked)
+            check_grid: Also reject ranges that start outside the sheet's grid
+
+        Returns:
+            An error message, or None if the range looks valid
+        """
+        try:
+            parsed = parse_a1_range(range_name)
+        except ValueError as e:
+            return str(e)
+        if parsed is None:
+            return None
+        props = self.sheet(parsed.sheet)
+        if props is None:
+            if parsed.sheet is not None and not parsed.is_whole_sheet:
+                return f"Sheet '{parsed.sheet}' not found. Sheets: {', '.join(self.titles())}"
+            # A lone word may be a named range rather than a sheet title
+            return None
+        if check_grid:
+            grid = props.get("gridProperties", {})
+            rows, columns = grid.get("rowCount"), grid.get("columnCount")
+            if rows is not None and parsed.start_row is not None and parsed.start_row > rows:
+                return f"Range '{range_name}' starts at row {parsed.start_row}, but sheet '{props.get('title')}' has {rows} rows"
+            if columns is not None and parsed.start_column is not None and parsed.start_column >= columns:
+                return (
+                    f"Range '{range_name}' starts at column {index_to_column(parsed.start_column)}, but sheet "
+                    f"'{props.get('title')}' ends at column {index_to_column(columns - 1)}"
+                )
+        return None
+
+    def sheet_row_count(self, range_name: str) -> Optional[int]:
+        """Grid row count of the sheet a range refers to, if known."""
+        try:
+            parsed = parse_a1_range(range_name)
+        except ValueError:
+            return None
+        props = self.sheet(parsed.sheet) if parsed is not None else None
+        return props.get("gridProperties", {}).get("rowCount") if props else None
+
+    def sheet_range(self, range_name: str) -> str:
+        """
+        Quote a bare name that is one of the sheet titles, so it can be
+        windowed and split like any sheet range; anything else (including
+        named ranges) is returned unchanged.
+        """
+        if not is_bare_name(range_name):
+            return range_name
+        props = self.sheet(range_name.strip())
+        return quote_sheet_name(props.get("title", "")) if props else range_name
+
+    def titles(self) -> List[str]:
+        return [props.get("title", "") for props in self.sheets]
+
+
+class SpreadsheetMetadataCache:
+    """LRU cache of SpreadsheetMetadata by (user email, spreadsheet ID)."""
+
+    def __init__(self, max_spreadsheets: int = SHEETS_METADATA_CACHE_MAX_SPREADSHEETS):
+        self.max_spreadsheets = max_spreadsheets
+        self._entries: "OrderedDict[Tuple[str, str], SpreadsheetMetadata]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_google_email: str, spreadsheet_id: str) -> Optional[SpreadsheetMetadata]:
+        key = (user_google_email, spreadsheet_id)
+        with self._lock:
+            metadata = self._entries.get(key)
+            if metadata is not None:
+                self._entries.move_to_end(key)
+            return metadata
+
+    def put(self, user_google_email: str, metadata: SpreadsheetMetadata) -> None:
+        if not metadata.spreadsheet_id or self.max_spreadsheets <= 0:
+            return
+        key = (user_google_email, metadata.spreadsheet_id)
+        with self._lock:
+            self._entries[key] = metadata
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_spreadsheets:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, spreadsheet_id: str) -> None:
+        """Drop the spreadsheet's entries for every user."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == spreadsheet_id]:
+                del self._entries[key]
+
+
+_metadata_cache = SpreadsheetMetadataCache()
+
+
+def get_spreadsheet_metadata_cache() -> SpreadsheetMetadataCache:
+    """Get the global spreadsheet metadata cache."""
+    return _metadata_cache
+
+
+def remember_spreadsheet(spreadsheet: Dict[str, Any], user_google_email: str) -> None:
+    """Seed the user's cache entry from a full spreadsheet resource (e.g. a spreadsheets.create response)."""
+    get_spreadsheet_metadata_cache().put(user_google_email, SpreadsheetMetadata(spreadsheet))
+
+
+async def get_spreadsheet_metadata(
+    service,
+    spreadsheet_id: str,
+    user_google_email: str,
+    drive_service=None,
+    force_refresh: bool = False,
+) -> SpreadsheetMetadata:
+    """
+    Get a spreadsheet's metadata, reusing a cached copy while it is current.
+
+    Args:
+        service: Google Sheets API service
+        spreadsheet_id: ID of the spreadsheet
+        user_google_email: The user whose credentials the services carry (the cache key)
+        drive_service: Optional Drive service used to revalidate by modifiedTime
+        force_refresh: Skip the cache
+
+    Returns:
+        SpreadsheetMetadata for the spreadsheet
+    """
+    cache = get_spreadsheet_metadata_cache()
+    cached = None if force_refresh else cache.get(user_google_email, spreadsheet_id)
+    modified_time = None
+    if cached is not None:
+        if time.monotonic() - cached.fetched_at < SHEETS_METADATA_TTL_SECONDS:
+            return cached
+        if drive_service is not None:
+            file_metadata = await asyncio.to_thread(
+                drive_service.files().get(fileId=spreadsheet_id, fields="modifiedTime", supportsAllDrives=True).execute
+            )
+            modified_time = file_metadata.get("modifiedTime")
+            if modified_time and modified_time == cached.modified_time:
+                cached.fetched_at = time.monotonic()
+                logger.debug(f"[sheets_metadata] Reusing metadata for {spreadsheet_id} ({modified_time})")
+                return cached
+
+    fetch = asyncio.to_thread(
+        service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=SPREADSHEET_METADATA_FIELDS).execute
+    )
+    if drive_service is not None and modified_time is None:
+        # Record the version alongside the first fetch so later revalidations are cheap
+        spreadsheet, file_metadata = await asyncio.gather(
+            fetch,
+            asyncio.to_thread(
+                drive_service.files().get(fileId=spreadsheet_id, fields="modifiedTime", supportsAllDrives=True).execute
+            ),
+        )
+        modified_time = file_metadata.get("modifiedTime")
+    else:
+        spreadsheet = await fetch
+    metadata = SpreadsheetMetadata(spreadsheet, modified_time)
+    cache.put(user_google_email, metadata)
+    return metadata
+
+
+async def validate_range(
+    service, spreadsheet_id: str, user_google_email: str, range_name: str, check_grid: bool = False
+) -> None:
+    """
+    Check a range against the cached sheet index, refetching once before rejecting it.
+
+    Nothing is fetched when there is no fresh cached entry; the range is
+    then left for the API to validate.
+
+    Raises:
+        ValueError: If the range names a missing sheet or starts outside the grid
+    """
+    metadata = get_spreadsheet_metadata_cache().get(user_google_email, spreadsheet_id)
+    if metadata is None or time.monotonic() - metadata.fetched_at >= SHEETS_METADATA_TTL_SECONDS:
+        return
+    if metadata.check_range(range_name, check_grid) is None:
+        return
+    metadata = await get_spreadsheet_metadata(service, spreadsheet_id, user_google_email, force_refresh=True)
+    error = metadata.check_range(range_name, check_grid)
+    if error:
+        raise ValueError(error)
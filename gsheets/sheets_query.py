@@ -0,0 +1,453 @@
+"""
+In-Process Queries over Google Sheets Data
+
+Loads a sheet range once into a typed, column-oriented table and answers
+filter / group-by / aggregate / sort queries on the server, so only the
+compact result is returned. Numeric columns are stored as array('d') (NaN
+for blanks); when NumPy is installed, comparisons and aggregates over them
+run vectorized on a zero-copy view of that buffer. A column with any
+non-numeric cell is kept as text, but ordering comparisons against a number,
+sorting, and sum/avg/min/max still treat its numeric cells as numbers
+(skipping the others), so one "N/A" does not turn "Sales > 100" into a
+string comparison or make sum(Sales) fail.
+
+Tables are cached per (spreadsheet, range, render option) and revalidated
+against the spreadsheet's Drive modifiedTime, so repeated questions about
+an unchanged sheet cost one metadata call.
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+SHEETS_QUERY_CACHE_MAX_TABLES = int(os.getenv("SHEETS_QUERY_CACHE_MAX_TABLES", "8"))
+SHEETS_QUERY_CACHE_MAX_CELLS = int(os.getenv("SHEETS_QUERY_CACHE_MAX_CELLS", "5000000"))
+
+QUERY_DEFAULT_LIMIT = 100
+QUERY_MAX_LIMIT = 1000
+
+AGGREGATES = ("count", "sum", "avg", "min", "max", "distinct")
+# Aggregates computed over the numeric cells of a mixed text column
+NUMERIC_AGGREGATES = ("sum", "avg", "min", "max")
+
+_NUMBER_OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+_TEXT_OPERATORS: Dict[str, Callable[[str, str], bool]] = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "contains": lambda a, b: b in a,
+    "startswith": lambda a, b: a.startswith(b),
+    "endswith": lambda a, b: a.endswith(b),
+}
+
+_CONDITION = re.compile(
+    r"^\s*(?P<column>.+?)\s*(?:(?P<symbol>>=|<=|!=|==|=|>|<)|\s(?P<word>contains|startswith|endswith|is empty|is not empty)(?=\s|$))\s*(?P<value>.*?)\s*$",
+    re.IGNORECASE,
+)
+_AGGREGATE = re.compile(r"^\s*(\w+)\s*\(\s*(.*?)\s*\)\s*$")
+_ORDER = re.compile(r"^\s*(.+?)(?:\s+(asc|desc))?\s*$", re.IGNORECASE)
+
+
+class Column:
+    """One typed column: "number" data is array('d') with NaN for blanks, "text" data is a list of str."""
+
+    def __init__(self, name: str, kind: str, data: Any):
+        self.name = name
+        self.kind = kind
+        self.data = data
+        self._numeric: Optional[array] = None
+        # Text columns only: cells holding numbers, and non-blank cells that do not
+        self.numeric_cells = 0
+        self.skipped_cells = 0
+
+    def value(self, row: int) -> Any:
+        if self.kind == "number":
+            number = self.data[row]
+            return None if math.isnan(number) else number
+        return self.data[row] or None
+
+    def numeric_data(self) -> array:
+        """
+        The cells as numbers, NaN for blanks. Text columns are parsed once,
+        with NaN for cells that are not numbers.
+        """
+        if self.kind == "number":
+            return self.data
+        if self._numeric is None:
+            parsed = [_as_number(text) for text in self.data]
+            self.numeric_cells = sum(number is not None for number in parsed)
+            self.skipped_cells = sum(number is None and text != "" for number, text in zip(parsed, self.data))
+            self._numeric = array("d", (math.nan if number is None else number for number in parsed))
+        return self._numeric
+
+    def has_numbers(self) -> bool:
+        if self.kind == "number":
+            return True
+        self.numeric_data()
+        return self.numeric_cells > 0
+
+    def numbers(self):
+        """Zero-copy NumPy view of numeric_data()."""
+        return np.frombuffer(self.numeric_data(), dtype=np.float64)
+
+
+class SheetTable:
+    """Column-oriented table built from a values response."""
+
+    def __init__(self, columns: List[Column], row_count: int):
+        self.columns = columns
+        self.row_count = row_count
+        self._by_name = {column.name.lower(): column for column in columns}
+
+    @property
+    def cell_count(self) -> int:
+        return self.row_count * len(self.columns)
+
+    def column(self, name: str) -> Column:
+        column = self._by_name.get(name.strip().lower())
+        if column is None:
+            raise ValueError(f"Unknown column '{name}'. Columns: {', '.join(c.name for c in self.columns)}")
+        return column
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _as_number(text: str) -> Optional[float]:
+    """The number a text cell holds (e.g. "12.5"), or None if it is not a finite number."""
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def build_table(values: List[List[Any]], header: bool = True) -> SheetTable:
+    """
+    Build a typed table from rows (ideally read with UNFORMATTED_VALUE).
+
+    A column is numeric when every non-blank cell is a number; otherwise all
+    of its cells are kept as text.
+    """
+    width = max((len(row) for row in values), default=0)
+    names: List[str] = []
+    rows = values
+    if header and values:
+        seen: Dict[str, int] = {}
+        for position in range(width):
+            raw = values[0][position] if position < len(values[0]) else ""
+            name = str(raw).strip() or f"Column{position + 1}"
+            count = seen.get(name.lower(), 0)
+            seen[name.lower()] = count + 1
+            names.append(name if not count else f"{name}_{count + 1}")
+        rows = values[1:]
+    else:
+        names = [f"Column{position + 1}" for position in range(width)]
+
+    columns = []
+    for position, name in enumerate(names):
+        cells = [row[position] if position < len(row) else "" for row in rows]
+        if any(cell != "" for cell in cells) and all(cell == "" or _is_number(cell) for cell in cells):
+            data = array("d", (float(cell) if cell != "" else math.nan for cell in cells))
+            columns.append(Column(name, "number", data))
+        else:
+            columns.append(Column(name, "text", ["" if cell is None else str(cell) for cell in cells]))
+    return SheetTable(columns, len(rows))
+
+
+class Condition:
+    """A parsed filter condition such as "Sales >= 100" or "Region contains west"."""
+
+    def __init__(self, expression: str):
+        match = _CONDITION.match(expression)
+        if not match:
+            raise ValueError(
+                f"Invalid filter '{expression}'. Use '<column> <op> <value>' with op one of "
+                "=, !=, >, >=, <, <=, contains, startswith, endswith, is empty, is not empty"
+            )
+        self.column = match.group("column")
+        self.operator = (match.group("symbol") or match.group("word")).lower().replace("==", "=")
+        value = match.group("value")
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        self.value = value
+
+    def _predicate(self, column: Column) -> Callable[[int], bool]:
+        if self.operator in ("is empty", "is not empty"):
+            wanted = self.operator == "is empty"
+            return lambda row: (column.value(row) is None) == wanted
+        if column.kind == "number":
+            try:
+                number = float(self.value)
+            except ValueError:
+                raise ValueError(f"Column '{column.name}' is numeric; '{self.value}' is not a number")
+            if self.operator not in _NUMBER_OPERATORS:
+                raise ValueError(f"Operator '{self.operator}' does not apply to numeric column '{column.name}'")
+            compare = _NUMBER_OPERATORS[self.operator]
+            data = column.data
+            return lambda row: not math.isnan(data[row]) and compare(data[row], number)
+        texts = column.data
+        number = _as_number(self.value) if self.operator in ("<", "<=", ">", ">=") else None
+        if number is not None:
+            # Compare the cells holding numbers numerically; other cells never match
+            compare_numbers = _NUMBER_OPERATORS[self.operator]
+
+            def _matches(row: int) -> bool:
+                cell = _as_number(texts[row])
+                return cell is not None and compare_numbers(cell, number)
+
+            return _matches
+        compare = _TEXT_OPERATORS[self.operator]
+        needle = self.value.lower()
+        return lambda row: compare(texts[row].lower(), needle)
+
+    def apply(self, table: SheetTable, selected: Optional[Sequence[int]]) -> Sequence[int]:
+        """Narrow a row selection (None for all rows) to the rows matching this condition."""
+        column = table.column(self.column)
+        if np is not None and column.kind == "number" and self.operator in _NUMBER_OPERATORS:
+            try:
+                number = float(self.value)
+            except ValueError:
+                raise ValueError(f"Column '{column.name}' is numeric; '{self.value}' is not a number")
+            numbers = column.numbers()
+            # NaN compares false for every operator except !=, so exclude blanks explicitly
+            mask = _NUMBER_OPERATORS[self.operator](numbers, number) & ~np.isnan(numbers)
+            if selected is None:
+                return np.flatnonzero(mask)
+            selected = np.asarray(selected, dtype=np.intp)
+            return selected[mask[selected]]
+        predicate = self._predicate(column)
+        rows = range(table.row_count) if selected is None else selected
+        return [row for row in rows if predicate(row)]
+
+
+class Aggregate:
+    """A parsed aggregate such as "sum(Sales)" or "count(*)"."""
+
+    def __init__(self, expression: str):
+        match = _AGGREGATE.match(expression)
+        if not match or match.group(1).lower() not in AGGREGATES:
+            raise ValueError(f"Invalid aggregate '{expression}'. Use one of {', '.join(AGGREGATES)}, e.g. sum(Sales) or count(*)")
+        self.function = match.group(1).lower()
+        self.column = match.group(2) or "*"
+        if self.column == "*" and self.function != "count":
+            raise ValueError(f"{self.function}(*) is not supported; name a column")
+        self.label = f"{self.function}({self.column})"
+
+    def compute(self, table: SheetTable, rows: Sequence[int]) -> Any:
+        if self.column == "*":
+            return len(rows)
+        column = table.column(self.column)
+        if column.kind == "number" or (self.function in NUMERIC_AGGREGATES and column.has_numbers()):
+            # In a mixed text column only the cells holding numbers are aggregated
+            if np is not None:
+                numbers = column.numbers()[np.asarray(rows, dtype=np.intp)]
+                present = numbers[~np.isnan(numbers)]
+                return _numpy_aggregate(self.function, present)
+            data = column.numeric_data()
+            present_list = [data[row] for row in rows if not math.isnan(data[row])]
+            return _python_aggregate(self.function, present_list)
+        texts = [column.data[row] for row in rows if column.data[row]]
+        if self.function == "count":
+            return len(texts)
+        if self.function == "distinct":
+            return len(set(texts))
+        if self.function in ("min", "max"):
+            return (min if self.function == "min" else max)(texts) if texts else None
+        raise ValueError(f"{self.function}() needs a numeric column; '{column.name}' contains text")
+
+
+def skipped_cells_note(table: SheetTable, aggregates: Optional[List[str]]) -> str:
+    """
+    Describe the non-numeric cells that sum/avg/min/max skipped in mixed
+    text columns (empty if there were none).
+    """
+    notes = []
+    for expression in aggregates or []:
+        aggregate = Aggregate(expression)
+        if aggregate.function not in NUMERIC_AGGREGATES:
+            continue
+        column = table.column(aggregate.column)
+        if column.kind == "text" and column.has_numbers() and column.skipped_cells:
+            note = f"'{column.name}': {column.skipped_cells} non-numeric cell(s) skipped"
+            if note not in notes:
+                notes.append(note)
+    return "; ".join(notes)
+
+
+def _python_aggregate(function: str, values: List[float]) -> Any:
+    if function == "count":
+        return len(values)
+    if function == "distinct":
+        return len(set(values))
+    if not values:
+        return None
+    if function == "sum":
+        return math.fsum(values)
+    if function == "avg":
+        return math.fsum(values) / len(values)
+    return min(values) if function == "min" else max(values)
+
+
+def _numpy_aggregate(function: str, values) -> Any:
+    if function == "count":
+        return int(values.size)
+    if function == "distinct":
+        return int(np.unique(values).size)
+    if not values.size:
+        return None
+    result = {"sum": np.sum, "avg": np.mean, "min": np.min, "max": np.max}[function](values)
+    return float(result)
+
+
+def run_query(
+    table: SheetTable,
+    filters: Optional[List[str]] = None,
+    group_by: Optional[List[str]] = None,
+    aggregates: Optional[List[str]] = None,
+    select: Optional[List[str]] = None,
+    order_by: Optional[List[str]] = None,
+    limit: int = QUERY_DEFAULT_LIMIT,
+) -> Tuple[List[str], List[List[Any]], int, int]:
+    """
+    Run a query against a table.
+
+    Args:
+        table: Table from build_table
+        filters: Conditions that must all hold (e.g. "Region = West", "Sales > 100")
+        group_by: Columns to group by
+        aggregates: Aggregates per group (or over all matched rows without group_by)
+        select: Columns to return when not aggregating (default: all)
+        order_by: Output columns to sort by, each optionally followed by asc/desc
+        limit: Maximum number of rows to return
+
+    Returns:
+        Tuple of (header, rows, matched row count, total result rows before the limit)
+    """
+    conditions = [Condition(expression) for expression in filters or []]
+    parsed_aggregates = [Aggregate(expression) for expression in aggregates or []]
+    group_columns = [table.column(name) for name in group_by or []]
+
+    selected: Optional[Sequence[int]] = None
+    for condition in conditions:
+        selected = condition.apply(table, selected)
+    matched = list(range(table.row_count)) if selected is None else [int(row) for row in selected]
+
+    if group_columns or parsed_aggregates:
+        groups: "OrderedDict[Tuple[Any, ...], List[int]]" = OrderedDict()
+        if group_columns:
+            for row in matched:
+                groups.setdefault(tuple(column.value(row) for column in group_columns), []).append(row)
+        else:
+            groups[()] = matched
+        header = [column.name for column in group_columns] + [aggregate.label for aggregate in parsed_aggregates]
+        result = [
+            list(key) + [aggregate.compute(table, rows) for aggregate in parsed_aggregates]
+            for key, rows in groups.items()
+        ]
+    else:
+        columns = [table.column(name) for name in select] if select else table.columns
+        header = [column.name for column in columns]
+        result = [[column.value(row) for column in columns] for row in matched]
+
+    for expression in reversed(order_by or []):
+        match = _ORDER.match(expression)
+        name, direction = match.group(1), (match.group(2) or "asc").lower()
+        lowered = [label.lower() for label in header]
+        if name.lower() not in lowered:
+            raise ValueError(f"Cannot order by '{name}'; output columns are: {', '.join(header)}")
+        position = lowered.index(name.lower())
+        present = [row for row in result if row[position] is not None]
+        blanks = [row for row in result if row[position] is None]
+        present.sort(key=lambda row: _sort_key(row[position]), reverse=direction == "desc")
+        # Blanks always sort last
+        result = present + blanks
+
+    return header, result[:limit], len(matched), len(result)
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    if _is_number(value):
+        return (0, value)
+    number = _as_number(str(value))
+    # Numeric text in a mixed column sorts by value, before the non-numeric cells
+    return (0, number) if number is not None else (1, str(value).lower())
+
+
+def format_value(value: Any) -> Any:
+    """Render numbers compactly (no trailing .0, at most 10 significant digits)."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() and abs(value) < 1e15 else format(value, ".10g")
+    return value
+
+
+class SheetTableCache:
+    """LRU cache of tables keyed by (spreadsheet ID, range, render option), tagged with modifiedTime."""
+
+    def __init__(self, max_tables: int = SHEETS_QUERY_CACHE_MAX_TABLES, max_cells: int = SHEETS_QUERY_CACHE_MAX_CELLS):
+        self.max_tables = max_tables
+        self.max_cells = max_cells
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[str, SheetTable]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str, str], modified_time: Optional[str]) -> Optional[SheetTable]:
+        if not modified_time:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != modified_time:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Tuple[str, str, str], modified_time: Optional[str], table: SheetTable) -> None:
+        if not modified_time or self.max_tables <= 0 or table.cell_count > self.max_cells:
+            return
+        with self._lock:
+            self._entries[key] = (modified_time, table)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_tables or (
+                len(self._entries) > 1 and sum(t.cell_count for _, t in self._entries.values()) > self.max_cells
+            ):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, spreadsheet_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == spreadsheet_id]:
+                del self._entries[key]
+
+
+_table_cache = SheetTableCache()
+
+
+def get_sheet_table_cache() -> SheetTableCache:
+    """Get the global sheet table cache."""
+    return _table_cache
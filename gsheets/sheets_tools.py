@@ -7,17 +7,44 @@ This module provides MCP tools for interacting with Google Sheets API.
 import logging
 import asyncio
 import json
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 
-from auth.service_decorator import require_google_service
+from auth.service_decorator import require_google_service, require_multiple_services
 from core.server import server
 from core.utils import handle_http_errors
 from core.comments import create_comment_tools
+from gdrive.drive_helpers import DriveFileLister, build_drive_list_params, format_page_token_hint
+from gsheets.sheets_helpers import (
+    SHEETS_READ_DEFAULT_MAX_ROWS,
+    SHEETS_READ_MAX_ROWS_LIMIT,
+    batch_get_values,
+    is_bare_name,
+    values_to_csv,
+    window_range,
+)
+from gsheets.sheets_metadata import (
+    get_spreadsheet_metadata,
+    get_spreadsheet_metadata_cache,
+    remember_spreadsheet,
+    validate_range,
+)
+from gsheets.sheets_query import (
+    QUERY_DEFAULT_LIMIT,
+    QUERY_MAX_LIMIT,
+    build_table,
+    format_value,
+    get_sheet_table_cache,
+    run_query,
+    skipped_cells_note,
+)
+from gsheets.sheets_write import SHEETS_WRITE_CONCURRENCY, write_values
 
 # Configure module logger
 logger = logging.getLogger(__name__)
 
+SHEETS_WRITE_MAX_REPORTED_CHUNKS = 50
+
 
 @server.tool()
 @handle_http_errors("list_spreadsheets", is_read_only=True, service_type="sheets")
@@ -26,6 +53,7 @@ async def list_spreadsheets(
     service,
     user_google_email: str,
     max_results: int = 25,
+    page_token: Optional[str] = None,
 ) -> str:
     """
     Lists spreadsheets from Google Drive that the user has access to.
@@ -33,24 +61,23 @@ async def list_spreadsheets(
     Args:
         user_google_email (str): The user's Google email address. Required.
         max_results (int): Maximum number of spreadsheets to return. Defaults to 25.
+        page_token (Optional[str]): Token from a previous call to continue the listing where it stopped.
 
     Returns:
-        str: A formatted list of spreadsheet files (name, ID, modified time).
+        str: A formatted list of spreadsheet files (name, ID, modified time), plus a page token if more exist.
     """
     logger.info(f"[list_spreadsheets] Invoked. Email: '{user_google_email}'")
 
-    files_response = await asyncio.to_thread(
-        service.files()
-        .list(
-            q="mimeType='application/vnd.google-apps.spreadsheet'",
-            pageSize=max_results,
-            fields="files(id,name,modifiedTime,webViewLink)",
-            orderBy="modifiedTime desc",
-        )
-        .execute
+    list_params = build_drive_list_params(
+        query="mimeType='application/vnd.google-apps.spreadsheet'",
+        page_size=max_results,
+        include_items_from_all_drives=False,
+        file_fields="id, name, modifiedTime, webViewLink",
+        order_by="modifiedTime desc",
+        page_token=page_token,
     )
-
-    files = files_response.get("files", [])
+    lister = DriveFileLister(service, list_params, max_results=max_results)
+    files = await lister.collect()
     if not files:
         return f"No spreadsheets found for {user_google_email}."
 
@@ -62,6 +89,7 @@ async def list_spreadsheets(
     text_output = (
         f"Successfully listed {len(files)} spreadsheets for {user_google_email}:\n"
         + "\n".join(spreadsheets_list)
+        + format_page_token_hint(lister.next_page_token)
     )
 
     logger.info(f"Successfully listed {len(files)} spreadsheets for {user_google_email}.")
@@ -70,8 +98,12 @@ async def list_spreadsheets(
 
 @server.tool()
 @handle_http_errors("get_spreadsheet_info", is_read_only=True, service_type="sheets")
-@require_google_service("sheets", "sheets_read")
+@require_multiple_services([
+    {"service_type": "drive", "scopes": "drive_read", "param_name": "drive_service"},
+    {"service_type": "sheets", "scopes": "sheets_read", "param_name": "service"}
+])
 async def get_spreadsheet_info(
+    drive_service,
     service,
     user_google_email: str,
     spreadsheet_id: str,
@@ -88,16 +120,10 @@ async def get_spreadsheet_info(
     """
     logger.info(f"[get_spreadsheet_info] Invoked. Email: '{user_google_email}', Spreadsheet ID: {spreadsheet_id}")
 
-    spreadsheet = await asyncio.to_thread(
-        service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute
-    )
-
-    title = spreadsheet.get("properties", {}).get("title", "Unknown")
-    sheets = spreadsheet.get("sheets", [])
+    metadata = await get_spreadsheet_metadata(service, spreadsheet_id, user_google_email, drive_service=drive_service)
 
     sheets_info = []
-    for sheet in sheets:
-        sheet_props = sheet.get("properties", {})
+    for sheet_props in metadata.sheets:
         sheet_name = sheet_props.get("title", "Unknown")
         sheet_id = sheet_props.get("sheetId", "Unknown")
         grid_props = sheet_props.get("gridProperties", {})
@@ -109,9 +135,9 @@ async def get_spreadsheet_info(
         )
 
     text_output = (
-        f"Spreadsheet: \"{title}\" (ID: {spreadsheet_id})\n"
-        f"Sheets ({len(sheets)}):\n"
-        + "\n".join(sheets_info) if sheets_info else "  No sheets found"
+        f"Spreadsheet: \"{metadata.title}\" (ID: {spreadsheet_id})\n"
+        f"Sheets ({len(metadata.sheets)}):\n"
+        + ("\n".join(sheets_info) if sheets_info else "  No sheets found")
     )
 
     logger.info(f"Successfully retrieved info for spreadsheet {spreadsheet_id} for {user_google_email}.")
@@ -140,6 +166,11 @@ async def read_sheet_values(
     """
     logger.info(f"[read_sheet_values] Invoked. Email: '{user_google_email}', Spreadsheet: {spreadsheet_id}, Range: {range_name}")
 
+    try:
+        await validate_range(service, spreadsheet_id, user_google_email, range_name, check_grid=True)
+    except ValueError as e:
+        raise Exception(str(e))
+
     result = await asyncio.to_thread(
         service.spreadsheets()
         .values()
@@ -168,6 +199,101 @@ async def read_sheet_values(
     return text_output
 
 
+@server.tool()
+@handle_http_errors("read_sheet_ranges", is_read_only=True, service_type="sheets")
+@require_google_service("sheets", "sheets_read")
+async def read_sheet_ranges(
+    service,
+    user_google_email: str,
+    spreadsheet_id: str,
+    ranges: List[str],
+    value_render_option: str = "FORMATTED_VALUE",
+    date_time_render_option: str = "SERIAL_NUMBER",
+    row_offset: int = 0,
+    max_rows: int = SHEETS_READ_DEFAULT_MAX_ROWS,
+) -> str:
+    """
+    Reads several ranges of a Google Sheet in one request and returns each as CSV.
+    Large ranges are read in windows of `max_rows` rows; when more rows remain, the
+    response ends with the `row_offset` to pass on the next call.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        spreadsheet_id (str): The ID of the spreadsheet. Required.
+        ranges (List[str]): Ranges to read (e.g., ["Sheet1!A1:D", "Summary!B2:C10", "Data"]). Required.
+        value_render_option (str): "FORMATTED_VALUE", "UNFORMATTED_VALUE" or "FORMULA". Defaults to "FORMATTED_VALUE".
+        date_time_render_option (str): "SERIAL_NUMBER" or "FORMATTED_STRING"; used unless values are formatted. Defaults to "SERIAL_NUMBER".
+        row_offset (int): Number of rows to skip from the start of every range. Defaults to 0.
+        max_rows (int): Maximum number of rows to return per range. Defaults to 1000 (max 10000).
+
+    Returns:
+        str: Each range's values as CSV, with the continuation offset if more rows remain.
+    """
+    logger.info(f"[read_sheet_ranges] Invoked. Email: '{user_google_email}', Spreadsheet: {spreadsheet_id}, Ranges: {ranges}, Offset: {row_offset}")
+
+    if not ranges:
+        raise Exception("At least one range is required.")
+    row_offset = max(0, row_offset)
+    max_rows = max(1, min(max_rows, SHEETS_READ_MAX_ROWS_LIMIT))
+
+    # Sheet grid sizes keep windows inside each sheet, and unknown sheets fail before any read
+    try:
+        metadata = await get_spreadsheet_metadata(service, spreadsheet_id, user_google_email)
+        for range_name in ranges:
+            await validate_range(service, spreadsheet_id, user_google_email, range_name)
+        # Bare names are windowed only when they are sheet titles; named ranges are read whole
+        windows = [
+            window_range(metadata.sheet_range(range_name), row_offset, max_rows, metadata.sheet_row_count(range_name))
+            for range_name in ranges
+        ]
+    except ValueError as e:
+        raise Exception(str(e))
+    requested = [window for window, _, _, _ in windows if window]
+
+    try:
+        value_ranges = (
+            await batch_get_values(service, spreadsheet_id, requested, value_render_option, date_time_render_option)
+            if requested
+            else []
+        )
+    except ValueError as e:
+        raise Exception(str(e))
+
+    sections = []
+    more_rows = False
+    returned = iter(value_ranges)
+    for range_name, (window, first, last, end_row) in zip(ranges, windows):
+        value_range = next(returned, {}) if window else {}
+        values = value_range.get("values", [])
+        if first is None:
+            row_info = f"{len(values)} rows"
+        elif values:
+            row_info = f"rows {first}-{first + len(values) - 1}"
+        else:
+            row_info = f"no rows from row {first}"
+        if first is not None and values:
+            if end_row is not None:
+                # The API drops trailing blank rows, so a short window does not mean the range ended
+                more_rows = more_rows or last < end_row
+            else:
+                # Unbounded range: only a full window may be followed by more data
+                more_rows = more_rows or len(values) == max_rows
+        sections.append(
+            f"Range '{value_range.get('range', range_name)}' ({row_info}):\n"
+            + (values_to_csv(values) if values else "(empty)\n")
+        )
+
+    text_output = (
+        f"Read {len(ranges)} range(s) from spreadsheet {spreadsheet_id} for {user_google_email}:\n\n"
+        + "\n".join(sections)
+    )
+    if more_rows:
+        text_output += f"\n--- More rows remain. Call again with row_offset={row_offset + max_rows} to continue. ---"
+
+    logger.info(f"Successfully read {len(requested)} ranges for {user_google_email}.")
+    return text_output
+
+
 @server.tool()
 @handle_http_errors("modify_sheet_values", service_type="sheets")
 @require_google_service("sheets", "sheets_write")
@@ -217,6 +343,11 @@ async def modify_sheet_values(
     if not clear_values and not values:
         raise Exception("Either 'values' must be provided or 'clear_values' must be True.")
 
+    try:
+        await validate_range(service, spreadsheet_id, user_google_email, range_name)
+    except ValueError as e:
+        raise Exception(str(e))
+
     if clear_values:
         result = await asyncio.to_thread(
             service.spreadsheets()
@@ -253,9 +384,173 @@ async def modify_sheet_values(
         )
         logger.info(f"Successfully updated {updated_cells} cells for {user_google_email}.")
 
+    # Drive's modifiedTime can trail a values write briefly; drop cached query tables now
+    get_sheet_table_cache().invalidate(spreadsheet_id)
+    if not clear_values:
+        # Writing past the last row or column grows the grid
+        get_spreadsheet_metadata_cache().invalidate(spreadsheet_id)
     return text_output
 
 
+@server.tool()
+@handle_http_errors("write_sheet_ranges", service_type="sheets")
+@require_google_service("sheets", "sheets_write")
+async def write_sheet_ranges(
+    service,
+    user_google_email: str,
+    spreadsheet_id: str,
+    data: Union[str, List[Dict[str, Any]]],
+    value_input_option: str = "USER_ENTERED",
+    mode: str = "overwrite",
+    max_concurrency: int = SHEETS_WRITE_CONCURRENCY,
+) -> str:
+    """
+    Writes values to several ranges of a Google Sheet in one call, with no limit on the number of rows.
+    Large row sets are split automatically into API-sized chunks that are written concurrently and retried on rate limits.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        spreadsheet_id (str): The ID of the spreadsheet. Required.
+        data (Union[str, List[Dict[str, Any]]]): List of {"range": "Sheet1!A1", "values": [[...], ...]} objects, or its JSON string. Required.
+            Each range's values are written starting at the range's top-left cell.
+        value_input_option (str): How to interpret input values ("RAW" or "USER_ENTERED"). Defaults to "USER_ENTERED".
+        mode (str): "overwrite" to write at the given ranges, or "append" to add the rows after the table found at each range. Defaults to "overwrite".
+        max_concurrency (int): Maximum number of chunks written at once in overwrite mode. Defaults to 4.
+
+    Returns:
+        str: Cells written per chunk and any failures.
+    """
+    logger.info(f"[write_sheet_ranges] Invoked. Email: '{user_google_email}', Spreadsheet: {spreadsheet_id}, Mode: {mode}")
+
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise Exception(f"Invalid JSON format for data: {e}")
+    if not isinstance(data, list) or not data:
+        raise Exception("'data' must be a non-empty list of {\"range\", \"values\"} objects.")
+    for i, item in enumerate(data):
+        if not isinstance(item, dict) or not item.get("range") or not isinstance(item.get("values"), list):
+            raise Exception(f"Item {i} must be an object with a 'range' and a 'values' list.")
+        if any(not isinstance(row, list) for row in item["values"]):
+            raise Exception(f"Item {i}: every row in 'values' must be a list.")
+
+    if any(is_bare_name(item["range"]) for item in data):
+        # Bare sheet titles are quoted so large writes can be split; named ranges are sent whole
+        metadata = await get_spreadsheet_metadata(service, spreadsheet_id, user_google_email)
+        data = [{**item, "range": metadata.sheet_range(item["range"])} for item in data]
+    try:
+        for item in data:
+            await validate_range(service, spreadsheet_id, user_google_email, item["range"])
+    except ValueError as e:
+        raise Exception(str(e))
+
+    try:
+        chunks = await write_values(
+            service, spreadsheet_id, data, user_google_email, value_input_option, mode, max(1, max_concurrency)
+        )
+    except ValueError as e:
+        raise Exception(str(e))
+    finally:
+        get_sheet_table_cache().invalidate(spreadsheet_id)
+        # Appends insert rows, and overwrites past the last row or column grow the grid
+        get_spreadsheet_metadata_cache().invalidate(spreadsheet_id)
+
+    failed = [chunk for chunk in chunks if chunk.error]
+    total_cells = sum(chunk.updated_cells for chunk in chunks)
+    total_rows = sum(len(item["values"]) for item in data)
+    lines = [
+        f"Wrote {total_cells} cells ({total_rows} rows in {len(data)} range(s)) to spreadsheet {spreadsheet_id} "
+        f"for {user_google_email} in {len(chunks)} chunk(s)" + (f", {len(failed)} failed" if failed else "") + ":"
+    ]
+    lines.extend(f"  {chunk.describe()}" for chunk in chunks[:SHEETS_WRITE_MAX_REPORTED_CHUNKS])
+    if len(chunks) > SHEETS_WRITE_MAX_REPORTED_CHUNKS:
+        lines.append(f"  ... and {len(chunks) - SHEETS_WRITE_MAX_REPORTED_CHUNKS} more chunks")
+        lines.extend(f"  {chunk.describe()}" for chunk in failed if chunk.number > SHEETS_WRITE_MAX_REPORTED_CHUNKS)
+
+    logger.info(f"Successfully wrote {total_cells} cells for {user_google_email}.")
+    return "\n".join(lines)
+
+
+@server.tool()
+@handle_http_errors("query_sheet", is_read_only=True, service_type="sheets")
+@require_multiple_services([
+    {"service_type": "drive", "scopes": "drive_read", "param_name": "drive_service"},
+    {"service_type": "sheets", "scopes": "sheets_read", "param_name": "sheets_service"}
+])
+async def query_sheet(
+    drive_service,
+    sheets_service,
+    user_google_email: str,
+    spreadsheet_id: str,
+    range_name: str,
+    filters: Optional[List[str]] = None,
+    group_by: Optional[List[str]] = None,
+    aggregates: Optional[List[str]] = None,
+    select: Optional[List[str]] = None,
+    order_by: Optional[List[str]] = None,
+    limit: int = QUERY_DEFAULT_LIMIT,
+    has_header: bool = True,
+) -> str:
+    """
+    Filters, groups, aggregates and sorts sheet data on the server and returns only the result as CSV.
+    Use this instead of reading whole sheets to answer questions like totals per region or top 10 rows.
+    Data is cached until the spreadsheet changes, so follow-up queries are fast.
+
+    Args:
+        user_google_email (str): The user's Google email address. Required.
+        spreadsheet_id (str): The ID of the spreadsheet. Required.
+        range_name (str): The table to query, with headers in the first row (e.g., "Sales" or "Sales!A1:F"). Required.
+        filters (Optional[List[str]]): Conditions that must all hold, e.g. ["Region = West", "Amount >= 100", "Name contains smith", "Notes is empty"].
+            Operators: =, !=, >, >=, <, <=, contains, startswith, endswith, is empty, is not empty. Text matching ignores case.
+        group_by (Optional[List[str]]): Columns to group by.
+        aggregates (Optional[List[str]]): e.g. ["count(*)", "sum(Amount)", "avg(Amount)", "min(Date)", "max(Amount)", "distinct(Customer)"].
+        select (Optional[List[str]]): Columns to return when not aggregating. Defaults to all columns.
+        order_by (Optional[List[str]]): Output columns to sort by, e.g. ["sum(Amount) desc", "Region"].
+        limit (int): Maximum number of result rows. Defaults to 100 (max 1000).
+        has_header (bool): Whether the first row holds column names. Defaults to True.
+
+    Returns:
+        str: The query result as CSV with match counts.
+    """
+    logger.info(f"[query_sheet] Invoked. Email: '{user_google_email}', Spreadsheet: {spreadsheet_id}, Range: {range_name}")
+
+    limit = max(1, min(limit, QUERY_MAX_LIMIT))
+    file_metadata = await asyncio.to_thread(
+        drive_service.files().get(fileId=spreadsheet_id, fields="modifiedTime", supportsAllDrives=True).execute
+    )
+    modified_time = file_metadata.get("modifiedTime")
+
+    cache = get_sheet_table_cache()
+    cache_key = (spreadsheet_id, range_name, "header" if has_header else "no_header")
+    table = cache.get(cache_key, modified_time)
+    if table is None:
+        value_ranges = await batch_get_values(
+            sheets_service, spreadsheet_id, [range_name], "UNFORMATTED_VALUE", "FORMATTED_STRING"
+        )
+        values = value_ranges[0].get("values", []) if value_ranges else []
+        table = await asyncio.to_thread(build_table, values, has_header)
+        cache.put(cache_key, modified_time, table)
+        logger.info(f"[query_sheet] Loaded {table.row_count} rows x {len(table.columns)} columns from '{range_name}'")
+    else:
+        logger.info(f"[query_sheet] Using cached table for '{range_name}' ({modified_time})")
+
+    try:
+        header, rows, matched, total = await asyncio.to_thread(
+            run_query, table, filters, group_by, aggregates, select, order_by, limit
+        )
+        skipped = skipped_cells_note(table, aggregates)
+    except ValueError as e:
+        raise Exception(str(e))
+
+    summary = (
+        f"Query on '{range_name}' in spreadsheet {spreadsheet_id}: {matched} of {table.row_count} rows matched, "
+        f"{total} result row(s)" + (f", showing the first {len(rows)}" if total > len(rows) else "") + ".\n"
+        + (f"Aggregates used only numeric cells ({skipped}).\n" if skipped else "")
+    )
+    return summary + values_to_csv([header] + [[format_value(value) for value in row] for row in rows])
+
+
 @server.tool()
 @handle_http_errors("create_spreadsheet", service_type="sheets")
 @require_google_service("sheets", "sheets_write")
@@ -293,6 +588,7 @@ async def create_spreadsheet(
         service.spreadsheets().create(body=spreadsheet_body).execute
     )
 
+    remember_spreadsheet(spreadsheet, user_google_email)
     spreadsheet_id = spreadsheet.get("spreadsheetId")
     spreadsheet_url = spreadsheet.get("spreadsheetUrl")
 
@@ -345,7 +641,15 @@ async def create_sheet(
         .execute
     )
 
-    sheet_id = response["replies"][0]["addSheet"]["properties"]["sheetId"]
+    sheet_properties = response["replies"][0]["addSheet"]["properties"]
+    sheet_id = sheet_properties["sheetId"]
+    metadata_cache = get_spreadsheet_metadata_cache()
+    cached_metadata = metadata_cache.get(user_google_email, spreadsheet_id)
+    # Other users' entries do not know the new sheet; keep only the caller's, updated
+    metadata_cache.invalidate(spreadsheet_id)
+    if cached_metadata is not None:
+        cached_metadata.add_sheet(sheet_properties)
+        metadata_cache.put(user_google_email, cached_metadata)
 
     text_output = (
         f"Successfully created sheet '{sheet_name}' (ID: {sheet_id}) in spreadsheet {spreadsheet_id} for {user_google_email}."
@@ -0,0 +1,241 @@
+"""
+Batched and Chunked Google Sheets Writes
+
+Writes any number of ranges, of any size, with as few API calls as the
+request size limits allow. Row sets are split into chunks bounded by cell
+count and payload size; each chunk is re-anchored at its first row, so the
+chunks cover disjoint cells and can be sent as values.batchUpdate requests
+concurrently. Append mode sends values.append calls in order instead, since
+each append lands after the rows written by the previous one. An append is
+only retried after rate limiting; after a server error it may already have
+landed, so the run stops and reports that chunk's outcome as unknown.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.batching import (
+    execute_with_retry,
+    get_rate_limiter,
+    is_ambiguous_error,
+    is_rate_limit_error,
+    new_authorized_http,
+    report_progress,
+    run_bounded,
+)
+from gsheets.sheets_helpers import A1Range, is_bare_name, parse_a1_range
+
+logger = logging.getLogger(__name__)
+
+SHEETS_WRITE_MAX_CELLS_PER_REQUEST = 50_000
+# Well below the API's request size limit, to keep single calls fast
+SHEETS_WRITE_MAX_BYTES_PER_REQUEST = 2 * 1024 * 1024
+SHEETS_WRITE_CONCURRENCY = 4
+
+# Default Sheets API quota: 60 write requests per minute per user
+SHEETS_WRITE_REQUESTS_PER_SECOND = 1.0
+SHEETS_WRITE_BURST = 10
+
+WRITE_MODES = ("overwrite", "append")
+VALUE_INPUT_OPTIONS = ("RAW", "USER_ENTERED")
+
+
+class WriteChunk:
+    """One API call's worth of data and its outcome."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.data: List[Dict[str, Any]] = []  # ValueRange dicts: {"range", "values"}
+        self.cells = 0
+        self.size = 0
+        self.updated_cells = 0
+        self.updated_range: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def add(self, range_name: str, values: List[List[Any]], cells: int, size: int) -> None:
+        self.data.append({"range": range_name, "values": values})
+        self.cells += cells
+        self.size += size
+
+    def describe(self) -> str:
+        ranges = ", ".join(f"{item['range']} ({len(item['values'])} rows)" for item in self.data)
+        if self.error:
+            return f"Chunk {self.number}: {ranges}: ERROR {self.error}"
+        written = f" → {self.updated_range}" if self.updated_range else ""
+        return f"Chunk {self.number}: {ranges}{written}: {self.updated_cells} cells written"
+
+
+def split_range_values(
+    range_name: str,
+    values: List[List[Any]],
+    rebase: bool,
+    max_cells: int = SHEETS_WRITE_MAX_CELLS_PER_REQUEST,
+    max_bytes: int = SHEETS_WRITE_MAX_BYTES_PER_REQUEST,
+) -> List[Tuple[str, List[List[Any]], int, int]]:
+    """
+    Split one range's rows into pieces within the request limits.
+
+    Args:
+        range_name: Target range in A1 notation
+        values: Rows to write
+        rebase: Anchor each piece at its own first row (overwrite mode); when
+            False every piece keeps range_name (append mode). Named ranges and
+            bare names (which may be named ranges) are never re-anchored
+        max_cells: Maximum cells per piece
+        max_bytes: Maximum approximate JSON size per piece
+
+    Returns:
+        List of (range, rows, cell count, approximate size) pieces
+    """
+    anchor: Optional[A1Range] = parse_a1_range(range_name) if rebase else None
+    if rebase and (anchor is None or is_bare_name(range_name)):
+        # Named ranges cannot be re-anchored; send them whole
+        return [(range_name, values, sum(len(row) for row in values), len(json.dumps(values)))]
+
+    pieces = []
+    piece_start = 0
+    cells = size = 0
+    for position, row in enumerate(values):
+        row_cells = max(1, len(row))
+        row_size = len(json.dumps(row)) + 1
+        if position > piece_start and (cells + row_cells > max_cells or size + row_size > max_bytes):
+            pieces.append((piece_start, position, cells, size))
+            piece_start, cells, size = position, 0, 0
+        cells += row_cells
+        size += row_size
+    if piece_start < len(values) or not values:
+        pieces.append((piece_start, len(values), cells, size))
+
+    result = []
+    for start, end, piece_cells, piece_size in pieces:
+        if anchor is None or len(pieces) == 1:
+            piece_range = range_name
+        else:
+            piece_range = A1Range(
+                anchor.sheet, anchor.start_column or 0, (anchor.start_row or 1) + start
+            ).to_a1()
+        result.append((piece_range, values[start:end], piece_cells, piece_size))
+    return result
+
+
+def plan_write_chunks(
+    data: List[Dict[str, Any]],
+    mode: str = "overwrite",
+    max_cells: int = SHEETS_WRITE_MAX_CELLS_PER_REQUEST,
+    max_bytes: int = SHEETS_WRITE_MAX_BYTES_PER_REQUEST,
+) -> List[WriteChunk]:
+    """
+    Group the pieces of every range into API calls.
+
+    In overwrite mode small pieces of different ranges share a batchUpdate;
+    in append mode every piece is its own values.append call.
+    """
+    chunks: List[WriteChunk] = []
+    for item in data:
+        for piece_range, rows, cells, size in split_range_values(
+            item["range"], item["values"], mode == "overwrite", max_cells, max_bytes
+        ):
+            current = chunks[-1] if chunks else None
+            if (
+                current is None
+                or mode == "append"
+                or current.cells + cells > max_cells
+                or current.size + size > max_bytes
+            ):
+                current = WriteChunk(len(chunks) + 1)
+                chunks.append(current)
+            current.add(piece_range, rows, cells, size)
+    return chunks
+
+
+async def write_values(
+    service,
+    spreadsheet_id: str,
+    data: List[Dict[str, Any]],
+    user_google_email: str,
+    value_input_option: str = "USER_ENTERED",
+    mode: str = "overwrite",
+    max_concurrency: int = SHEETS_WRITE_CONCURRENCY,
+) -> List[WriteChunk]:
+    """
+    Write many ranges in chunks.
+
+    Args:
+        service: Google Sheets API service
+        spreadsheet_id: Target spreadsheet
+        data: List of {"range": A1 range, "values": rows}
+        user_google_email: Key of the shared rate limiter
+        value_input_option: "RAW" or "USER_ENTERED"
+        mode: "overwrite" (values.batchUpdate, concurrent) or "append"
+            (values.append, in order; stops at the first failure)
+        max_concurrency: Maximum number of overwrite chunks in flight
+
+    Returns:
+        The executed chunks with their outcomes
+    """
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unsupported mode '{mode}'. Supported: {', '.join(WRITE_MODES)}")
+    if value_input_option not in VALUE_INPUT_OPTIONS:
+        raise ValueError(
+            f"Unsupported value_input_option '{value_input_option}'. Supported: {', '.join(VALUE_INPUT_OPTIONS)}"
+        )
+
+    chunks = plan_write_chunks(data, mode)
+    limiter = get_rate_limiter(f"sheets_write:{user_google_email}", SHEETS_WRITE_REQUESTS_PER_SECOND, SHEETS_WRITE_BURST)
+    values_api = service.spreadsheets().values()
+    total = len(chunks)
+    done = 0
+
+    async def _progress() -> None:
+        nonlocal done
+        done += 1
+        await report_progress(done, total, f"Wrote {done}/{total} chunks")
+
+    if mode == "append":
+        for chunk in chunks:
+            item = chunk.data[0]
+            await limiter.acquire()
+            try:
+                response = await execute_with_retry(
+                    values_api.append(
+                        spreadsheetId=spreadsheet_id,
+                        range=item["range"],
+                        valueInputOption=value_input_option,
+                        insertDataOption="INSERT_ROWS",
+                        body={"values": item["values"]},
+                    ),
+                    label="write_sheet_ranges",
+                    # Appending is not idempotent; only rate-limited calls were certainly not applied
+                    retry_if=is_rate_limit_error,
+                )
+            except Exception as e:
+                chunk.error = f"unknown outcome (may have been appended): {e}" if is_ambiguous_error(e) else str(e)
+                # Later appends would land out of order
+                for skipped in chunks[chunk.number:]:
+                    skipped.error = f"skipped after chunk {chunk.number} failed"
+                break
+            updates = response.get("updates", {})
+            chunk.updated_cells = updates.get("updatedCells", 0)
+            chunk.updated_range = updates.get("updatedRange")
+            await _progress()
+        return chunks
+
+    async def _write(chunk: WriteChunk) -> None:
+        await limiter.acquire()
+        # Requests run in worker threads, which must not share an httplib2 transport
+        response = await execute_with_retry(
+            values_api.batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={"valueInputOption": value_input_option, "data": chunk.data},
+            ),
+            http=new_authorized_http(service),
+            label="write_sheet_ranges",
+        )
+        chunk.updated_cells = response.get("totalUpdatedCells", 0)
+        await _progress()
+
+    for chunk, _, error in await run_bounded(chunks, _write, max_concurrency):
+        if error is not None:
+            chunk.error = str(error)
+    return chunks